@@ -1,7 +1,5 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 
 class CustomerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -25,6 +23,51 @@ class CustomerProfile(models.Model):
     def __str__(self):
         return f"{self.user.get_full_name()} Profile"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance.field_values()
+        return instance
+
+    @classmethod
+    def for_user(cls, user, fresh=False):
+        """The user's profile, created on first access.
+
+        A profile already loaded along with ``user`` is reused unless ``fresh``.
+        """
+        if not fresh and User.profile.is_cached(user):
+            try:
+                return user.profile
+            except cls.DoesNotExist:
+                pass
+        profile, _ = cls.objects.select_related('user').get_or_create(user_id=user.pk)
+        User.profile.related.set_cached_value(user, profile)
+        return profile
+
+    def field_values(self):
+        # Prepared values, so that files compare by name
+        return {
+            field.attname: field.get_prep_value(getattr(self, field.attname))
+            for field in self._meta.concrete_fields
+            if field.attname not in self.get_deferred_fields() and field.name != 'updated_at'
+        }
+
+    def changed_fields(self):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [name for name, value in self.field_values().items() if loaded.get(name) != value]
+
+    def save(self, *args, **kwargs):
+        # Only write the fields that changed since the profile was loaded
+        changed = self.changed_fields()
+        if changed is not None and not self._state.adding and kwargs.get('update_fields') is None:
+            if not changed:
+                return
+            kwargs['update_fields'] = [*changed, 'updated_at']
+        super().save(*args, **kwargs)
+        self._loaded_values = self.field_values()
+
     @property
     def full_name(self):
         return self.user.get_full_name() or self.user.username
@@ -66,14 +109,3 @@ class CustomerAddress(models.Model):
                 address_type=self.address_type
             ).exclude(id=self.id).update(is_default=False)
         super().save(*args, **kwargs)
-
-# Signal to create profile when user is created
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        CustomerProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
@@ -3,6 +3,9 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
 
+from core.ratelimit import rate_limited
+
+@rate_limited("login", methods=("POST",))
 def login_view(request):
     if request.method == "POST":
         u = request.POST.get("username"); p = request.POST.get("password")
@@ -16,6 +19,7 @@ def logout_view(request):
     logout(request)
     return redirect("core:home")
 
+@rate_limited("registration", methods=("POST",))
 def signup_view(request):
     if request.method == "POST":
         u = request.POST.get("username"); p = request.POST.get("password")
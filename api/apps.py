@@ -7,5 +7,7 @@ class ApiConfig(AppConfig):
     verbose_name = 'E-commerce API'
     
     def ready(self):
-        """Import signal handlers when the app is ready"""
+        """Import signal and outbox handlers and schema extensions when the app is ready"""
+        import api.schema
         import api.signals
+        import api.tasks
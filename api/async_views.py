@@ -0,0 +1,70 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from catalog.cache import catalog_cache
+from catalog.models import Product
+from .serializers import CategoryTreeSerializer, link_category_tree
+from core.conditional import not_modified, set_validators
+from core.ratelimit import rate_limited
+from .views import (
+    CartView, build_cart_data, cart_cache_key, category_tree_cache_key, category_tree_queryset,
+    category_tree_validators,
+)
+
+# Native async versions of hot read endpoints, enabled per route through
+# settings.ASYNC_VIEWS. They return the same payloads as the DRF views but do
+# not go through DRF, so its authentication classes do not apply; the default
+# rate limits are checked through core.ratelimit instead.
+
+_sync_cart_view = CartView.as_view()
+
+
+@rate_limited('anon', 'user')
+async def category_tree(request):
+    """Full active category tree with product counts"""
+    # Validators cached with the payload, as in CategoryViewSet.tree
+    cache_key = await sync_to_async(category_tree_cache_key)(request)
+    entry = await catalog_cache().aget(cache_key)
+    if entry is None:
+        etag, last_modified = await sync_to_async(category_tree_validators)()
+        categories = [c async for c in category_tree_queryset()]
+        serializer = CategoryTreeSerializer(link_category_tree(categories), many=True, context={'request': request})
+        entry = (etag, last_modified, serializer.data)
+        await catalog_cache().aset(cache_key, entry)
+    etag, last_modified, data = entry
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    return set_validators(JsonResponse(data, safe=False), etag, last_modified)
+
+
+@csrf_exempt
+async def cart(request):
+    """Cart contents for session users; everything else goes to CartView"""
+    # JWT authentication and cart mutations stay on the DRF view
+    if request.method != 'GET' or 'HTTP_AUTHORIZATION' in request.META:
+        return await sync_to_async(_sync_cart_view)(request)
+    return await session_cart(request)
+
+
+@rate_limited('anon', 'user')
+async def session_cart(request):
+    user = await request.auser()
+    cart_key = cart_cache_key(user, request.session)
+    cart = await cache.aget(cart_key, {}) if cart_key else {}
+    if not cart and not user.is_authenticated:
+        cart = await request.session.aget('cart', {})
+
+    line_count = len(cart)
+    products = {p.id: p async for p in Product.objects.filter(id__in=list(cart), is_active=True)}
+    data = build_cart_data(cart, products)
+
+    # Remove invalid products from cart
+    if len(cart) != line_count:
+        await cache.aset(cart_key, cart, 86400)
+        if not user.is_authenticated:
+            await request.session.aset('cart', cart)
+
+    return JsonResponse(data)
@@ -0,0 +1,127 @@
+"""
+JWT authentication without a user query per request.
+
+``CachedJWTAuthentication`` resolves the token's user from the default cache
+(``auth:user:<id>``, ``JWT_USER_CACHE_SECONDS``), loaded once with its
+profile. Saving or deleting a user or profile drops the entry (see
+api/signals.py), so deactivation takes effect on the next request.
+
+With ``JWT_EMBED_USER_CLAIMS`` access tokens also carry a ``user`` claim with
+the fields permission checks need, and the user is built from it without
+touching the database. The claim is stamped afresh on every access token
+issued, so it is at most ``ACCESS_TOKEN_LIFETIME`` old; a change to the user
+records ``auth:changed:<id>`` for that long and claims stamped before it are
+ignored in favour of the cached lookup.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .revocation import RevocableTokenMixin
+
+USER_CLAIM = 'user'
+CLAIM_FIELDS = ('username', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def changed_cache_key(user_id):
+    return f'auth:changed:{user_id}'
+
+
+def user_changed(user_id):
+    """Forget the cached user and distrust claims stamped before now"""
+    cache.delete(user_cache_key(user_id))
+    cache.set(changed_cache_key(user_id), time.time(), api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+def load_user(user_id):
+    """The user with ``user_id`` and their profile, from the cache when possible"""
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        queryset = User.objects.select_related('profile')
+        if not api_settings.CHECK_REVOKE_TOKEN:
+            # Keep password hashes out of the cache unless tokens are checked against them
+            queryset = queryset.defer('password')
+        user = queryset.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        cache.set(key, user, settings.JWT_USER_CACHE_SECONDS)
+    return user
+
+
+def stamp_claims(token, user):
+    token[USER_CLAIM] = {field: getattr(user, field) for field in CLAIM_FIELDS}
+    token[USER_CLAIM]['at'] = int(time.time())
+
+
+def claims_user(validated_token):
+    """A user built from the token's ``user`` claim, or None if it can't be trusted"""
+    claims = validated_token.get(USER_CLAIM)
+    if not settings.JWT_EMBED_USER_CLAIMS or not claims or api_settings.CHECK_REVOKE_TOKEN:
+        return None
+    user_id = validated_token[api_settings.USER_ID_CLAIM]
+    changed_at = cache.get(changed_cache_key(user_id))
+    if changed_at is not None and claims['at'] <= changed_at:
+        return None
+    known = {api_settings.USER_ID_FIELD: user_id, 'is_active': True}
+    known.update((field, claims[field]) for field in CLAIM_FIELDS)
+    # from_db() takes values in model field order; the rest are deferred
+    # and load on first access
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in known]
+    return User.from_db(router.db_for_read(User), fields, [known[name] for name in fields])
+
+
+class ClaimsRefreshToken(RevocableTokenMixin, RefreshToken):
+    """Revocable refresh token whose access tokens carry a fresh ``user`` claim"""
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        if settings.JWT_EMBED_USER_CLAIMS:
+            user = load_user(self[api_settings.USER_ID_CLAIM])
+            if user.is_active:
+                stamp_claims(access, user)
+        return access
+
+
+def tokens_for_user(user):
+    refresh = ClaimsRefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` backed by ``load_user`` and, optionally, token claims"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = claims_user(validated_token) or load_user(user_id)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
@@ -1,5 +1,7 @@
 import django_filters
-from django.db.models import Q
+from django.db.models import F, Q
+from django.http import QueryDict
+from catalog import facets
 from catalog.models import Product, Category
 from checkout.models import Order
 
@@ -7,18 +9,25 @@ from checkout.models import Order
 class ProductFilter(django_filters.FilterSet):
     """Product filtering"""
     category = django_filters.ModelChoiceFilter(queryset=Category.objects.filter(is_active=True))
-    category_slug = django_filters.CharFilter(field_name='category__slug')
+    category_slug = django_filters.CharFilter(method='filter_category_slug')
     min_price = django_filters.NumberFilter(field_name='price_cents', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='price_cents', lookup_expr='lte')
     in_stock = django_filters.BooleanFilter(method='filter_in_stock')
     is_featured = django_filters.BooleanFilter(field_name='is_featured')
     has_discount = django_filters.BooleanFilter(method='filter_has_discount')
     search = django_filters.CharFilter(method='filter_search')
+    # Facets (see catalog/facets.py); comma-separated values match any of them
+    gender = django_filters.CharFilter(method='filter_facet')
+    material = django_filters.CharFilter(method='filter_facet')
+    carat = django_filters.CharFilter(method='filter_facet')
+    stone_type = django_filters.CharFilter(method='filter_facet')
+    price = django_filters.CharFilter(method='filter_facet')
     
     class Meta:
         model = Product
         fields = ['category', 'category_slug', 'min_price', 'max_price', 
-                 'in_stock', 'is_featured', 'has_discount', 'search']
+                 'in_stock', 'is_featured', 'has_discount', 'search',
+                 'gender', 'material', 'carat', 'stone_type', 'price']
     
     def filter_in_stock(self, queryset, name, value):
         if value:
@@ -31,6 +40,11 @@ class ProductFilter(django_filters.FilterSet):
                 stock_quantity=0
             )
     
+    def filter_category_slug(self, queryset, name, value):
+        # The category and every category below it
+        path = Category.objects.filter(slug=value).values_list('path', flat=True).first()
+        return queryset.filter(category__path__startswith=path) if path else queryset.none()
+    
     def filter_has_discount(self, queryset, name, value):
         if value:
             return queryset.filter(
@@ -43,6 +57,11 @@ class ProductFilter(django_filters.FilterSet):
                 Q(compare_price_cents__lte=F('price_cents'))
             )
     
+    def filter_facet(self, queryset, name, value):
+        params = QueryDict(mutable=True)
+        params[name] = value
+        return facets.apply(queryset, facets.selected(params))
+    
     def filter_search(self, queryset, name, value):
         if value:
             return queryset.filter(
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired anyway, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        expired = RevokedToken.objects.filter(expires_at__lt=timezone.now())
+
+        deleted = 0
+        while True:
+            jtis = list(expired.order_by('expires_at').values_list('jti', flat=True)[:options['batch_size']])
+            if not jtis:
+                break
+            deleted += RevokedToken.objects.filter(jti__in=jtis).delete()[0]
+            if self.verbosity > 1:
+                self.stdout.write(f'Deleted {deleted} token(s) so far')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired revoked token(s)'))
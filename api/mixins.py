@@ -0,0 +1,57 @@
+from core.conditional import latest, make_etag, not_modified, queryset_state, set_validators
+
+
+def compute_validators(parts, querysets, require_rows=False):
+    """ETag and Last-Modified over ``(queryset, fields)`` pairs.
+
+    With ``require_rows`` an empty first queryset yields ``(None, None)`` so
+    that the view can answer with its usual 404.
+    """
+    parts = list(parts)
+    timestamps = []
+    for index, (queryset, fields) in enumerate(querysets):
+        count, values = queryset_state(queryset, fields)
+        if require_rows and index == 0 and not count:
+            return None, None
+        parts += [count, *values]
+        timestamps += values
+    return make_etag(*parts), latest(*timestamps)
+
+
+class ConditionalGetMixin:
+    """ETag/Last-Modified for ``list`` and ``retrieve``, answered before serializing.
+
+    Validators come from ``get_conditional_querysets()``: for every
+    ``(queryset, fields)`` pair the row count and the latest value of each
+    field are read in one aggregate query. By default that is the filtered
+    queryset (narrowed to the requested object for ``retrieve``) and
+    ``conditional_fields``.
+    """
+    conditional_fields = ('updated_at',)
+
+    def get_conditional_querysets(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return [(queryset, self.conditional_fields)]
+
+    def conditional(self, request, view, *args, **kwargs):
+        """Run ``view`` unless the client's copy is still current"""
+        etag, last_modified = compute_validators(
+            [self.action, request.accepted_renderer.format],
+            self.get_conditional_querysets(),
+            require_rows=self.action == 'retrieve',
+        )
+        if etag is None:
+            return view(request, *args, **kwargs)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(view(request, *args, **kwargs), etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
@@ -1,3 +1,19 @@
 from django.db import models
 
-# Create your models here.
+
+class RevokedToken(models.Model):
+    """Refresh token that may no longer be used (see api/revocation.py).
+
+    A row is only needed until the token would have expired anyway;
+    ``purge_revoked_tokens`` deletes it after that.
+    """
+    jti = models.CharField(max_length=255, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Revoked Token'
+        verbose_name_plural = 'Revoked Tokens'
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,69 @@
+"""
+Revocation store for refresh tokens.
+
+With ``ROTATE_REFRESH_TOKENS`` and ``BLACKLIST_AFTER_ROTATION`` every refresh
+revokes the token it was made with. Only revoked tokens are recorded, by
+``jti``: in the default cache until the token would have expired, and as a
+``RevokedToken`` row, which survives cache loss and is shared by processes
+that do not share a cache. Checks read the cache and then the primary key;
+the insert itself rejects a token revoked concurrently, so a refresh token
+can be used once. ``purge_revoked_tokens`` deletes rows past expiry, so the
+table never holds more than a refresh lifetime's worth of rotations.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+
+def revoked_cache_key(jti):
+    return f'auth:revoked:{jti}'
+
+
+def remaining_lifetime(token):
+    """Seconds until ``token`` expires on its own"""
+    return token['exp'] - int(time.time())
+
+
+def revoke(token):
+    """Record ``token`` as revoked; False if it already was"""
+    ttl = remaining_lifetime(token)
+    if ttl <= 0:
+        return True
+    jti = token[api_settings.JTI_CLAIM]
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=jti, expires_at=datetime_from_epoch(token['exp']))
+    except IntegrityError:
+        return False
+    cache.set(revoked_cache_key(jti), True, ttl)
+    return True
+
+
+def is_revoked(token):
+    jti = token[api_settings.JTI_CLAIM]
+    if cache.get(revoked_cache_key(jti)):
+        return True
+    if RevokedToken.objects.filter(jti=jti).exists():
+        cache.set(revoked_cache_key(jti), True, max(remaining_lifetime(token), 1))
+        return True
+    return False
+
+
+class RevocableTokenMixin:
+    """Stands in for simplejwt's ``BlacklistMixin`` without its outstanding-token table"""
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if is_revoked(self):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        if not revoke(self):
+            raise TokenError(_('Token is blacklisted'))
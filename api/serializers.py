@@ -1,9 +1,17 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from catalog.models import Category, Product
+from django.core.files.storage import default_storage
+from catalog import images
+from catalog.cache import bump_generation
+from catalog.models import Category, Product, ProductImage
 from accounts.models import CustomerProfile, CustomerAddress
 from checkout.models import Order, OrderItem, Address
+from .authentication import ClaimsRefreshToken
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -52,6 +60,11 @@ class UserLoginSerializer(serializers.Serializer):
             raise serializers.ValidationError('Must include username and password')
 
 
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that revokes the token it used (see api/revocation.py)"""
+    token_class = ClaimsRefreshToken
+
+
 class CustomerProfileSerializer(serializers.ModelSerializer):
     """Customer profile serializer"""
     user = UserSerializer(read_only=True)
@@ -107,26 +120,102 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at', 'updated_at')
     
     def get_product_count(self, obj):
-        return obj.products.filter(is_active=True).count()
+        if hasattr(obj, 'active_product_count'):
+            return obj.active_product_count
+        return Product.objects.filter(category__path__startswith=obj.path, is_active=True).count()
     
     def get_children(self, obj):
-        children = obj.children.filter(is_active=True).order_by('sort_order', 'name')
+        children = getattr(obj, 'tree_children', None)
+        if children is None:
+            children = obj.children.filter(is_active=True).order_by('sort_order', 'name')
         return CategorySerializer(children, many=True, context=self.context).data
 
 
+class CategoryTreeSerializer(serializers.ModelSerializer):
+    """Nested category serializer that only reads prefetched data"""
+    product_count = serializers.IntegerField(source='active_product_count', read_only=True)
+    children = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Category
+        fields = ('id', 'name', 'slug', 'image', 'gender', 'sort_order',
+                 'product_count', 'children')
+    
+    def get_children(self, obj):
+        return CategoryTreeSerializer(obj.tree_children, many=True, context=self.context).data
+
+
+def link_category_tree(categories):
+    """Attach ``tree_children`` to each category and return the roots.
+
+    Categories whose parent is not in ``categories`` (e.g. inactive) are
+    left out together with their subtree.
+    """
+    by_id = {category.id: category for category in categories}
+    roots = []
+    for category in categories:
+        category.tree_children = []
+    for category in categories:
+        if category.parent_id is None:
+            roots.append(category)
+        elif category.parent_id in by_id:
+            by_id[category.parent_id].tree_children.append(category)
+    return roots
+
+
+def attach_category_tree(categories, tree_categories):
+    """Copy ``tree_children`` and ``active_product_count`` onto ``categories``.
+
+    ``tree_categories`` is ``category_tree_queryset()`` (api/views.py), so a
+    page of nested categories is serialized from that single query.
+    """
+    tree_categories = list(tree_categories)
+    link_category_tree(tree_categories)
+    by_id = {category.id: category for category in tree_categories}
+    for category in categories:
+        node = by_id.get(category.id)
+        category.tree_children = node.tree_children if node else []
+        category.active_product_count = node.active_product_count if node else 0
+
+
+def derivative_srcsets(manifest, request):
+    """srcset values per format with absolute URLs when a request is available"""
+    def url(name):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+    return {fmt: images.srcset(manifest, fmt, url) for fmt in images.DERIVATIVE_FORMATS}
+
+
+class ProductImageSerializer(serializers.ModelSerializer):
+    """Gallery image serializer"""
+    srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductImage
+        fields = ('id', 'file', 'external_url', 'alt_text', 'position', 'srcset')
+
+    def get_srcset(self, obj):
+        if not obj.derivatives_current:
+            return None
+        return derivative_srcsets(obj.derivatives, self.context.get('request'))
+
+
 class ProductSerializer(serializers.ModelSerializer):
     """Product serializer"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     category_slug = serializers.CharField(source='category.slug', read_only=True)
     discount_percentage = serializers.ReadOnlyField()
     stock_status = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    images = ProductImageSerializer(many=True, read_only=True)
     
     class Meta:
         model = Product
         fields = ('id', 'name', 'slug', 'description', 'short_description', 
                  'price_cents', 'compare_price_cents', 'sku', 'stock_quantity', 
                  'low_stock_threshold', 'track_inventory', 'weight_grams', 
-                 'image', 'thumbnail', 'is_featured', 'is_active', 'in_stock',
+                 'image', 'thumbnail', 'image_srcset', 'images', 'is_featured', 'is_active', 'in_stock',
                  'category', 'category_name', 'category_slug', 'discount_percentage',
                  'stock_status', 'created_at', 'updated_at')
         read_only_fields = ('created_at', 'updated_at', 'sku')
@@ -141,13 +230,19 @@ class ProductSerializer(serializers.ModelSerializer):
         else:
             return 'in_stock'
 
+    def get_image_srcset(self, obj):
+        """srcset values per format, empty until derivatives are generated"""
+        if not obj.derivatives_current:
+            return None
+        return derivative_srcsets(obj.image_derivatives, self.context.get('request'))
+
 
 class ProductListSerializer(ProductSerializer):
     """Simplified product serializer for list views"""
     class Meta(ProductSerializer.Meta):
         fields = ('id', 'name', 'slug', 'short_description', 'price_cents', 
                  'compare_price_cents', 'sku', 'stock_quantity', 'image', 
-                 'thumbnail', 'is_featured', 'is_active', 'in_stock',
+                 'thumbnail', 'image_srcset', 'is_featured', 'is_active', 'in_stock',
                  'category_name', 'category_slug', 'discount_percentage',
                  'stock_status', 'created_at')
 
@@ -161,8 +256,18 @@ class OrderAddressSerializer(serializers.ModelSerializer):
                  'county', 'postal_code', 'country', 'notes', 'created_at')
 
 
+class ProductField(serializers.PrimaryKeyRelatedField):
+    """Product primary key; products loaded beforehand are taken as they are"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, Product):
+            return data
+        return super().to_internal_value(data)
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     """Order item serializer"""
+    serializer_related_field = ProductField
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_sku = serializers.CharField(source='product.sku', read_only=True)
     product_image = serializers.ImageField(source='product.image', read_only=True)
@@ -171,7 +276,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ('id', 'product', 'product_name', 'product_sku', 'product_image',
                  'quantity', 'price_cents', 'total_cents', 'created_at')
-        read_only_fields = ('total_cents', 'created_at')
+        # The price is the product's at the time of the order
+        read_only_fields = ('price_cents', 'total_cents', 'created_at')
     
     def validate_quantity(self, value):
         if value <= 0:
@@ -179,6 +285,11 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return value
 
 
+def order_items_prefetch():
+    """Order items with their products, as the order serializers read them"""
+    return Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+
+
 class OrderSerializer(serializers.ModelSerializer):
     """Order serializer"""
     items = OrderItemSerializer(many=True, read_only=True)
@@ -202,6 +313,16 @@ class OrderSerializer(serializers.ModelSerializer):
                            'confirmed_at', 'shipped_at', 'delivered_at', 'cancelled_at')
 
 
+def raw_product_id(item):
+    """The product id of an order item as submitted, or None if it isn't one"""
+    value = item.get('product') if isinstance(item, dict) else None
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     """Order creation serializer"""
     items = OrderItemSerializer(many=True)
@@ -211,6 +332,18 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         model = Order
         fields = ('address', 'payment_method', 'notes', 'items')
     
+    def to_internal_value(self, data):
+        items = data.get('items') if hasattr(data, 'get') else None
+        if isinstance(items, list):
+            # One query for every item's product instead of one per item
+            ids = [raw_product_id(item) for item in items]
+            products = Product.objects.in_bulk({pk for pk in ids if pk is not None})
+            data = {**data, 'items': [
+                {**item, 'product': products[pk]} if pk in products else item
+                for item, pk in zip(items, ids)
+            ]}
+        return super().to_internal_value(data)
+    
     def validate_items(self, value):
         if not value:
             raise serializers.ValidationError("Order must have at least one item")
@@ -231,6 +364,7 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         
         return value
     
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         address_data = validated_data.pop('address')
@@ -239,39 +373,48 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         address = Address.objects.create(**address_data)
         
         # Create order
-        order = Order.objects.create(
-            address=address,
-            customer=self.context['request'].user if self.context['request'].user.is_authenticated else None,
-            **validated_data
-        )
+        user = self.context['request'].user
+        validated_data.setdefault('customer', user if user.is_authenticated else None)
+        order = Order.objects.create(address=address, **validated_data)
         
-        # Create order items and calculate totals
-        total_cents = 0
+        # Create order items and calculate totals. The items are inserted
+        # together, so OrderItem.save() doesn't recalculate the order per item
+        items = []
+        stocked = []
+        now = timezone.now()
         for item_data in items_data:
             product = item_data['product']
             quantity = item_data['quantity']
-            price_cents = product.price_cents
-            
-            OrderItem.objects.create(
+            items.append(OrderItem(
                 order=order,
                 product=product,
                 quantity=quantity,
-                price_cents=price_cents
-            )
-            
-            total_cents += price_cents * quantity
+                price_cents=product.price_cents,
+                total_cents=product.price_cents * quantity,
+            ))
             
             # Update product stock
             if product.track_inventory:
                 product.stock_quantity -= quantity
-                product.save(update_fields=['stock_quantity'])
+                product.updated_at = now
+                stocked.append(product)
+        OrderItem.objects.bulk_create(items)
+        if stocked:
+            Product.objects.bulk_update(stocked, ['stock_quantity', 'updated_at'])
+            # bulk_update() sends no post_save, which would have done this
+            bump_generation()
         
         # Update order totals
-        order.subtotal_cents = total_cents
-        order.total_cents = total_cents + order.shipping_cost_cents + order.tax_cents
+        order.subtotal_cents = sum(item.total_cents for item in items)
+        order.total_cents = order.subtotal_cents + order.shipping_cost_cents + order.tax_cents
         order.save(update_fields=['subtotal_cents', 'total_cents'])
         
+        prefetch_related_objects([order], order_items_prefetch())
         return order
+    
+    def to_representation(self, instance):
+        # Respond with the full order, number and totals included
+        return OrderSerializer(instance, context=self.context).data
 
 
 class CartItemSerializer(serializers.Serializer):
@@ -1,39 +1,60 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from django.utils import timezone
-import logging
+from django.core.cache import cache
+from django.db import transaction
 
-from checkout.models import Order, OrderItem
+from accounts.models import CustomerProfile
+from checkout.models import Order
 from catalog.models import Product
+from core import metrics
+from core.tasks import enqueue
+from .authentication import user_cache_key, user_changed
 
-logger = logging.getLogger(__name__)
+# Receivers only record outbox events or drop cache entries; the work itself
+# happens in api.tasks, run by the outbox worker outside the request.
 
 
 @receiver(post_save, sender=Order)
 def order_created_or_updated(sender, instance, created, **kwargs):
-    """Log order creation and updates"""
+    """Queue notifications for new orders and status changes"""
     if created:
-        logger.info(f"New order created: {instance.order_number} by {instance.customer}")
-    else:
-        logger.info(f"Order updated: {instance.order_number} - Status: {instance.status}")
-
-
-@receiver(post_save, sender=OrderItem)
-def order_item_created(sender, instance, created, **kwargs):
-    """Log order item creation"""
-    if created:
-        logger.info(f"Order item added: {instance.product.name} x {instance.quantity} to order {instance.order.order_number}")
+        enqueue('order.created', {'order_id': instance.pk})
+        payment_method = instance.payment_method
+        transaction.on_commit(lambda: metrics.count_order(payment_method), using=kwargs['using'])
+    elif instance.status_changed:
+        enqueue('order.status_changed', {
+            'order_id': instance.pk,
+            'old_status': instance._loaded_status,
+            'new_status': instance.status,
+        })
 
 
 @receiver(post_delete, sender=Product)
 def product_deleted(sender, instance, **kwargs):
-    """Log product deletion"""
-    logger.warning(f"Product deleted: {instance.name} (SKU: {instance.sku})")
+    """Queue product deletion audit"""
+    enqueue('product.deleted', {'name': instance.name, 'sku': instance.sku})
 
 
 @receiver(post_save, sender=User)
-def user_created(sender, instance, created, **kwargs):
-    """Log user creation"""
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    """Queue welcome handling for new users and drop stale cached copies"""
     if created:
-        logger.info(f"New user registered: {instance.username} ({instance.email})")
+        enqueue('user.created', {'user_id': instance.pk})
+    elif update_fields is not None and set(update_fields) == {'last_login'}:
+        # Logins only move last_login, which authentication doesn't look at
+        return
+    user_changed(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Stop authenticating API requests as a deleted user"""
+    user_changed(instance.pk)
+
+
+@receiver(post_save, sender=CustomerProfile)
+@receiver(post_delete, sender=CustomerProfile)
+def profile_saved_or_deleted(sender, instance, **kwargs):
+    """The profile is cached along with its user"""
+    cache.delete(user_cache_key(instance.user_id))
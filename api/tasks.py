@@ -0,0 +1,44 @@
+import logging
+
+from django.contrib.auth.models import User
+
+from checkout.models import Order
+from core.tasks import handler
+
+logger = logging.getLogger(__name__)
+
+
+@handler('order.created')
+def order_created(payload):
+    """Log order creation with its items"""
+    order = Order.objects.select_related('customer').filter(pk=payload['order_id']).first()
+    if order is None:
+        return
+    logger.info(f"New order created: {order.order_number} by {order.customer}")
+    for item in order.items.select_related('product'):
+        logger.info(f"Order item added: {item.product.name} x {item.quantity} to order {order.order_number}")
+
+
+@handler('order.status_changed')
+def order_status_changed(payload):
+    """Log order status transitions"""
+    order = Order.objects.filter(pk=payload['order_id']).only('order_number').first()
+    if order is None:
+        return
+    logger.info(
+        f"Order updated: {order.order_number} - Status: {payload['old_status']} -> {payload['new_status']}"
+    )
+
+
+@handler('product.deleted')
+def product_deleted(payload):
+    """Log product deletion"""
+    logger.warning(f"Product deleted: {payload['name']} (SKU: {payload['sku']})")
+
+
+@handler('user.created')
+def user_created(payload):
+    """Log user creation"""
+    user = User.objects.filter(pk=payload['user_id']).first()
+    if user is not None:
+        logger.info(f"New user registered: {user.username} ({user.email})")
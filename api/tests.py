@@ -8,6 +8,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from catalog.models import Category, Product
 from accounts.models import CustomerProfile
 from checkout.models import Order, OrderItem, Address
+from api.serializers import OrderSerializer
 
 
 class APITestCase(APITestCase):
@@ -230,6 +231,31 @@ class OrderAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertIn('order_number', response.data)
     
+    def test_create_order_responds_with_the_order(self):
+        """The created order is returned as the order detail endpoint shows it"""
+        url = reverse('api:order-list')
+        data = {
+            'address': {
+                'full_name': 'Test User',
+                'phone': '+254712345678',
+                'line1': '123 Test Street',
+                'city': 'Nairobi',
+                'county': 'Nairobi',
+                'country': 'Kenya'
+            },
+            'payment_method': 'cod',
+            'items': [{'product': self.product.id, 'quantity': 2}]
+        }
+        
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data), set(OrderSerializer.Meta.fields))
+        self.assertEqual(response.data['total_cents'], 20000 + response.data['shipping_cost_cents'] + response.data['tax_cents'])
+        self.assertEqual([item['quantity'] for item in response.data['items']], [2])
+        
+        detail = self.client.get(reverse('api:order-detail', kwargs={'pk': response.data['id']}))
+        self.assertEqual(response.data, detail.data)
+    
     def test_get_orders(self):
         """Test getting user orders"""
         # Create an order first
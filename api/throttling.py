@@ -1,31 +1,71 @@
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle, ScopedRateThrottle
+from rest_framework.throttling import BaseThrottle
 
+from core import ratelimit
 
-class LoginRateThrottle(UserRateThrottle):
+
+class SlidingWindowThrottle(BaseThrottle):
+    """DRF throttle on core.ratelimit; rates come from ``settings.RATE_LIMITS[scope]``.
+
+    ``methods`` restricts the throttle to some HTTP methods (all by default).
+    """
+    scope = None
+    methods = None
+
+    def allow_request(self, request, view):
+        self.usage = None
+        if self.methods is not None and request.method not in self.methods:
+            return True
+        if self.scope == ratelimit.ANON_SCOPE and request.user.is_authenticated:
+            return True
+        self.usage = ratelimit.hit(self.scope, ratelimit.client_ident(request, request.user))
+        if self.usage is None:
+            return True
+        ratelimit.note(request._request, self.usage)
+        return self.usage.allowed
+
+    def wait(self):
+        return self.usage.reset if self.usage is not None else None
+
+
+class AnonRateThrottle(SlidingWindowThrottle):
+    """Default limit for anonymous clients, by IP address"""
+    scope = 'anon'
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Default limit per user (per IP address for anonymous clients)"""
+    scope = 'user'
+
+
+class LoginRateThrottle(SlidingWindowThrottle):
     """Rate limiting for login attempts"""
     scope = 'login'
+    methods = ('POST',)
 
 
-class RegistrationRateThrottle(AnonRateThrottle):
+class RegistrationRateThrottle(SlidingWindowThrottle):
     """Rate limiting for registration attempts"""
     scope = 'registration'
+    methods = ('POST',)
 
 
-class CartRateThrottle(UserRateThrottle):
+class CartRateThrottle(SlidingWindowThrottle):
     """Rate limiting for cart operations"""
     scope = 'cart'
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
 
 
-class OrderRateThrottle(UserRateThrottle):
+class OrderRateThrottle(SlidingWindowThrottle):
     """Rate limiting for order operations"""
     scope = 'order'
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
 
 
-class ProductSearchRateThrottle(AnonRateThrottle):
+class ProductSearchRateThrottle(SlidingWindowThrottle):
     """Rate limiting for product search"""
     scope = 'search'
 
 
-class AdminRateThrottle(UserRateThrottle):
+class AdminRateThrottle(SlidingWindowThrottle):
     """Rate limiting for admin operations"""
     scope = 'admin'
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from core.routing import pick_view
+from . import async_views, views
 
 # Create router for viewsets
 router = DefaultRouter()
@@ -22,10 +23,17 @@ urlpatterns = [
     # User profile endpoints
     path('profile/', views.UserProfileView.as_view(), name='profile'),
     
+    # Catalog read endpoints with native async variants
+    path('categories/tree/', pick_view('api:category-tree', views.CategoryViewSet.as_view({'get': 'tree'}), async_views.category_tree), name='category-tree'),
+    
     # Cart endpoints
-    path('cart/', views.CartView.as_view(), name='cart'),
+    path('cart/', pick_view('api:cart', views.CartView.as_view(), async_views.cart), name='cart'),
     path('cart/to-order/', views.CartToOrderView.as_view(), name='cart-to-order'),
     
+    # Operations
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('requests/stats/', views.RequestStatsView.as_view(), name='request-stats'),
+    
     # Include router URLs
     path('', include(router.urls)),
 ]
@@ -1,45 +1,53 @@
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.db import transaction
 from django.db.models import Q, F
 from django_filters.rest_framework import DjangoFilterBackend
-from django.utils.decorators import method_decorator
-from django_ratelimit.decorators import ratelimit
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.conf import settings
 
-from catalog.models import Category, Product
+from catalog import facets as product_facets, recommendations
+from catalog.cache import catalog_cache, catalog_key, generation
+from catalog.fuzzy import fuzzy_search
+from catalog.models import Category, Product, subtree_product_count
+from catalog.typeahead import typeahead
 from accounts.models import CustomerProfile, CustomerAddress
 from checkout.models import Order, OrderItem
+from core import instrumentation, metrics, ratelimit
+from core.conditional import not_modified, set_validators
+from .authentication import tokens_for_user
+from .mixins import ConditionalGetMixin, compute_validators
+from .throttling import (
+    AdminRateThrottle, CartRateThrottle, LoginRateThrottle, OrderRateThrottle,
+    ProductSearchRateThrottle, RegistrationRateThrottle,
+)
 from .serializers import (
     UserSerializer, UserLoginSerializer, CustomerProfileSerializer,
     CustomerAddressSerializer, CategorySerializer, ProductSerializer,
     ProductListSerializer, OrderSerializer, OrderCreateSerializer,
-    CartItemSerializer, CartSerializer
+    CartItemSerializer, CartSerializer, CategoryTreeSerializer, attach_category_tree,
+    link_category_tree, order_items_prefetch,
 )
 
 
 class UserRegistrationView(APIView):
     """User registration endpoint"""
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [RegistrationRateThrottle]
     
-    @method_decorator(ratelimit(key='ip', rate='10/m', method='POST'))
     def post(self, request):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
-                'tokens': {
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                }
+                'tokens': tokens_for_user(user),
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -47,19 +55,15 @@ class UserRegistrationView(APIView):
 class UserLoginView(TokenObtainPairView):
     """User login endpoint with rate limiting"""
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginRateThrottle]
     
-    @method_decorator(ratelimit(key='ip', rate='20/m', method='POST'))
     def post(self, request, *args, **kwargs):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
-                'tokens': {
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                }
+                'tokens': tokens_for_user(user),
             })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -69,26 +73,52 @@ class UserProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        try:
-            profile = request.user.profile
-            serializer = CustomerProfileSerializer(profile)
-            return Response(serializer.data)
-        except CustomerProfile.DoesNotExist:
-            return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        profile = CustomerProfile.for_user(request.user)
+        serializer = CustomerProfileSerializer(profile)
+        return Response(serializer.data)
     
     def put(self, request):
-        try:
-            profile = request.user.profile
-            serializer = CustomerProfileSerializer(profile, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        except CustomerProfile.DoesNotExist:
-            return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        profile = CustomerProfile.for_user(request.user, fresh=True)
+        serializer = CustomerProfileSerializer(profile, data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def category_tree_queryset():
+    """Active categories annotated with their active product count, subcategories included"""
+    return Category.objects.filter(is_active=True).annotate(
+        active_product_count=subtree_product_count(is_active=True)
+    ).order_by('sort_order', 'name')
+
+
+def filters_key(query_params, ignored):
+    """The query parameters other than ``ignored``, normalized for cache keys"""
+    params = query_params.copy()
+    for name in ignored:
+        params.pop(name, None)
+    return sorted((name, sorted(values)) for name, values in params.lists())
+
+
+def category_tree_cache_key(request, renderer_format='json'):
+    # Image URLs in the payload are absolute, so the host is part of the key
+    return catalog_key('catalog', 'tree', renderer_format, request.scheme, request.get_host())
+
+
+def category_dependencies():
+    """Category payloads nest children and count products, so any of them can change them"""
+    return [
+        (Category.objects.all(), ('updated_at',)),
+        (Product.objects.all(), ('updated_at',)),
+    ]
+
+
+def category_tree_validators(renderer_format='json'):
+    return compute_validators(['tree', renderer_format], category_dependencies())
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Category viewset"""
     queryset = Category.objects.filter(is_active=True).order_by('sort_order', 'name')
     serializer_class = CategorySerializer
@@ -104,9 +134,39 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
         if self.action == 'list':
             queryset = queryset.filter(parent__isnull=True)
         return queryset
+    
+    def get_conditional_querysets(self):
+        return super().get_conditional_querysets() + category_dependencies()
+    
+    def get_serializer(self, *args, **kwargs):
+        if args and self.action in ('list', 'retrieve'):
+            # Nested children and product counts come from one tree query
+            categories = args[0] if kwargs.get('many') else [args[0]]
+            attach_category_tree(categories, category_tree_queryset())
+        return super().get_serializer(*args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """Full active category tree with product counts, in one query"""
+        # The validators are cached with the payload so that a cached tree is
+        # never sent with the ETag of a newer one
+        renderer_format = request.accepted_renderer.format
+        cache_key = category_tree_cache_key(request, renderer_format)
+        entry = catalog_cache().get(cache_key)
+        if entry is None:
+            etag, last_modified = category_tree_validators(renderer_format)
+            roots = link_category_tree(list(category_tree_queryset()))
+            data = CategoryTreeSerializer(roots, many=True, context={'request': request}).data
+            entry = (etag, last_modified, data)
+            catalog_cache().set(cache_key, entry)
+        etag, last_modified, data = entry
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(Response(data), etag, last_modified)
 
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Product viewset"""
     queryset = Product.objects.filter(is_active=True).select_related('category')
     permission_classes = [permissions.AllowAny]
@@ -115,19 +175,25 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['name', 'description', 'short_description', 'sku', 'category__name']
     ordering_fields = ['name', 'price_cents', 'created_at', 'stock_quantity']
     ordering = ['-created_at']
+    # Payloads include the category name and slug
+    conditional_fields = ('updated_at', 'category__updated_at')
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'also_bought'):
             return ProductListSerializer
         return ProductSerializer
     
     def get_queryset(self):
         queryset = super().get_queryset()
+        if self.get_serializer_class() is ProductSerializer:
+            # Gallery images for every product in one extra query
+            queryset = queryset.prefetch_related('images')
         
-        # Filter by category slug
+        # Filter by category slug, including the categories below it
         category_slug = self.request.query_params.get('category_slug')
         if category_slug:
-            queryset = queryset.filter(category__slug=category_slug)
+            path = Category.objects.filter(slug=category_slug).values_list('path', flat=True).first()
+            queryset = queryset.filter(category__path__startswith=path) if path else queryset.none()
         
         # Filter by price range
         min_price = self.request.query_params.get('min_price')
@@ -144,6 +210,11 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 Q(track_inventory=False) | Q(stock_quantity__gt=0)
             )
         
+        # Facet selections (material, carat, ...); the facets action counts
+        # them itself so that each facet ignores its own selection
+        if self.action != 'facets':
+            queryset = product_facets.apply(queryset, product_facets.selected(self.request.query_params))
+        
         return queryset
     
     @action(detail=False, methods=['get'])
@@ -153,28 +224,69 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(featured_products, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'], url_path='also-bought')
+    def also_bought(self, request, pk=None):
+        """Products often bought with this one, topped up with its category's bestsellers"""
+        products = recommendations.also_bought(self.get_object())
+        return Response(self.get_serializer(products, many=True).data)
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Counts per material, carat, stone, collection and price bucket for the current filters"""
+        queryset = self.filter_queryset(self.get_queryset())
+        key = filters_key(
+            request.query_params, ('page', 'page_size', 'ordering', *(facet.name for facet in product_facets.FACETS))
+        )
+        return Response(product_facets.facet_counts(queryset, product_facets.selected(request.query_params), key))
+    
     @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Suggestions for a search box: products, SKUs, categories and tags by prefix"""
+        try:
+            limit = int(request.query_params.get('limit', 8))
+        except ValueError:
+            limit = 8
+        query = request.query_params.get('q', '')
+        return Response({'query': query, 'results': typeahead.suggest(query, limit)})
+    
+    @action(detail=False, methods=['get'],
+            throttle_classes=[*api_settings.DEFAULT_THROTTLE_CLASSES, ProductSearchRateThrottle])
     def search(self, request):
-        """Enhanced search endpoint"""
+        """Enhanced search endpoint.
+
+        ``fuzzy=true`` ranks typo-tolerant matches (see catalog.fuzzy),
+        ``fuzzy=false`` only returns exact substring matches, and by default
+        the fuzzy matches are returned when there are no exact ones.
+        """
         query = request.query_params.get('q', '').strip()
         if not query:
             return Response({'error': 'Search query is required'}, status=status.HTTP_400_BAD_REQUEST)
+        fuzzy = request.query_params.get('fuzzy', 'auto').lower()
+        if fuzzy not in ('true', 'false'):
+            fuzzy = 'auto'
         
-        # Cache search results for 5 minutes
-        cache_key = f"product_search_{hash(query)}"
-        cached_results = cache.get(cache_key)
+        # Cache search results for 5 minutes (or until the catalog changes),
+        # per query and the filters get_queryset() applies
+        search_cache = catalog_cache()
+        filters = filters_key(request.query_params, ('q', 'fuzzy', 'page', 'page_size', 'ordering'))
+        cache_key = catalog_key('search', query, fuzzy, filters)
+        cached_results = search_cache.get(cache_key)
         
         if cached_results is None:
-            products = self.get_queryset().filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(short_description__icontains=query) |
-                Q(sku__icontains=query) |
-                Q(category__name__icontains=query)
-            )
+            products = None
+            if fuzzy != 'true':
+                products = self.get_queryset().filter(
+                    Q(name__icontains=query) |
+                    Q(description__icontains=query) |
+                    Q(short_description__icontains=query) |
+                    Q(sku__icontains=query) |
+                    Q(category__name__icontains=query)
+                )
+            if fuzzy == 'true' or (fuzzy == 'auto' and not products):
+                products = fuzzy_search(self.get_queryset(), query)
             serializer = self.get_serializer(products, many=True)
             cached_results = serializer.data
-            cache.set(cache_key, cached_results, 300)  # 5 minutes
+            search_cache.set(cache_key, cached_results, 300)  # 5 minutes
         
         return Response(cached_results)
 
@@ -202,6 +314,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     filterset_fields = ['status', 'payment_status', 'payment_method']
     ordering_fields = ['created_at', 'total_cents']
     ordering = ['-created_at']
+    throttle_classes = [*api_settings.DEFAULT_THROTTLE_CLASSES, OrderRateThrottle]
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -209,7 +322,9 @@ class OrderViewSet(viewsets.ModelViewSet):
         return OrderSerializer
     
     def get_queryset(self):
-        return Order.objects.filter(customer=self.request.user).select_related('address')
+        return Order.objects.filter(customer=self.request.user).select_related(
+            'customer', 'address'
+        ).prefetch_related(order_items_prefetch())
     
     def perform_create(self, serializer):
         serializer.save(customer=self.request.user)
@@ -225,25 +340,73 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
         
         reason = request.data.get('reason', '')
-        order.cancel_order(reason)
+        with transaction.atomic():
+            order.cancel_order(reason)
         
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
 
+def cart_cache_key(user, session):
+    """Cache key holding the API cart of a user or anonymous session.
+
+    None for anonymous clients without a session, who have no cart yet.
+    """
+    if user.is_authenticated:
+        return f"cart:user:{user.id}"
+    if session.session_key is None:
+        return None
+    return f"cart:session:{session.session_key}"
+
+
+def build_cart_data(cart, products):
+    """Serialize ``cart`` against a mapping of product id to active product.
+
+    Lines whose product is missing from ``products`` are dropped from ``cart``.
+    """
+    items = []
+    total_cents = 0
+    
+    for product_id, quantity in list(cart.items()):
+        product = products.get(int(product_id))
+        if product is None:
+            del cart[product_id]
+            continue
+        
+        item_total = product.price_cents * quantity
+        total_cents += item_total
+        items.append({
+            'product_id': product.id,
+            'product_name': product.name,
+            'product_slug': product.slug,
+            'product_image': product.image.url if product.image else None,
+            'price_cents': product.price_cents,
+            'quantity': quantity,
+            'total_cents': item_total,
+        })
+    
+    return CartSerializer({
+        'items': items,
+        'total_items': sum(cart.values()),
+        'total_cents': total_cents,
+        'total_display': f"KES {total_cents / 100:,.2f}"
+    }).data
+
+
 class CartView(APIView):
     """Session-based cart management"""
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [*api_settings.DEFAULT_THROTTLE_CLASSES, CartRateThrottle]
     
     def get_cart_key(self, request):
         """Get cart key for session or user"""
-        if request.user.is_authenticated:
-            return f"cart_user_{request.user.id}"
-        return f"cart_session_{request.session.session_key}"
+        return cart_cache_key(request.user, request.session)
     
     def get_cart(self, request):
         """Get cart from cache or session"""
         cart_key = self.get_cart_key(request)
+        if cart_key is None:
+            return {}
         cart = cache.get(cart_key, {})
         
         # If no cart in cache, try to get from session
@@ -254,6 +417,9 @@ class CartView(APIView):
     
     def save_cart(self, request, cart):
         """Save cart to cache and session"""
+        if self.get_cart_key(request) is None:
+            # First cart write of an anonymous client starts its session
+            request.session.create()
         cart_key = self.get_cart_key(request)
         cache.set(cart_key, cart, 86400)  # 24 hours
         
@@ -264,39 +430,15 @@ class CartView(APIView):
     def get(self, request):
         """Get cart contents"""
         cart = self.get_cart(request)
+        line_count = len(cart)
+        products = Product.objects.filter(is_active=True).in_bulk(list(cart))
+        data = build_cart_data(cart, products)
         
-        # Convert cart to detailed format
-        items = []
-        total_cents = 0
-        
-        for product_id, quantity in cart.items():
-            try:
-                product = Product.objects.get(id=product_id, is_active=True)
-                item_total = product.price_cents * quantity
-                total_cents += item_total
-                
-                items.append({
-                    'product_id': product.id,
-                    'product_name': product.name,
-                    'product_slug': product.slug,
-                    'product_image': product.image.url if product.image else None,
-                    'price_cents': product.price_cents,
-                    'quantity': quantity,
-                    'total_cents': item_total,
-                })
-            except Product.DoesNotExist:
-                # Remove invalid products from cart
-                del cart[product_id]
-                self.save_cart(request, cart)
-        
-        serializer = CartSerializer({
-            'items': items,
-            'total_items': sum(cart.values()),
-            'total_cents': total_cents,
-            'total_display': f"KES {total_cents / 100:,.2f}"
-        })
+        # Remove invalid products from cart
+        if len(cart) != line_count:
+            self.save_cart(request, cart)
         
-        return Response(serializer.data)
+        return Response(data)
     
     def post(self, request):
         """Add item to cart"""
@@ -320,6 +462,7 @@ class CartView(APIView):
                 
                 cart[str(product_id)] = new_quantity
                 self.save_cart(request, cart)
+                metrics.count_cart('add', 'api')
                 
                 return Response({'message': 'Item added to cart'}, status=status.HTTP_201_CREATED)
             except Product.DoesNotExist:
@@ -358,6 +501,7 @@ class CartView(APIView):
             cart = self.get_cart(request)
             cart[str(product_id)] = quantity
             self.save_cart(request, cart)
+            metrics.count_cart('update', 'api')
             
             return Response({'message': 'Cart updated'})
         except Product.DoesNotExist:
@@ -377,6 +521,7 @@ class CartView(APIView):
             if str(product_id) in cart:
                 del cart[str(product_id)]
                 self.save_cart(request, cart)
+                metrics.count_cart('remove', 'api')
                 return Response({'message': 'Item removed from cart'})
             else:
                 return Response(
@@ -387,12 +532,14 @@ class CartView(APIView):
             # Clear entire cart
             cart.clear()
             self.save_cart(request, cart)
+            metrics.count_cart('clear', 'api')
             return Response({'message': 'Cart cleared'})
 
 
 class CartToOrderView(APIView):
     """Convert cart to order"""
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [*api_settings.DEFAULT_THROTTLE_CLASSES, OrderRateThrottle]
     
     def post(self, request):
         """Create order from cart"""
@@ -414,18 +561,18 @@ class CartToOrderView(APIView):
         }
         
         # Convert cart items to order items
+        products = Product.objects.filter(is_active=True).in_bulk(list(cart))
         for product_id, quantity in cart.items():
-            try:
-                product = Product.objects.get(id=product_id, is_active=True)
-                order_data['items'].append({
-                    'product': product.id,
-                    'quantity': quantity
-                })
-            except Product.DoesNotExist:
+            product = products.get(int(product_id))
+            if product is None:
                 return Response(
                     {'error': f'Product {product_id} not found'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            order_data['items'].append({
+                'product': product,
+                'quantity': quantity
+            })
         
         # Create order
         serializer = OrderCreateSerializer(data=order_data, context={'request': request})
@@ -445,9 +592,10 @@ class CartToOrderView(APIView):
 
 class AdminOrderViewSet(viewsets.ModelViewSet):
     """Admin order management"""
-    queryset = Order.objects.all().select_related('customer', 'address')
+    queryset = Order.objects.all().select_related('customer', 'address').prefetch_related(order_items_prefetch())
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAdminUser]
+    throttle_classes = [AdminRateThrottle]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'payment_status', 'payment_method', 'customer']
     search_fields = ['order_number', 'customer__username', 'customer__email', 'address__full_name']
@@ -477,7 +625,41 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
         elif new_status == 'delivered' and not order.delivered_at:
             order.delivered_at = timezone.now()
         
-        order.save()
+        # The outbox event for the status change commits with the order
+        with transaction.atomic():
+            order.save()
         
         serializer = self.get_serializer(order)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class CacheStatsView(APIView):
+    """Hit/miss counters of this process's caches and rate limits, for staff"""
+    permission_classes = [permissions.IsAdminUser]
+    throttle_classes = [AdminRateThrottle]
+    
+    def get(self, request):
+        stats = {}
+        for alias in settings.CACHES:
+            backend = caches[alias]
+            stats[alias] = backend.stats() if hasattr(backend, 'stats') else {
+                'backend': f"{type(backend).__module__}.{type(backend).__name__}"
+            }
+        return Response({
+            'version': settings.CACHE_VERSION,
+            'catalog_generation': generation(),
+            'caches': stats,
+            'rate_limits': ratelimit.stats(),
+        })
+
+
+class RequestStatsView(APIView):
+    """Per-route request timing, query and cache histograms of this process, for staff"""
+    permission_classes = [permissions.IsAdminUser]
+    throttle_classes = [AdminRateThrottle]
+    
+    def get(self, request):
+        return Response({
+            'slow_request_ms': settings.SLOW_REQUEST_MS,
+            'routes': instrumentation.route_stats(),
+        })
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Compare sync and native async read views under uvicorn.
+
+Starts the ASGI app twice, once with ASYNC_VIEWS empty and once with "*", and
+fires concurrent GET requests at the hot read endpoints:
+
+    python benchmarks/asgi_concurrency.py --concurrency 64 --requests 2000
+
+Run `manage.py migrate` and `manage.py populate_jewellery_data` first so the
+endpoints have data to serve. DATABASE_URL and other settings come from the
+environment as usual. The anonymous DRF throttle is lifted for both runs so
+that rejected requests do not skew the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_PATHS = [
+    "/shop/",
+    "/shop/p/classic-gold-wedding-ring/",
+    "/cart/count/",
+    "/api/v1/categories/tree/",
+    "/api/v1/cart/",
+]
+
+
+async def fetch(host, port, path):
+    """Issue one HTTP/1.1 GET and return (status, seconds)"""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    status = int(response.split(b" ", 2)[1]) if response else 0
+    return status, time.perf_counter() - started
+
+
+async def hammer(host, port, paths, total, concurrency):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            try:
+                status, elapsed = await fetch(host, port, path)
+            except OSError:
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "requests_per_second": round(total / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            asyncio.run(fetch(host, port, "/cart/count/"))
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"uvicorn did not start on {host}:{port}")
+
+
+def run_mode(mode, args):
+    env = dict(
+        os.environ,
+        ASYNC_VIEWS="*" if mode == "async" else "",
+        DEBUG="false",
+        THROTTLE_ANON_RATE="1000000/hour",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "tac_ecomm.asgi:application",
+         "--host", args.host, "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=BASE_DIR, env=env,
+    )
+    try:
+        wait_for_port(args.host, args.port)
+        return asyncio.run(hammer(args.host, args.port, args.paths, args.requests, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    args = parser.parse_args()
+
+    results = {mode: run_mode(mode, args) for mode in ("sync", "async")}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Time storefront and API endpoints against a large synthetic dataset.
+
+Creates a throwaway test database, fills it with `manage.py
+generate_synthetic_data` (same seed, same data), then requests every endpoint
+through the Django test client and reports latency percentiles and queries
+per request as JSON, tagged with the current commit so runs can be compared:
+
+    python benchmarks/endpoints.py --products 20000 --requests 200 --output before.json
+    git checkout my-branch
+    python benchmarks/endpoints.py --products 20000 --requests 200 --output after.json
+
+Rate limits are off. Caches stay warm between requests unless --cold clears
+them before each one. Requests that fail are counted under "errors" and left
+out of the timings.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def endpoints(data):
+    """``name -> (method, path, user, body)``; ``user`` is None or "customer" """
+    product, order = data["product"], data["order"]
+    return {
+        "product_list": ("get", "/shop/", None, None),
+        "product_list_search": ("get", "/shop/?q=ring", None, None),
+        "product_detail": ("get", f"/shop/p/{product.slug}/", None, None),
+        "cart_view": ("get", "/cart/", None, None),
+        "confirm_view": ("get", "/checkout/confirm/", None, None),
+        "api_products": ("get", "/api/v1/products/", None, None),
+        "api_product_detail": ("get", f"/api/v1/products/{product.pk}/", None, None),
+        "api_product_search": ("get", "/api/v1/products/search/?q=ring", None, None),
+        "api_categories": ("get", "/api/v1/categories/", None, None),
+        "api_category_tree": ("get", "/api/v1/categories/tree/", None, None),
+        "api_cart": ("get", "/api/v1/cart/", "customer", None),
+        "api_orders": ("get", "/api/v1/orders/", "customer", None),
+        "api_order_detail": ("get", f"/api/v1/orders/{order.pk}/", "customer", None),
+    }
+
+
+def seed(options):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+
+    from catalog.models import Product
+    from checkout.models import Order
+
+    started = time.perf_counter()
+    call_command(
+        "generate_synthetic_data", prefix="bench", seed=options.seed, categories=options.categories,
+        products=options.products, tags=options.tags, users=options.users, orders=options.orders, verbosity=0,
+    )
+    seconds = time.perf_counter() - started
+    order = Order.objects.filter(customer__isnull=False).order_by("pk").first()
+    return {
+        "customer": User.objects.get(pk=order.customer_id),
+        "order": order,
+        "product": Product.objects.filter(is_active=True).order_by("pk").first(),
+        "cart": list(Product.objects.filter(is_active=True).order_by("pk")[:options.cart_lines]),
+        "seed_seconds": round(seconds, 2),
+    }
+
+
+def make_client(data, user):
+    from django.core.cache import cache
+    from django.test import Client
+
+    client = Client(raise_request_exception=False)
+    if user:
+        client.force_login(data[user])
+        cache.set(f"cart:user:{data[user].pk}", {str(p.pk): 1 for p in data["cart"]}, None)
+    session = client.session
+    session["cart"] = {p.slug: 1 for p in data["cart"]}
+    session["address_data"] = {
+        "full_name": "Bench", "phone": "0700000000", "line1": "Moi Avenue",
+        "city": "Nairobi", "county": "Nairobi", "country": "Kenya",
+    }
+    session.save()
+    return client
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return round(sorted_values[index], 2)
+
+
+def measure(client, method, path, body, requests, warmup, cold):
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from django.conf import settings
+
+    for _ in range(warmup):
+        getattr(client, method)(path, body)
+
+    timings, queries, errors = [], [], 0
+    for _ in range(requests):
+        if cold:
+            for alias in settings.CACHES:
+                caches[alias].clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, body)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            errors += 1
+            continue
+        timings.append(elapsed)
+        queries.append(len(captured))
+
+    if not timings:
+        return {"errors": errors}
+    timings.sort()
+    return {
+        "p50_ms": percentile(timings, 0.50),
+        "p95_ms": percentile(timings, 0.95),
+        "p99_ms": percentile(timings, 0.99),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "errors": errors,
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--tags", type=int, default=100)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--cart-lines", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests per endpoint first")
+    parser.add_argument("--cold", action="store_true", help="clear the caches before every request")
+    parser.add_argument("--endpoint", action="append", dest="only", help="repeatable; defaults to all")
+    parser.add_argument("--output", help="write the JSON here as well as to stdout")
+    options = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tac_ecomm.settings")
+    os.environ.setdefault("ALLOWED_HOSTS", "testserver")
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    settings.RATE_LIMITS = {}
+    runner = DiscoverRunner(verbosity=0)
+    databases = runner.setup_databases()
+    try:
+        data = seed(options)
+        results = {}
+        for name, (method, path, user, body) in endpoints(data).items():
+            if options.only and name not in options.only:
+                continue
+            client = make_client(data, user)
+            results[name] = {"path": path, **measure(
+                client, method, path, body, options.requests, options.warmup, options.cold,
+            )}
+    finally:
+        runner.teardown_databases(databases)
+
+    report = {
+        "commit": commit(),
+        "database": settings.DATABASES["default"]["ENGINE"].rsplit(".", 1)[-1],
+        "dataset": {
+            key: getattr(options, key) for key in ("categories", "products", "tags", "users", "orders", "cart_lines", "seed")
+        },
+        "seed_seconds": data["seed_seconds"],
+        "requests": options.requests,
+        "cold_cache": options.cold,
+        "endpoints": results,
+    }
+    output = json.dumps(report, indent=2)
+    if options.output:
+        Path(options.output).write_text(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Count the queries JWT authentication adds to authenticated API requests.
+
+Creates a throwaway test database with one customer, their profile and a few
+orders, then requests each path with a bearer token in three modes:
+
+  stock    rest_framework_simplejwt's JWTAuthentication, a user query per request
+  cached   CachedJWTAuthentication, the user and profile from the cache
+  claims   CachedJWTAuthentication with JWT_EMBED_USER_CLAIMS
+
+    python benchmarks/jwt_auth_queries.py --requests 200
+
+Queries are averaged over the requests after the first (which warms the
+cache); the total time includes the whole request cycle.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "stock": ("rest_framework_simplejwt.authentication.JWTAuthentication", False),
+    "cached": ("api.authentication.CachedJWTAuthentication", False),
+    "claims": ("api.authentication.CachedJWTAuthentication", True),
+}
+
+
+def seed():
+    from django.contrib.auth.models import User
+
+    from checkout.models import Address, Order
+
+    user = User.objects.create_user("bench", "bench@example.com", "bench-password", first_name="Bench")
+    for _ in range(3):
+        address = Address.objects.create(
+            full_name="Bench", phone="0700000000", line1="Moi Avenue", city="Nairobi", county="Nairobi", country="Kenya",
+        )
+        Order.objects.create(customer=user, address=address, total_cents=1000)
+    return user
+
+
+def measure(user, paths, requests, auth_class, embed_claims):
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils.module_loading import import_string
+    from rest_framework.authentication import SessionAuthentication
+    from rest_framework.test import APIClient
+    from rest_framework.views import APIView
+
+    from api.authentication import tokens_for_user
+
+    # Views read the class attribute set from DEFAULT_AUTHENTICATION_CLASSES at import
+    APIView.authentication_classes = [import_string(auth_class), SessionAuthentication]
+    settings.JWT_EMBED_USER_CLAIMS = embed_claims
+    cache.clear()
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(user)['access']}")
+    results = {}
+    for path in paths:
+        if client.get(path).status_code != 200:
+            raise SystemExit(f"GET {path} failed")
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests):
+                client.get(path)
+        elapsed = time.perf_counter() - started
+        results[path] = {
+            "queries_per_request": round(len(queries) / requests, 2),
+            "ms_per_request": round(elapsed * 1000 / requests, 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", action="append", dest="paths", help="repeatable; defaults to profile and orders")
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+    paths = args.paths or ["/api/v1/profile/", "/api/v1/orders/"]
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tac_ecomm.settings")
+    os.environ.setdefault("THROTTLE_USER_RATE", "1000000/hour")
+    os.environ.setdefault("ALLOWED_HOSTS", "testserver")
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    databases = runner.setup_databases()
+    try:
+        user = seed()
+        results = {
+            mode: measure(user, paths, args.requests, auth_class, embed_claims)
+            for mode, (auth_class, embed_claims) in MODES.items()
+        }
+    finally:
+        runner.teardown_databases(databases)
+
+    for path in paths:
+        stock = results["stock"][path]["queries_per_request"]
+        for mode in ("cached", "claims"):
+            results[mode][path]["queries_saved"] = round(stock - results[mode][path]["queries_per_request"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test of the API, built on api_client_example.TACAPIClient.
+
+Every virtual user is a thread with its own client and account. Once all of
+them have signed in, each repeatedly runs a scenario picked at random by
+weight:
+
+  browse       list products, open two of them
+  search       search for a word from the catalog
+  add_to_cart  list products, add one to the cart, view the cart
+  checkout     add a product to the cart and turn the cart into an order
+
+Requests are timed per endpoint (ids in paths are replaced by {id}) and the
+report gives throughput, p50/p95/p99 latency and error rates, as a table or
+as JSON. Either point it at a running server, or let it start one with
+uvicorn (rate limits off unless --rate-limits):
+
+    python benchmarks/load_test.py --start --users 20 --duration 30
+    python benchmarks/load_test.py --base-url http://localhost:8000/api/v1 --mix browse=80,checkout=20
+
+The database needs active products in stock, e.g. from `manage.py
+generate_synthetic_data`. Virtual users register as load-<run>-<n>, or log in
+as existing accounts with --login-prefix (generate_synthetic_data creates
+synthetic-user-<n> with the password synthetic-password).
+"""
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import requests  # noqa: E402
+
+from api_client_example import TACAPIClient  # noqa: E402
+
+DEFAULT_MIX = {"browse": 60, "search": 20, "add_to_cart": 15, "checkout": 5}
+ADDRESS = {
+    "full_name": "Load Test", "phone": "0700000000", "line1": "Moi Avenue",
+    "city": "Nairobi", "county": "Nairobi", "country": "Kenya",
+}
+_ID = re.compile(r"/\d+(?=/|$)")
+
+
+class Recorder:
+    """Latencies and errors per endpoint, for one virtual user"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.scenarios = defaultdict(int)
+        self.failed_scenarios = defaultdict(int)
+
+    def merge(self, other):
+        for endpoint, values in other.latencies.items():
+            self.latencies[endpoint].extend(values)
+        for target, source in ((self.errors, other.errors), (self.scenarios, other.scenarios),
+                               (self.failed_scenarios, other.failed_scenarios)):
+            for key, count in source.items():
+                target[key] += count
+
+
+class TimedSession(requests.Session):
+    """``requests.Session`` that records every request in a ``Recorder``"""
+
+    def __init__(self, recorder):
+        super().__init__()
+        self.recorder = recorder
+
+    def request(self, method, url, *args, **kwargs):
+        endpoint = f"{method.upper()} {_ID.sub('/{id}', urlsplit(url).path)}"
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            self.recorder.errors[endpoint] += 1
+            self.recorder.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+            raise
+        self.recorder.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.recorder.errors[endpoint] += 1
+        return response
+
+
+class Clock:
+    """Starts the run once every virtual user has signed in"""
+
+    def __init__(self, users, seconds):
+        self.seconds = seconds
+        self.started = self.deadline = None
+        self.barrier = threading.Barrier(users, action=self.start)
+
+    def start(self):
+        self.started = time.monotonic()
+        self.deadline = self.started + self.seconds
+
+
+class VirtualUser(threading.Thread):
+    """Signs in, waits for every other user to, then runs scenarios until ``clock.deadline``"""
+
+    def __init__(self, index, options, catalog, clock):
+        super().__init__(daemon=True)
+        self.index = index
+        self.options = options
+        self.catalog = catalog
+        self.clock = clock
+        self.recorder = Recorder()
+        self.rng = random.Random(options.seed + index)
+        self.client = TACAPIClient(options.base_url)
+        self.client.session = TimedSession(self.recorder)
+
+    def sign_in(self):
+        options = self.options
+        if options.login_prefix:
+            number = self.index % options.login_count
+            self.client.login(f"{options.login_prefix}-user-{number}", f"{options.login_prefix}-password")
+        else:
+            name = f"load-{options.run}-{self.index}"
+            self.client.register(name, f"{name}@example.com", "Load", "Test", "load-test-password")
+
+    def run(self):
+        try:
+            self.sign_in()
+            signed_in = True
+        except requests.RequestException:
+            self.recorder.failed_scenarios["sign_in"] += 1
+            signed_in = False
+        # Sign-ups hash passwords and are slow; they are not part of the timed run
+        self.clock.barrier.wait()
+        self.recorder.latencies.clear()
+        self.recorder.errors.clear()
+        if not signed_in:
+            return
+        time.sleep(self.options.ramp_up * self.index / self.options.users)
+        names, weights = zip(*self.options.mix.items())
+        while time.monotonic() < self.clock.deadline:
+            scenario = self.rng.choices(names, weights)[0]
+            self.recorder.scenarios[scenario] += 1
+            try:
+                getattr(self, scenario)()
+            except requests.RequestException:
+                self.recorder.failed_scenarios[scenario] += 1
+            if self.options.think:
+                time.sleep(self.rng.uniform(0, 2 * self.options.think))
+
+    def product_id(self):
+        return self.rng.choice(self.catalog["ids"])
+
+    def browse(self):
+        self.client.get_products(page=self.rng.randint(1, self.catalog["pages"]))
+        for _ in range(2):
+            self.client.get_product(self.product_id())
+
+    def search(self):
+        self.client.search_products(self.rng.choice(self.catalog["words"]))
+
+    def add_to_cart(self):
+        self.client.get_products()
+        self.client.add_to_cart(self.product_id())
+        self.client.get_cart()
+
+    def checkout(self):
+        self.client.add_to_cart(self.product_id())
+        self.client.create_order(ADDRESS, payment_method=self.rng.choice(["cod", "mpesa", "card"]))
+
+
+def load_catalog(base_url):
+    """Product ids and search words from the first page of in-stock products"""
+    client = TACAPIClient(base_url)
+    page = client.get_products(in_stock="true")
+    products = page["results"]
+    if not products:
+        raise SystemExit("No products in stock; seed the database first (manage.py generate_synthetic_data)")
+    words = sorted({word.lower() for product in products for word in product["name"].split() if word.isalpha()})
+    page_size = len(products)
+    return {
+        "ids": [product["id"] for product in products],
+        "words": words or ["ring"],
+        "pages": max(1, -(-page["count"] // page_size)),
+    }
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return round(sorted_values[index], 1)
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "error_rate": round(recorder.errors[endpoint] / len(values), 4),
+        }
+    total = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "seconds": round(elapsed, 1),
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "error_rate": round(sum(recorder.errors.values()) / total, 4) if total else 0,
+        "scenarios": {
+            name: {"runs": runs, "failed": recorder.failed_scenarios[name]}
+            for name, runs in sorted(recorder.scenarios.items())
+        },
+        "endpoints": endpoints,
+    }
+
+
+def print_table(report):
+    print(f"{report['requests']} requests in {report['seconds']}s: {report['rps']} req/s, "
+          f"{report['error_rate']:.2%} errors")
+    print(f"{'endpoint':<36}{'requests':>9}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'errors':>8}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<36}{row['requests']:>9}{row['rps']:>8}{row['p50_ms']:>8}{row['p95_ms']:>8}"
+              f"{row['p99_ms']:>8}{row['error_rate']:>8.2%}")
+    for name, row in report["scenarios"].items():
+        print(f"scenario {name}: {row['runs']} runs, {row['failed']} failed")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(options):
+    """Start uvicorn on a free port and point ``options.base_url`` at it"""
+    port = free_port()
+    env = {**os.environ, "DEBUG": os.environ.get("DEBUG", "false"), "ALLOWED_HOSTS": "127.0.0.1,localhost"}
+    if not options.rate_limits:
+        env["RATE_LIMITS_ENABLED"] = "false"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "tac_ecomm.asgi:application", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(options.workers), "--log-level", "warning"],
+        cwd=BASE_DIR, env=env,
+    )
+    options.base_url = f"http://127.0.0.1:{port}/api/v1"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("The server exited during startup")
+        try:
+            requests.get(f"{options.base_url}/", timeout=1)
+            return server
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("The server did not start within 30 seconds")
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--start", action="store_true", help="start a local uvicorn server for the run")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn workers with --start")
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limits on with --start")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--ramp-up", type=float, default=0, help="seconds over which users start")
+    parser.add_argument("--think", type=float, default=0, help="mean pause between scenarios, seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. browse=60,search=20,checkout=5")
+    parser.add_argument("--login-prefix", help="log in as <prefix>-user-<n> instead of registering")
+    parser.add_argument("--login-count", type=int, default=1000, help="accounts available with --login-prefix")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    options = parser.parse_args()
+    options.run = uuid.uuid4().hex[:6]
+
+    server = start_server(options) if options.start else None
+    try:
+        catalog = load_catalog(options.base_url)
+        clock = Clock(options.users, options.ramp_up + options.duration)
+        users = [VirtualUser(index, options, catalog, clock) for index in range(options.users)]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.monotonic() - clock.started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    recorder = Recorder()
+    for user in users:
+        recorder.merge(user.recorder)
+    report = summarize(recorder, elapsed)
+    report["users"] = options.users
+    report["mix"] = options.mix
+    if options.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+
+
+if __name__ == "__main__":
+    main()
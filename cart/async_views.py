@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.http import JsonResponse
+
+from .views import CART_KEY
+
+
+async def cart_count(request):
+    """Return cart count as JSON without leaving the event loop"""
+    cart = {}
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        cart = await request.session.aget(CART_KEY) or {}
+
+    return JsonResponse({
+        'cart_count': sum(cart.values()),
+        'cart_items': len(cart),
+    })
@@ -1,5 +1,6 @@
 from django.urls import path
-from . import views
+from core.routing import pick_view
+from . import async_views, views
 
 app_name = "cart"
 urlpatterns = [
@@ -7,5 +8,5 @@ urlpatterns = [
     path("add/<slug:slug>/", views.cart_add, name="add"),
     path("remove/<slug:slug>/", views.cart_remove, name="remove"),
     path("clear/", views.cart_clear, name="clear"),
-    path("count/", views.cart_count, name="count"),
+    path("count/", pick_view("cart:count", views.cart_count, async_views.cart_count), name="count"),
 ]
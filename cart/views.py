@@ -1,23 +1,49 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from catalog.models import Product
+from core import metrics
+from core.ratelimit import rate_limited
 
 CART_KEY = "cart"
 
 def _get_cart(session):
-    return session.setdefault(CART_KEY, {})
+    """Copy of the session cart; reading it never creates a session"""
+    return dict(session.get(CART_KEY) or {})
 
-def cart_view(request):
-    cart = _get_cart(request.session)
-    items, total = [], 0
-    cart_count = sum(cart.values()) if cart else 0
-    cart_items = len(cart) if cart else 0
-    
+def _save_cart(session, cart):
+    if cart:
+        session[CART_KEY] = cart
+    else:
+        session.pop(CART_KEY, None)
+
+def request_cart(request):
+    """Session cart, without touching the session of cookieless (browse-only) visitors"""
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return {}
+    return _get_cart(request.session)
+
+def cart_lines(cart):
+    """``(lines, total_cents)`` of a session cart, with its products read in one query.
+
+    Lines whose product has been deleted since it was added are left out.
+    """
+    products = Product.objects.in_bulk(list(cart), field_name="slug")
+    lines, total = [], 0
     for slug, qty in cart.items():
-        p = get_object_or_404(Product, slug=slug)
+        p = products.get(slug)
+        if p is None:
+            continue
         subtotal = p.price_cents * qty
         total += subtotal
-        items.append({"product": p, "qty": qty, "subtotal": subtotal/100})
+        lines.append({"product": p, "qty": qty, "subtotal": subtotal/100})
+    return lines, total
+
+def cart_view(request):
+    cart = request_cart(request)
+    cart_count = sum(cart.values()) if cart else 0
+    cart_items = len(cart) if cart else 0
+    items, total = cart_lines(cart)
     
     return render(request, "cart/cart.html", {
         "items": items, 
@@ -26,28 +52,34 @@ def cart_view(request):
         "cart_items": cart_items,
     })
 
+@rate_limited("cart")
 def cart_add(request, slug):
     p = get_object_or_404(Product, slug=slug)
     cart = _get_cart(request.session)
     cart[slug] = cart.get(slug, 0) + 1
-    request.session.modified = True
+    _save_cart(request.session, cart)
+    metrics.count_cart("add", "web")
     return redirect("cart:view")
 
+@rate_limited("cart")
 def cart_remove(request, slug):
-    cart = _get_cart(request.session)
+    cart = request_cart(request)
     if slug in cart:
         del cart[slug]
-        request.session.modified = True
+        _save_cart(request.session, cart)
+        metrics.count_cart("remove", "web")
     return redirect("cart:view")
 
+@rate_limited("cart")
 def cart_clear(request):
-    request.session[CART_KEY] = {}
-    request.session.modified = True
+    if request_cart(request):
+        _save_cart(request.session, {})
+        metrics.count_cart("clear", "web")
     return redirect("cart:view")
 
 def cart_count(request):
     """Return cart count as JSON"""
-    cart = _get_cart(request.session)
+    cart = request_cart(request)
     cart_count = sum(cart.values()) if cart else 0
     cart_items = len(cart) if cart else 0
     
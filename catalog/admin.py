@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Product, Tag
+from .models import Category, Product, ProductImage, Tag
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -35,6 +35,18 @@ class CategoryAdmin(admin.ModelAdmin):
         return obj.products.count()
     product_count.short_description = "Products"
 
+class ProductImageInline(admin.TabularInline):
+    model = ProductImage
+    fields = ("preview", "file", "alt_text", "position")
+    readonly_fields = ("preview",)
+    extra = 1
+
+    def preview(self, obj):
+        if not obj.file:
+            return "-"
+        return format_html('<img src="{}" alt="" style="height: 60px; border-radius: 4px;">', obj.fallback_url)
+    preview.short_description = "Preview"
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ("name", "sku", "category", "material", "price_display", "stock_status", "is_featured", "is_new", "is_bestseller", "is_active", "created_at")
@@ -44,6 +56,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_editable = ("is_featured", "is_new", "is_bestseller", "is_active")
     ordering = ("-created_at",)
     filter_horizontal = ("tags",)
+    inlines = (ProductImageInline,)
     
     fieldsets = (
         ("Basic Information", {
@@ -59,7 +72,7 @@ class ProductAdmin(admin.ModelAdmin):
             "fields": ("stock_quantity", "low_stock_threshold", "track_inventory")
         }),
         ("Media", {
-            "fields": ("image", "thumbnail", "gallery_images")
+            "fields": ("image", "thumbnail")
         }),
         ("Physical Properties", {
             "fields": ("weight_grams",)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "catalog"
+
+    def ready(self):
+        """Import signal and outbox handlers when the app is ready"""
+        import catalog.signals
+        import catalog.tasks
@@ -0,0 +1,59 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import Http404
+from django.shortcuts import render
+
+from core.conditional import not_modified, set_validators
+from core.routing import prime_request
+from .models import Product, Category
+from .views import facet_listing, product_detail_etag, sidebar_categories
+
+# Native async counterparts of catalog.views, enabled per route through
+# settings.ASYNC_VIEWS. Querysets are materialized before rendering so that
+# templates never evaluate them inside the event loop.
+
+
+async def product_list(request, slug=None):
+    qs = Product.objects.select_related("category")
+    category = None
+    if slug:
+        category = await Category.objects.filter(slug=slug).afirst()
+        if category is None:
+            raise Http404("No Category matches the given query.")
+        qs = qs.filter(category__path__startswith=category.path)
+    q = request.GET.get("q", "").strip()
+    if q:
+        qs = qs.filter(Q(name__icontains=q) | Q(category__name__icontains=q))
+    tag = request.GET.get("tag")
+    if tag:
+        qs = qs.filter(tags__slug=tag)
+    qs, product_facets = await sync_to_async(facet_listing)(request, qs, ("shop", slug, q, tag), request.path)
+
+    sort = request.GET.get("sort", "created_at")
+    if sort:
+        qs = qs.order_by(sort)
+
+    await prime_request(request)
+    ctx = {
+        "products": [p async for p in qs],
+        "active_category": category,
+        "categories": [c async for c in sidebar_categories()],
+        "facets": product_facets,
+        "breadcrumbs": await sync_to_async(category.breadcrumbs)() if category else [],
+    }
+    if request.headers.get("HX-Request"):
+        return render(request, "catalog/_product_grid.html", {**ctx, "facets_oob": True})
+    return render(request, "catalog/product_list.html", ctx)
+
+
+async def product_detail(request, slug):
+    await prime_request(request)
+    etag = await sync_to_async(product_detail_etag)(request, slug)
+    if etag and (response := not_modified(request, etag)):
+        return response
+    product = await Product.objects.filter(slug=slug).select_related("category").prefetch_related("images").afirst()
+    if product is None:
+        raise Http404("No Product matches the given query.")
+    breadcrumbs = await sync_to_async(product.category.breadcrumbs)()
+    response = render(request, "catalog/product_detail.html", {"product": product, "breadcrumbs": breadcrumbs})
+    return set_validators(response, etag) if etag else response
@@ -0,0 +1,65 @@
+"""
+Catalog cache keys.
+
+Cached catalog data is keyed by a generation number that is bumped whenever a
+product, category or tag changes (see catalog/signals.py), so entries never
+need to be deleted and are safe to keep in the in-process tier of the
+"catalog" cache. The generation itself changes under the same key, so it is
+only ever read and written in the shared cache behind that tier.
+"""
+import hashlib
+import logging
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "catalog:generation"
+
+
+def catalog_cache():
+    return caches["catalog"]
+
+
+def generation_cache():
+    """The cache holding the generation: the shared tier of ``catalog_cache()``"""
+    cache = catalog_cache()
+    return getattr(cache, "shared", cache)
+
+
+def generation():
+    """Current catalog generation, starting at 1"""
+    cache = generation_cache()
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        value = cache.get(GENERATION_KEY, 1)
+    return value
+
+
+def bump_generation():
+    """Invalidate every catalog cache entry.
+
+    With the shared cache unreachable the generation is left alone, like
+    any other failed cache write, rather than failing the save that called
+    this.
+    """
+    cache = generation_cache()
+    connection_errors = getattr(cache, "connection_errors", ())
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Key evicted or never set: any new value works as long as it differs
+        cache.set(GENERATION_KEY, generation() + 1, timeout=None)
+    except connection_errors as exc:
+        logger.warning(f"Catalog generation not bumped, cache unreachable: {exc}")
+
+
+def catalog_key(namespace, *parts):
+    """Versioned key such as ``search:7:<digest>``.
+
+    Free-form parts (search terms, filters) are hashed so any input yields a
+    short, memcached-safe key.
+    """
+    digest = hashlib.md5("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f"{namespace}:{generation()}:{digest}"
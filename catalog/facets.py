@@ -0,0 +1,178 @@
+"""
+Facet counts for product listings.
+
+Every facet is counted in a single query: one ``GROUP BY`` over all facet
+columns at once gives a row per combination of values present, with its
+product count, and the rows are summed per facet in Python. Each facet is
+counted with the other facets' selections applied but not its own, so with
+"gold" picked the material facet still says how many silver pieces match.
+
+Results are cached in the catalog cache per normalized filter set, until the
+catalog changes (see catalog/cache.py).
+"""
+import copy
+from collections import namedtuple
+
+from django.db.models import Case, Count, Q, Value, When
+
+from .cache import catalog_cache, catalog_key
+from .models import Category, Product
+
+CACHE_SECONDS = 300
+
+Facet = namedtuple('Facet', 'name label field')
+
+FACETS = (
+    Facet('gender', 'Collection', 'category__gender'),
+    Facet('material', 'Material', 'material'),
+    Facet('carat', 'Carat', 'carat'),
+    Facet('stone_type', 'Stone', 'stone_type'),
+    Facet('price', 'Price', 'price_bucket'),
+)
+
+# (value, label, lowest cents, highest cents exclusive)
+PRICE_BUCKETS = (
+    ('0-1000', 'Under KES 1,000', None, 100_000),
+    ('1000-5000', 'KES 1,000 – 5,000', 100_000, 500_000),
+    ('5000-20000', 'KES 5,000 – 20,000', 500_000, 2_000_000),
+    ('20000-50000', 'KES 20,000 – 50,000', 2_000_000, 5_000_000),
+    ('50000-', 'KES 50,000 and over', 5_000_000, None),
+)
+
+LABELS = {
+    'gender': dict(Category.GENDER_CHOICES),
+    'material': dict(Product.MATERIAL_CHOICES),
+    'price': {value: label for value, label, _, _ in PRICE_BUCKETS},
+}
+# Facets listed in the order of their choices rather than by count
+ORDERED = {name: list(labels) for name, labels in LABELS.items()}
+
+
+def price_range(low, high):
+    q = Q()
+    if low is not None:
+        q &= Q(price_cents__gte=low)
+    if high is not None:
+        q &= Q(price_cents__lt=high)
+    return q
+
+
+def price_bucket():
+    return Case(*[When(price_range(low, high), then=Value(value)) for value, _, low, high in PRICE_BUCKETS])
+
+
+def selected(params):
+    """``{facet name: sorted values}`` picked in ``params``.
+
+    ``params`` is a ``QueryDict``. A facet may be repeated
+    (``material=gold&material=silver``) or given a comma-separated list.
+    Unknown prices are dropped.
+    """
+    selection = {}
+    for facet in FACETS:
+        values = {value.strip() for raw in params.getlist(facet.name) for value in raw.split(',')}
+        values.discard('')
+        if facet.name == 'price':
+            values &= set(LABELS['price'])
+        if values:
+            selection[facet.name] = sorted(values)
+    return selection
+
+
+def selection_filter(selection):
+    """``Q`` matching every selected facet"""
+    q = Q()
+    for facet in FACETS:
+        values = selection.get(facet.name)
+        if not values:
+            continue
+        if facet.name == 'price':
+            buckets = Q()
+            for value, _, low, high in PRICE_BUCKETS:
+                if value in values:
+                    buckets |= price_range(low, high)
+            q &= buckets
+        else:
+            q &= Q(**{f'{facet.field}__in': values})
+    return q
+
+
+def apply(queryset, selection):
+    """``queryset`` narrowed to the selected facet values"""
+    return queryset.filter(selection_filter(selection)) if selection else queryset
+
+
+def facet_counts(queryset, selection, key):
+    """Counts per facet value over ``queryset`` (not yet narrowed by ``selection``).
+
+    ``key`` identifies the filters already applied to ``queryset``, for the
+    cache. Returns ``{"count": products matching everything, "facets": [...]}``
+    with each facet's values as ``value``, ``label``, ``count``, ``selected``.
+    """
+    cache = catalog_cache()
+    cache_key = catalog_key('facets', key, sorted(selection.items()))
+    result = cache.get(cache_key)
+    if result is None:
+        result = count(queryset, selection)
+        cache.set(cache_key, result, CACHE_SECONDS)
+    return result
+
+
+def count(queryset, selection):
+    fields = [facet.field for facet in FACETS]
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket())
+        .values(*fields)
+        .annotate(products=Count('pk'))
+    )
+    chosen = {facet.field: set(selection.get(facet.name, ())) for facet in FACETS}
+    counts = {facet.name: {} for facet in FACETS}
+    total = 0
+    for row in rows:
+        misses = [field for field, values in chosen.items() if values and row[field] not in values]
+        if not misses:
+            total += row['products']
+        for facet in FACETS:
+            # Counted when every other facet's selection matches
+            if misses and misses != [facet.field]:
+                continue
+            value = row[facet.field]
+            if value:
+                counts[facet.name][value] = counts[facet.name].get(value, 0) + row['products']
+
+    facets = []
+    for facet in FACETS:
+        picked = selection.get(facet.name, ())
+        values = counts[facet.name]
+        for value in picked:
+            values.setdefault(value, 0)
+        if facet.name in ORDERED:
+            order = [value for value in ORDERED[facet.name] if value in values]
+        else:
+            order = sorted(values, key=lambda value: (-values[value], value.lower()))
+        labels = LABELS.get(facet.name, {})
+        facets.append({
+            'name': facet.name,
+            'label': facet.label,
+            'values': [
+                {'value': value, 'label': labels.get(value, value), 'count': values[value], 'selected': value in picked}
+                for value in order
+            ],
+        })
+    return {'count': total, 'facets': facets}
+
+
+def with_links(facets, params, path):
+    """A copy of ``facets`` with a ``url`` toggling each value, for templates"""
+    facets = copy.deepcopy(facets)
+    for facet in facets['facets']:
+        for value in facet['values']:
+            query = params.copy()
+            query.pop('page', None)
+            current = selected(query).get(facet['name'], [])
+            toggled = [v for v in current if v != value['value']] if value['selected'] else current + [value['value']]
+            query.setlist(facet['name'], [','.join(toggled)] if toggled else [])
+            encoded = query.urlencode()
+            value['url'] = f'{path}?{encoded}' if encoded else path
+    return facets
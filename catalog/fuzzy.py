@@ -0,0 +1,135 @@
+"""
+Typo-tolerant product search with trigram similarity.
+
+A query matches a product when enough of its trigrams (three-letter runs of
+each padded word, as PostgreSQL's ``pg_trgm`` splits them) appear in the
+product name, stone type or category name: "neclace" shares 6 of its 8
+trigrams with "necklace". Matches are ranked by that similarity blended with
+popularity (bestsellers, then featured products).
+
+On PostgreSQL the matching runs in the database with the ``%>`` operator,
+backed by the GIN trigram indexes from migration 0008. Elsewhere (SQLite in
+development) a trigram -> products index is built in this process and rebuilt
+when the catalog generation changes.
+"""
+import heapq
+import threading
+from collections import Counter, defaultdict
+
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .cache import generation
+from .models import Product
+from .typeahead import normalize
+
+MAX_RESULTS = 50
+# pg_trgm's default word_similarity_threshold, used for the in-process index
+THRESHOLD = 0.6
+# Share of the score that comes from popularity rather than similarity
+POPULARITY_WEIGHT = 0.2
+FIELDS = ('name', 'stone_type', 'category__name')
+
+
+def trigrams(text):
+    """``{"  r", " ri", "rin", "ing", "ng "}`` for ``"Ring"``"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return grams
+
+
+def popularity(is_bestseller, is_featured):
+    return 1.0 if is_bestseller else 0.5 if is_featured else 0.0
+
+
+def score(similarity, popular):
+    return similarity * (1 - POPULARITY_WEIGHT) + popular * POPULARITY_WEIGHT
+
+
+class TrigramIndex:
+    """Trigram -> ``(product id, field)`` postings for the active catalog"""
+
+    def __init__(self, rows):
+        self.postings = defaultdict(list)
+        self.popularity = {}
+        for pk, is_bestseller, is_featured, *texts in rows:
+            self.popularity[pk] = popularity(is_bestseller, is_featured)
+            for field, text in enumerate(texts):
+                for gram in trigrams(text or ''):
+                    self.postings[gram].append((pk, field))
+
+    @classmethod
+    def build(cls):
+        return cls(Product.objects.filter(is_active=True).values_list('pk', 'is_bestseller', 'is_featured', *FIELDS))
+
+    def search(self, query, limit):
+        """``(score, product id)`` of the best ``limit`` matches, best first"""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        hits = Counter()
+        for gram in grams:
+            hits.update(self.postings.get(gram, ()))
+        # Like word_similarity: the share of the query's trigrams found in the field
+        similarity = {}
+        for (pk, _), count in hits.items():
+            similarity[pk] = max(similarity.get(pk, 0), count / len(grams))
+        matches = ((score(value, self.popularity[pk]), pk) for pk, value in similarity.items() if value >= THRESHOLD)
+        return heapq.nlargest(limit, matches)
+
+
+_index = None
+_index_generation = None
+_index_lock = threading.Lock()
+
+
+def trigram_index():
+    global _index, _index_generation
+    seen = generation()
+    with _index_lock:
+        if _index is None or _index_generation != seen:
+            _index, _index_generation = TrigramIndex.build(), seen
+        return _index
+
+
+def clear():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def fuzzy_search(queryset, query, limit=MAX_RESULTS):
+    """Products of ``queryset`` matching ``query`` despite typos, best first"""
+    if connections[queryset.db].vendor == 'postgresql':
+        return list(postgres_search(queryset, query)[:limit])
+    # Candidates from the whole catalog, narrowed by the queryset's own filters
+    ranked = trigram_index().search(query, limit * 10)
+    scores = {pk: value for value, pk in ranked}
+    products = list(queryset.filter(pk__in=scores))
+    products.sort(key=lambda product: -scores[product.pk])
+    return products[:limit]
+
+
+def postgres_search(queryset, query):
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    match = Q()
+    for field in FIELDS:
+        # "field %> query" can use the field's gin_trgm_ops index
+        match |= Q(TrigramWordSimilar(F(field), Value(query)))
+    similarity = Greatest(*(TrigramWordSimilarity(query, field) for field in FIELDS))
+    popular = Case(
+        When(is_bestseller=True, then=Value(1.0)),
+        When(is_featured=True, then=Value(0.5)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return (
+        queryset.filter(match)
+        .annotate(search_score=similarity * (1 - POPULARITY_WEIGHT) + popular * POPULARITY_WEIGHT)
+        .order_by('-search_score', 'name')
+    )
@@ -0,0 +1,164 @@
+"""
+Resized WebP/JPEG derivatives of product images.
+
+Derivatives are named after a hash of the source image plus their width, so
+a given upload always maps to the same files and regenerating is a no-op.
+``render_derivatives`` only needs bytes in and out, which lets the backfill
+command run it in a process pool while the parent does storage and database
+work.
+"""
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+DERIVATIVE_WIDTHS = (320, 640, 1024)
+DERIVATIVE_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+# Width of the derivative used as Product.thumbnail
+THUMBNAIL_WIDTH = 320
+DERIVATIVE_DIR = "products/derivatives"
+ORIENTATION_TAG = 0x0112
+
+
+def source_digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def derivative_name(digest, width, fmt):
+    # "<stem>.<hex>.<ext>" marks the name as content-addressed for core.storage
+    return f"{DERIVATIVE_DIR}/{digest[:2]}/{width}w.{digest}.{fmt}"
+
+
+def target_widths(source_width):
+    """Derivative widths for a source image; images are never upscaled"""
+    widths = [width for width in DERIVATIVE_WIDTHS if width < source_width]
+    return widths or [min(source_width, DERIVATIVE_WIDTHS[0])]
+
+
+def render_derivatives(data):
+    """Render every derivative of an encoded image.
+
+    Returns ``(width, fmt, bytes)`` tuples. Raises ``PIL.UnidentifiedImageError``
+    for data that is not an image.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        # JPEG has no alpha channel, so flatten onto white
+        opaque = Image.new("RGB", image.size, "white")
+        opaque.paste(image, mask=image.getchannel("A"))
+    else:
+        image = image.convert("RGB")
+        opaque = image
+
+    rendered = []
+    for width in target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        for fmt, options in DERIVATIVE_FORMATS.items():
+            base = image if fmt == "webp" else opaque
+            resized = base.resize((width, height), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, **options)
+            rendered.append((width, fmt, buffer.getvalue()))
+    return rendered
+
+
+def expected_derivatives(digest, source_width):
+    return [
+        (width, fmt, derivative_name(digest, width, fmt))
+        for width in target_widths(source_width)
+        for fmt in DERIVATIVE_FORMATS
+    ]
+
+
+def build_manifest(source_name, digest, derivatives):
+    """Manifest stored in ``Product.image_derivatives``: storage names by format and width.
+
+    ``derivatives`` are ``(width, fmt, name)`` tuples. Widths are strings so
+    the manifest survives a JSON round trip unchanged.
+    """
+    manifest = {"source": source_name, "digest": digest}
+    for fmt in DERIVATIVE_FORMATS:
+        manifest[fmt] = {}
+    for width, fmt, name in derivatives:
+        manifest[fmt][str(width)] = name
+    return manifest
+
+
+def store_derivatives(source_name, digest, rendered, storage=None):
+    """Save rendered derivatives that are not stored yet and return the manifest"""
+    storage = storage or default_storage
+    derivatives = []
+    for width, fmt, content in rendered:
+        name = derivative_name(digest, width, fmt)
+        if not storage.exists(name):
+            # Keep the predictable name on HashedMediaStorage (core/storage.py)
+            name = getattr(storage, 'save_derived', storage.save)(name, ContentFile(content))
+        derivatives.append((width, fmt, name))
+    return build_manifest(source_name, digest, derivatives)
+
+
+def stored_manifest(source_name, data, storage=None):
+    """Manifest for ``data`` if all its derivatives are already stored, else None"""
+    storage = storage or default_storage
+    digest = source_digest(data)
+    with Image.open(io.BytesIO(data)) as probe:
+        width, height = probe.size
+        # EXIF orientations 5-8 are rotated by 90 degrees
+        if probe.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8):
+            width = height
+    derivatives = expected_derivatives(digest, width)
+    if all(storage.exists(name) for _, _, name in derivatives):
+        return build_manifest(source_name, digest, derivatives)
+    return None
+
+
+def generate_derivatives(field_file, storage=None):
+    """Create the derivatives of an image field's file and return the manifest"""
+    with field_file.open("rb") as handle:
+        data = handle.read()
+    manifest = stored_manifest(field_file.name, data, storage)
+    if manifest is None:
+        manifest = store_derivatives(field_file.name, source_digest(data), render_derivatives(data), storage)
+    return manifest
+
+
+def thumbnail_name(manifest):
+    """Name of the JPEG derivative closest to THUMBNAIL_WIDTH"""
+    widths = sorted(manifest.get("jpeg", {}), key=int)
+    if not widths:
+        return None
+    best = min(widths, key=lambda width: abs(int(width) - THUMBNAIL_WIDTH))
+    return manifest["jpeg"][best]
+
+
+def is_current(field_file, manifest):
+    """Whether ``manifest`` was generated from the file currently in ``field_file``"""
+    return bool(field_file) and (manifest or {}).get("source") == field_file.name
+
+
+def fallback_url(field_file, manifest):
+    """URL of the mid-size JPEG derivative, or of the original until derivatives exist"""
+    if not field_file:
+        return None
+    if is_current(field_file, manifest):
+        jpegs = manifest.get("jpeg", {})
+        if jpegs:
+            widths = sorted(jpegs, key=int)
+            return field_file.storage.url(jpegs[widths[len(widths) // 2]])
+    return field_file.url
+
+
+def srcset(manifest, fmt, url=None):
+    """``srcset`` attribute value for one format of a manifest"""
+    url = url or default_storage.url
+    entries = sorted((manifest or {}).get(fmt, {}).items(), key=lambda item: int(item[0]))
+    return ", ".join(f"{url(name)} {width}w" for width, name in entries)
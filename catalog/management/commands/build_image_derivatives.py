@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from catalog import images
+from catalog.cache import bump_generation
+from catalog.models import Product, ProductImage
+from catalog.tasks import apply_derivatives, apply_gallery_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generate resized image derivatives for existing product and gallery images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes used for resizing and encoding')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild images whose derivatives look current')
+
+    def handle(self, *args, **options):
+        self.force = options['force']
+        self.built = self.skipped = self.failed = 0
+        products = (
+            Product.objects.exclude(image='').exclude(image__isnull=True)
+            .only('image', 'thumbnail', 'image_derivatives').order_by('pk')
+        )
+        gallery = ProductImage.objects.exclude(file='').order_by('pk')
+
+        # Storage and database work stays in this process; workers only get
+        # image bytes, so they need no Django setup of their own.
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            pending = {}
+            sources = chain(
+                ((product, product.image, apply_derivatives)
+                 for product in products.iterator(chunk_size=200)),
+                ((product_image, product_image.file, apply_gallery_derivatives)
+                 for product_image in gallery.iterator(chunk_size=200)),
+            )
+            for obj, field_file, apply in sources:
+                if obj.derivatives_current and not self.force:
+                    self.skipped += 1
+                    continue
+                data = self.read(obj, field_file)
+                if data is None:
+                    continue
+                try:
+                    manifest = images.stored_manifest(field_file.name, data)
+                except (UnidentifiedImageError, OSError) as exc:
+                    self.fail(obj, field_file, exc)
+                    continue
+                if manifest is not None:
+                    self.apply(apply, obj, manifest)
+                    continue
+                future = executor.submit(images.render_derivatives, data)
+                pending[future] = (obj, field_file, apply, images.source_digest(data))
+                # Bound the number of images held in memory at once
+                if len(pending) >= options['workers'] * 2:
+                    self.collect(pending, wait(pending, return_when=FIRST_COMPLETED).done)
+            self.collect(pending, list(pending))
+
+        if self.built:
+            bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Built derivatives for {self.built} image(s), '
+            f'{self.skipped} already current, {self.failed} failed'
+        ))
+
+    def read(self, obj, field_file):
+        try:
+            with field_file.open('rb') as handle:
+                return handle.read()
+        except OSError as exc:
+            self.fail(obj, field_file, exc)
+            return None
+
+    def collect(self, pending, futures):
+        for future in futures:
+            obj, field_file, apply, digest = pending.pop(future)
+            try:
+                rendered = future.result()
+            except (UnidentifiedImageError, OSError) as exc:
+                self.fail(obj, field_file, exc)
+                continue
+            self.apply(apply, obj, images.store_derivatives(field_file.name, digest, rendered))
+
+    def apply(self, apply, obj, manifest):
+        apply(obj, manifest, bump=False)
+        self.built += 1
+
+    def fail(self, obj, field_file, exc):
+        self.failed += 1
+        self.stderr.write(f'{obj._meta.verbose_name} {obj.pk}: cannot process {field_file.name}: {exc}')
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute "customers also bought" neighbours from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=recommendations.TOP,
+                            help='Neighbours kept per product')
+        parser.add_argument('--min-count', type=int, default=recommendations.MIN_COUNT,
+                            help='Orders a pair must share to count')
+        parser.add_argument('--max-basket', type=int, default=recommendations.MAX_BASKET,
+                            help='Orders with more products than this are not paired')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        products, rows = recommendations.rebuild(options['top'], options['min_count'], options['max_basket'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {rows} neighbour(s) for {products} product(s) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def gallery_entry(entry):
+    """File name and alt text of one legacy ``gallery_images`` entry"""
+    if isinstance(entry, dict):
+        name = next((entry[key] for key in ('file', 'image', 'url', 'src') if entry.get(key)), '')
+        alt_text = entry.get('alt_text') or entry.get('alt') or ''
+    else:
+        name, alt_text = entry, ''
+    name = str(name or '').strip()
+    if settings.MEDIA_URL and name.startswith(settings.MEDIA_URL):
+        name = name[len(settings.MEDIA_URL):]
+    return name, str(alt_text)[:255]
+
+
+def is_external(name):
+    """Whether a gallery entry is an absolute URL rather than a stored file name"""
+    return '://' in name or name.startswith('//')
+
+
+def copy_gallery_images(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    ProductImage = apps.get_model('catalog', 'ProductImage')
+    rows = []
+    for product_id, gallery in Product.objects.values_list('id', 'gallery_images').iterator():
+        if not isinstance(gallery, list):
+            continue
+        for position, entry in enumerate(gallery):
+            name, alt_text = gallery_entry(entry)
+            if not name:
+                continue
+            if is_external(name):
+                # Kept as a URL: as a file name storage would turn it into a broken /media/ link
+                image = ProductImage(product_id=product_id, external_url=name[:500])
+            else:
+                image = ProductImage(product_id=product_id, file=name[:255])
+            image.alt_text, image.position = alt_text, position
+            rows.append(image)
+    ProductImage.objects.bulk_create(rows, batch_size=500)
+
+
+def restore_gallery_images(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    ProductImage = apps.get_model('catalog', 'ProductImage')
+    gallery = defaultdict(list)
+    rows = ProductImage.objects.order_by('product_id', 'position', 'id').values_list('product_id', 'file', 'external_url')
+    for product_id, name, external_url in rows:
+        gallery[product_id].append(name or external_url)
+    for product_id, names in gallery.items():
+        Product.objects.filter(pk=product_id).update(gallery_images=names)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.ImageField(blank=True, max_length=255, upload_to='products/gallery/')),
+                ('external_url', models.URLField(blank=True, help_text='Image hosted elsewhere, used when there is no file', max_length=500)),
+                ('derivatives', models.JSONField(blank=True, default=dict, editable=False, help_text='Resized copies of the file, see catalog.images')),
+                ('alt_text', models.CharField(blank=True, max_length=255)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='catalog.product')),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+                'indexes': [models.Index(fields=['product', 'position'], name='catalog_img_product_pos_idx')],
+            },
+        ),
+        migrations.RunPython(copy_gallery_images, restore_gallery_images),
+    ]
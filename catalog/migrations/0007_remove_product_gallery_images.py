@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_productimage'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='product',
+            name='gallery_images',
+        ),
+    ]
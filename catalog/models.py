@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat, Now, Substr
 from django.utils.text import slugify
 import uuid
 
+from . import images
+
 class Tag(models.Model):
     """Tags for jewellery items (e.g., gold, silver, diamond, etc.)"""
     name = models.CharField(max_length=50, unique=True)
@@ -37,6 +41,8 @@ class Category(models.Model):
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='',
+                            help_text="Ancestor and own ids, e.g. '1/5/12/', see Category.save")
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES, default='unisex')
     is_active = models.BooleanField(default=True)
     sort_order = models.PositiveIntegerField(default=0)
@@ -51,9 +57,67 @@ class Category(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
+        """Save, keeping ``path`` (and the paths below it, if moved) current.
+
+        A subtree is found with one prefix query on ``path`` and ancestors are
+        read from it, so a category can't be saved under its own subtree.
+        Updates that bypass ``save`` (``QuerySet.update``, ``bulk_create``)
+        need ``rebuild_paths()`` afterwards.
+        """
         if not self.slug:
             self.slug = slugify(self.name)
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if self.pk and f'/{self.pk}/' in f'/{parent_path}':
+                raise ValueError(f'Category {self.pk} cannot be moved under its own subtree')
+        old_path = self.path
         super().save(*args, **kwargs)
+        self.path = f'{parent_path}{self.pk}/'
+        if self.path != old_path:
+            Category.objects.filter(pk=self.pk).update(path=self.path)
+        if old_path:
+            # Descendants show this category in their breadcrumbs; if it moved,
+            # their path prefix is rewritten in the same statement
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                updated_at=Now(),
+            )
+
+    @property
+    def ancestor_ids(self):
+        """Ids from the root down to the parent"""
+        return [int(pk) for pk in self.path.split('/')[:-2]]
+
+    def breadcrumbs(self):
+        """The categories from the root down to this one, in one query"""
+        ids = self.ancestor_ids
+        ancestors = {category.pk: category for category in Category.objects.filter(pk__in=ids)} if ids else {}
+        return [ancestors[pk] for pk in ids if pk in ancestors] + [self]
+
+    def subtree(self):
+        """This category and all its descendants"""
+        return Category.objects.filter(path__startswith=self.path)
+
+    @classmethod
+    def rebuild_paths(cls):
+        """Recompute every ``path`` from ``parent``; returns how many changed"""
+        categories = {category.pk: category for category in cls.objects.only('parent', 'path')}
+        paths = {}
+
+        def path_of(pk):
+            if pk not in paths:
+                parent_id = categories[pk].parent_id
+                paths[pk] = (path_of(parent_id) if parent_id else '') + f'{pk}/'
+            return paths[pk]
+
+        changed = []
+        for category in categories.values():
+            if category.path != path_of(category.pk):
+                category.path = paths[category.pk]
+                changed.append(category)
+        cls.objects.bulk_update(changed, ['path'], batch_size=500)
+        return len(changed)
 
 class Product(models.Model):
     """Jewellery products with enhanced fields"""
@@ -91,7 +155,7 @@ class Product(models.Model):
     # Images
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     thumbnail = models.ImageField(upload_to='products/thumbnails/', blank=True, null=True)
-    gallery_images = models.JSONField(default=list, blank=True, help_text="Additional product images")
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized copies of the image, see catalog.images")
     
     # Status fields
     is_featured = models.BooleanField(default=False)
@@ -108,12 +172,48 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored image so new uploads can be detected on save
+        instance._loaded_image = instance._image_name()
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
         if not self.sku:
             self.sku = f"SKU-{uuid.uuid4().hex[:8].upper()}"
         super().save(*args, **kwargs)
+        self._loaded_image = self._image_name()
+
+    def _image_name(self):
+        value = self.__dict__.get('image')
+        return getattr(value, 'name', value) or None
+
+    @property
+    def image_changed(self):
+        if 'image' not in self.__dict__:
+            return False
+        return self._image_name() != getattr(self, '_loaded_image', None)
+
+    @property
+    def derivatives_current(self):
+        """Whether image_derivatives were generated from the current image"""
+        return images.is_current(self.image, self.image_derivatives)
+
+    @property
+    def image_srcset_webp(self):
+        return images.srcset(self.image_derivatives, 'webp') if self.derivatives_current else ''
+
+    @property
+    def image_srcset_jpeg(self):
+        return images.srcset(self.image_derivatives, 'jpeg') if self.derivatives_current else ''
+
+    @property
+    def image_fallback_url(self):
+        """Mid-size JPEG derivative, or the original until derivatives exist"""
+        return images.fallback_url(self.image, self.image_derivatives)
 
     @property
     def price_display(self) -> str:
@@ -139,4 +239,84 @@ class Product(models.Model):
     def discount_percentage(self):
         if self.compare_price_cents and self.compare_price_cents > self.price_cents:
             return int(((self.compare_price_cents - self.price_cents) / self.compare_price_cents) * 100)
-        return 0
\ No newline at end of file
+        return 0
+
+
+def subtree_product_count(**filters):
+    """Products of a category and every category below it, for ``Category.objects.annotate()``"""
+    products = Product.objects.filter(category__path__startswith=models.OuterRef('path'), **filters)
+    return models.Subquery(
+        products.order_by().annotate(count=models.Func('pk', function='COUNT')).values('count'),
+        output_field=models.IntegerField(),
+    )
+
+
+class ProductImage(models.Model):
+    """Additional product image shown in the gallery, ordered by position"""
+    product = models.ForeignKey(Product, related_name='images', on_delete=models.CASCADE)
+    file = models.ImageField(upload_to='products/gallery/', max_length=255, blank=True)
+    # Legacy gallery entries hosted elsewhere; shown as they are, without derivatives
+    external_url = models.URLField(max_length=500, blank=True, help_text="Image hosted elsewhere, used when there is no file")
+    derivatives = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized copies of the file, see catalog.images")
+    alt_text = models.CharField(max_length=255, blank=True)
+    position = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['position', 'id']
+        indexes = [models.Index(fields=['product', 'position'], name='catalog_img_product_pos_idx')]
+
+    def __str__(self):
+        return f"{self.product_id} #{self.position}: {self.file.name or self.external_url}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored file so replacements can be detected on save
+        instance._loaded_file = instance._file_name()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_file = self._file_name()
+
+    def _file_name(self):
+        value = self.__dict__.get('file')
+        return getattr(value, 'name', value) or None
+
+    @property
+    def file_changed(self):
+        if 'file' not in self.__dict__:
+            return False
+        return self._file_name() != getattr(self, '_loaded_file', None)
+
+    @property
+    def derivatives_current(self):
+        return images.is_current(self.file, self.derivatives)
+
+    @property
+    def srcset_webp(self):
+        return images.srcset(self.derivatives, 'webp') if self.derivatives_current else ''
+
+    @property
+    def srcset_jpeg(self):
+        return images.srcset(self.derivatives, 'jpeg') if self.derivatives_current else ''
+
+    @property
+    def fallback_url(self):
+        return images.fallback_url(self.file, self.derivatives) or self.external_url or None
+
+
+class CoPurchase(models.Model):
+    """A product often bought with ``product``, written by ``build_recommendations``"""
+    product = models.ForeignKey(Product, related_name='co_purchases', on_delete=models.CASCADE)
+    neighbour = models.ForeignKey(Product, related_name='bought_with', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField(help_text="1 for the strongest neighbour")
+    score = models.FloatField(help_text="Orders with both / sqrt(orders with each), see catalog.recommendations")
+
+    class Meta:
+        ordering = ['product', 'rank']
+        unique_together = ['product', 'rank']
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.neighbour_id} #{self.rank}"
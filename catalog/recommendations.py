@@ -0,0 +1,104 @@
+"""
+"Customers also bought" recommendations.
+
+``rebuild()`` (the ``build_recommendations`` command) reads order history
+once, ordered by order, and counts for every pair of products how many
+orders contain both. Counts are kept sparse (only pairs actually bought
+together), and each product's neighbours are scored by cosine similarity:
+
+    orders with both / sqrt(orders with the product * orders with the neighbour)
+
+so products in every basket don't crowd out everything else. The best
+``TOP`` neighbours per product are stored in ``CoPurchase``, replacing the
+previous run.
+
+``also_bought()`` reads them back in one query, topped up with bestsellers
+from the product's category when there are too few.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.db import transaction
+
+from checkout.models import OrderItem
+from .models import CoPurchase, Product
+
+TOP = 10
+# Pairs bought together fewer times than this are noise
+MIN_COUNT = 2
+# Larger orders (wholesale, test orders) would add many unrelated pairs
+MAX_BASKET = 50
+ALSO_BOUGHT = 4
+# Orders that don't say anything about what customers want together
+EXCLUDED_STATUSES = ('cancelled', 'refunded')
+
+
+def baskets():
+    """Sets of product ids, one per order, streamed from the database"""
+    rows = (
+        OrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES)
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=5000)
+    )
+    for _, items in groupby(rows, key=itemgetter(0)):
+        yield {product_id for _, product_id in items}
+
+
+def co_occurrence(baskets, max_basket=MAX_BASKET):
+    """``(pair counts, order counts)``: ``{a: Counter({b: orders with both})}`` and ``Counter({a: orders})``"""
+    pairs = defaultdict(Counter)
+    orders = Counter()
+    for basket in baskets:
+        orders.update(basket)
+        if len(basket) > max_basket:
+            continue
+        for a, b in combinations(sorted(basket), 2):
+            pairs[a][b] += 1
+            pairs[b][a] += 1
+    return pairs, orders
+
+
+def neighbours(pairs, orders, top=TOP, min_count=MIN_COUNT):
+    """``{product id: [(neighbour id, score), ...]}``, best first"""
+    result = {}
+    for product_id, counts in pairs.items():
+        scored = (
+            (count / math.sqrt(orders[product_id] * orders[other]), count, -other)
+            for other, count in counts.items()
+            if count >= min_count
+        )
+        best = heapq.nlargest(top, scored)
+        if best:
+            result[product_id] = [(-negated, score) for score, _, negated in best]
+    return result
+
+
+def rebuild(top=TOP, min_count=MIN_COUNT, max_basket=MAX_BASKET):
+    """Recompute and store every product's neighbours; returns ``(products, rows)``"""
+    pairs, orders = co_occurrence(baskets(), max_basket)
+    rows = [
+        CoPurchase(product_id=product_id, neighbour_id=neighbour_id, rank=rank, score=score)
+        for product_id, best in neighbours(pairs, orders, top, min_count).items()
+        for rank, (neighbour_id, score) in enumerate(best, 1)
+    ]
+    with transaction.atomic():
+        CoPurchase.objects.all().delete()
+        CoPurchase.objects.bulk_create(rows, batch_size=1000)
+    return len({row.product_id for row in rows}), len(rows)
+
+
+def also_bought(product, limit=ALSO_BOUGHT):
+    """Active products bought with ``product``, then its category's bestsellers"""
+    products = Product.objects.filter(is_active=True).select_related('category')
+    picked = list(products.filter(bought_with__product=product).order_by('bought_with__rank')[:limit])
+    if len(picked) < limit:
+        picked += (
+            products.filter(category_id=product.category_id)
+            .exclude(pk__in=[product.pk, *(p.pk for p in picked)])
+            .order_by('-is_bestseller', '-is_featured', '-created_at')[:limit - len(picked)]
+        )
+    return picked
@@ -0,0 +1,72 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.tasks import enqueue
+
+from .cache import bump_generation
+from .models import Category, Product, ProductImage, Tag
+from .typeahead import typeahead
+
+TYPEAHEAD_KINDS = {Product: 'product', Category: 'category', Tag: 'tag'}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def catalog_changed(sender, **kwargs):
+    """Invalidate cached catalog data"""
+    bump_generation()
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def product_tags_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_generation()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def typeahead_saved(sender, instance, raw=False, using=None, **kwargs):
+    """Update this process's typeahead index once the change is committed"""
+    if not raw:
+        transaction.on_commit(partial(typeahead.update, TYPEAHEAD_KINDS[sender], instance.pk, instance), using=using)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def typeahead_deleted(sender, instance, using=None, **kwargs):
+    # The instance loses its pk once deleted
+    transaction.on_commit(partial(typeahead.update, TYPEAHEAD_KINDS[sender], instance.pk), using=using)
+
+
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, raw=False, **kwargs):
+    """Queue derivative generation when a product's image is replaced"""
+    if not raw and instance.image_changed:
+        enqueue('product.image_changed', {'product_id': instance.pk})
+
+
+@receiver(post_save, sender=ProductImage)
+def gallery_image_changed(sender, instance, raw=False, **kwargs):
+    """Queue derivative generation for new or replaced gallery images"""
+    if not raw and instance.file_changed:
+        enqueue('product_image.file_changed', {'product_image_id': instance.pk})
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product(sender, instance, raw=False, **kwargs):
+    """Count gallery edits as product edits so updated_at-based validators change"""
+    if not raw:
+        Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
@@ -0,0 +1,70 @@
+import logging
+
+from django.utils import timezone
+
+from core.tasks import handler
+
+from . import images
+from .cache import bump_generation
+from .models import Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+
+def apply_derivatives(product, manifest, bump=True):
+    """Store a derivative manifest on a product.
+
+    The update is skipped if the image was replaced in the meantime; the
+    newer upload has its own event queued. A thumbnail is filled in from the
+    derivatives unless one was uploaded by hand.
+    """
+    # updated_at moves too, since pages and API payloads now use the derivatives
+    updates = {'image_derivatives': manifest, 'updated_at': timezone.now()}
+    thumbnail = product.thumbnail.name or ''
+    if not thumbnail or thumbnail.startswith(images.DERIVATIVE_DIR):
+        updates['thumbnail'] = images.thumbnail_name(manifest) or ''
+    updated = Product.objects.filter(pk=product.pk, image=product.image.name).update(**updates)
+    if updated and bump:
+        bump_generation()
+    return bool(updated)
+
+
+def apply_gallery_derivatives(product_image, manifest, bump=True):
+    """Store a derivative manifest on a gallery image unless its file was replaced"""
+    updated = ProductImage.objects.filter(pk=product_image.pk, file=product_image.file.name).update(derivatives=manifest)
+    if updated:
+        Product.objects.filter(pk=product_image.product_id).update(updated_at=timezone.now())
+    if updated and bump:
+        bump_generation()
+    return bool(updated)
+
+
+def count_derivatives(manifest):
+    return sum(len(manifest[fmt]) for fmt in images.DERIVATIVE_FORMATS)
+
+
+@handler('product.image_changed')
+def product_image_changed(payload):
+    """Generate resized copies of a product's image"""
+    product = Product.objects.filter(pk=payload['product_id']).only('image', 'thumbnail', 'image_derivatives').first()
+    if product is None:
+        return
+    if not product.image:
+        apply_derivatives(product, {})
+        return
+    if product.derivatives_current:
+        return
+    manifest = images.generate_derivatives(product.image)
+    apply_derivatives(product, manifest)
+    logger.info(f"Generated {count_derivatives(manifest)} image derivatives for product {product.pk}")
+
+
+@handler('product_image.file_changed')
+def gallery_image_changed(payload):
+    """Generate resized copies of a gallery image"""
+    product_image = ProductImage.objects.filter(pk=payload['product_image_id']).first()
+    if product_image is None or product_image.derivatives_current:
+        return
+    manifest = images.generate_derivatives(product_image.file)
+    apply_gallery_derivatives(product_image, manifest)
+    logger.info(f"Generated {count_derivatives(manifest)} image derivatives for gallery image {product_image.pk}")
@@ -0,0 +1,255 @@
+"""
+In-process prefix index for search-box suggestions.
+
+Active product names and SKUs, categories and tags are normalized (case and
+accents folded, punctuation dropped) and stored under every word start:
+"Aurora Gold Ring" is found by "aur", "gold r" and "ring". Keys live in a
+sorted list searched with ``bisect``, so a lookup reads only the keys that
+share the prefix, and prefixes shared by more than ``SCAN_LIMIT`` keys keep
+their best ``MAX_RESULTS`` suggestions precomputed.
+
+The index is built on first use and kept current in this process by the
+catalog signals (see catalog/signals.py), applied on commit. Changes made by
+other processes show up as a new catalog generation; the index is then
+rebuilt in a background thread, at most every ``TYPEAHEAD_REBUILD_SECONDS``,
+while the old one keeps answering.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+from .cache import generation
+from .models import Category, Product, Tag
+
+MAX_RESULTS = 10
+# Prefixes shared by more keys than this have their suggestions precomputed
+SCAN_LIMIT = 256
+# Suggestion types, best first
+KINDS = ('category', 'tag', 'product', 'sku')
+# Sorts after every key starting with a given prefix
+_LAST = '\U0010ffff'
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """``"Pavé Ring-18K"`` -> ``"pave ring 18k"``"""
+    text = text.casefold()
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+def word_starts(text):
+    words = normalize(text).split()
+    return [' '.join(words[index:]) for index in range(len(words))]
+
+
+def entries_for(kind, obj):
+    """``(entry id, entry, rank, keys)`` for one catalog object.
+
+    Entries are ``(type, label, url name, slug)``; URLs are only reversed for
+    the suggestions returned.
+    """
+    if kind == 'product':
+        # Bestsellers, then featured products, then shorter names
+        popularity = (not obj.is_bestseller, not obj.is_featured, len(obj.name))
+        entry = ('product', obj.name, 'catalog:product_detail', obj.slug)
+        yield ('product', obj.pk), entry, (KINDS.index('product'), *popularity), word_starts(obj.name)
+        if obj.sku:
+            entry = ('sku', f'{obj.sku} · {obj.name}', 'catalog:product_detail', obj.slug)
+            yield ('sku', obj.pk), entry, (KINDS.index('sku'), *popularity), [normalize(obj.sku)]
+    elif kind == 'category':
+        entry = ('category', obj.name, 'catalog:category', obj.slug)
+        yield ('category', obj.pk), entry, (KINDS.index('category'), obj.sort_order, len(obj.name)), word_starts(obj.name)
+    elif kind == 'tag':
+        entry = ('tag', obj.name, 'catalog:product_list', obj.slug)
+        yield ('tag', obj.pk), entry, (KINDS.index('tag'), len(obj.name)), word_starts(obj.name)
+
+
+def suggestion(entry):
+    kind, label, url_name, slug = entry
+    if kind == 'tag':
+        url = f'{reverse(url_name)}?{urlencode({"tag": slug})}'
+    else:
+        url = reverse(url_name, args=[slug])
+    return {'type': kind, 'label': label, 'url': url}
+
+
+def catalog_objects():
+    """``(kind, object)`` for everything that gets suggested"""
+    products = Product.objects.filter(is_active=True).only('name', 'slug', 'sku', 'is_bestseller', 'is_featured')
+    for product in products.iterator(chunk_size=2000):
+        yield 'product', product
+    for category in Category.objects.filter(is_active=True).only('name', 'slug', 'sort_order'):
+        yield 'category', category
+    for tag in Tag.objects.filter(is_active=True).only('name', 'slug'):
+        yield 'tag', tag
+
+
+def best(items, limit):
+    """Entry ids of the ``limit`` best ranked ``(key, rank, entry id)`` items"""
+    ids = []
+    for _, _, entry_id in heapq.nsmallest(limit * 4, items, key=lambda item: item[1]):
+        if entry_id not in ids:
+            ids.append(entry_id)
+            if len(ids) == limit:
+                break
+    return ids
+
+
+class PrefixIndex:
+    def __init__(self):
+        # Sorted (key, rank, entry id)
+        self.keys = []
+        self.entries = {}
+        self.entry_keys = {}
+        # Prefix shared by more than SCAN_LIMIT keys -> best entry ids
+        self.heavy = {}
+
+    @classmethod
+    def build(cls, objects):
+        index = cls()
+        for kind, obj in objects:
+            for entry_id, entry, rank, keys in entries_for(kind, obj):
+                index.entries[entry_id] = entry
+                index.entry_keys[entry_id] = [(key, rank, entry_id) for key in keys]
+                index.keys.extend(index.entry_keys[entry_id])
+        index.keys.sort()
+        index.find_heavy()
+        return index
+
+    def span(self, prefix, start=0, end=None):
+        """``(start, end)`` positions of the keys starting with ``prefix``"""
+        end = len(self.keys) if end is None else end
+        return bisect_left(self.keys, (prefix,), start, end), bisect_left(self.keys, (prefix + _LAST,), start, end)
+
+    def find_heavy(self):
+        """Precompute suggestions for prefixes too common to scan, one length at a time"""
+        keys = self.keys
+        groups = [(0, len(keys))]
+        length = 1
+        while groups:
+            heavy_groups = []
+            for start, end in groups:
+                position = start
+                while position < end:
+                    key = keys[position][0]
+                    if len(key) < length:
+                        position += 1
+                        continue
+                    prefix = key[:length]
+                    first, stop = self.span(prefix, position, end)
+                    if stop - first > SCAN_LIMIT:
+                        self.heavy[prefix] = best(keys[first:stop], MAX_RESULTS)
+                        heavy_groups.append((first, stop))
+                    position = stop
+            groups = heavy_groups
+            length += 1
+
+    def search(self, prefix, limit):
+        ids = self.heavy.get(prefix)
+        if ids is None:
+            start, end = self.span(prefix)
+            ids = best(self.keys[start:end], limit)
+        return [self.entries[entry_id] for entry_id in ids[:limit]]
+
+    def remove(self, entry_id):
+        self.entries.pop(entry_id, None)
+        removed = self.entry_keys.pop(entry_id, [])
+        for item in removed:
+            position = bisect_left(self.keys, item)
+            if position < len(self.keys) and self.keys[position] == item:
+                del self.keys[position]
+        return removed
+
+    def add(self, entry_id, entry, rank, keys):
+        self.entries[entry_id] = entry
+        self.entry_keys[entry_id] = [(key, rank, entry_id) for key in keys]
+        for item in self.entry_keys[entry_id]:
+            insort(self.keys, item)
+        return self.entry_keys[entry_id]
+
+    def refresh_heavy(self, items):
+        """Recompute the precomputed suggestions that ``items`` took part in.
+
+        A prefix that only becomes common through updates is scanned until
+        the next rebuild.
+        """
+        prefixes = {item[0][:length] for item in items for length in range(1, len(item[0]) + 1)}
+        for prefix in prefixes & self.heavy.keys():
+            start, end = self.span(prefix)
+            self.heavy[prefix] = best(self.keys[start:end], MAX_RESULTS)
+
+
+class Typeahead:
+    """The process-wide index, its freshness and its updates"""
+
+    def __init__(self):
+        self.index = None
+        self.generation = None
+        self.built_at = 0
+        self.lock = threading.Lock()
+        self.rebuilding = False
+
+    def clear(self):
+        with self.lock:
+            self.index = None
+
+    def suggest(self, query, limit=MAX_RESULTS):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, MAX_RESULTS))
+        index = self.current()
+        with self.lock:
+            entries = index.search(prefix, limit)
+        return [suggestion(entry) for entry in entries]
+
+    def current(self):
+        index = self.index
+        if index is None:
+            return self.rebuild()
+        if generation() != self.generation and time.monotonic() - self.built_at >= settings.TYPEAHEAD_REBUILD_SECONDS:
+            with self.lock:
+                start, self.rebuilding = not self.rebuilding, True
+            if start:
+                threading.Thread(target=self.rebuild_in_background, daemon=True, name='typeahead-rebuild').start()
+        return index
+
+    def rebuild(self):
+        seen = generation()
+        index = PrefixIndex.build(catalog_objects())
+        with self.lock:
+            self.index, self.generation, self.built_at = index, seen, time.monotonic()
+        return index
+
+    def rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            self.rebuilding = False
+            connections.close_all()
+
+    def update(self, kind, pk, obj=None):
+        """Apply a saved catalog object, or a deleted one without ``obj``, if the index is built"""
+        with self.lock:
+            if self.index is None:
+                return
+            changed = []
+            for entry_kind in ('product', 'sku') if kind == 'product' else (kind,):
+                changed += self.index.remove((entry_kind, pk))
+            if obj is not None and obj.is_active:
+                for entry_id, entry, rank, keys in entries_for(kind, obj):
+                    changed += self.index.add(entry_id, entry, rank, keys)
+            self.index.refresh_heavy(changed)
+
+
+typeahead = Typeahead()
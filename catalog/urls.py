@@ -1,10 +1,13 @@
 from django.urls import path
-from . import views
+from core.routing import pick_view
+from . import async_views, views
 
 app_name = "catalog"
 urlpatterns = [
-    path("", views.product_list, name="product_list"),
-    path("c/<slug:slug>/", views.product_list, name="category"),
-    path("p/<slug:slug>/", views.product_detail, name="product_detail"),
+    path("", pick_view("catalog:product_list", views.product_list, async_views.product_list), name="product_list"),
+    path("c/<slug:slug>/", pick_view("catalog:category", views.product_list, async_views.product_list), name="category"),
+    path("p/<slug:slug>/", pick_view("catalog:product_detail", views.product_detail, async_views.product_detail), name="product_detail"),
+    path("p/<slug:slug>/also-bought/", views.also_bought, name="also_bought"),  # HTMX endpoint
     path("search/", views.product_search, name="product_search"),  # HTMX endpoint
+    path("autocomplete/", views.autocomplete, name="autocomplete"),  # HTMX endpoint
 ]
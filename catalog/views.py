@@ -1,34 +1,99 @@
 from django.shortcuts import render, get_object_or_404
 from django.db.models import Q
-from .models import Product, Category
+from django.urls import reverse
+from django.views.decorators.http import condition
+
+from core.conditional import make_etag, queryset_state, viewer_state
+from core.ratelimit import rate_limited
+from . import facets, recommendations
+from .models import Product, Category, subtree_product_count
+from .typeahead import MAX_RESULTS, typeahead
+
+def sidebar_categories():
+    """Categories with their ``product_count``, subcategories included like the pages, in one query"""
+    return Category.objects.annotate(product_count=subtree_product_count())
+
+def facet_listing(request, qs, key, path):
+    """``qs`` narrowed to the picked facet values, and the facet counts with links to ``path``"""
+    selection = facets.selected(request.GET)
+    counts = facets.facet_counts(qs, selection, key)
+    links = facets.with_links(counts, request.GET, path)
+    return facets.apply(qs, selection), links
 
 def product_list(request, slug=None):
     qs = Product.objects.select_related("category")
     category = None
     if slug:
         category = get_object_or_404(Category, slug=slug)
-        qs = qs.filter(category=category)
+        # Products of the category and of every category below it
+        qs = qs.filter(category__path__startswith=category.path)
     q = request.GET.get("q", "").strip()
     if q:
         qs = qs.filter(Q(name__icontains=q) | Q(category__name__icontains=q))
+    tag = request.GET.get("tag")
+    if tag:
+        qs = qs.filter(tags__slug=tag)
+    qs, product_facets = facet_listing(request, qs, ("shop", slug, q, tag), request.path)
     
     # Handle sorting
     sort = request.GET.get("sort", "created_at")
     if sort:
         qs = qs.order_by(sort)
     
-    ctx = {"products": qs, "active_category": category, "categories": Category.objects.all()}
+    ctx = {
+        "products": qs, "active_category": category, "categories": sidebar_categories(), "facets": product_facets,
+        "breadcrumbs": category.breadcrumbs() if category else [],
+    }
     if request.headers.get("HX-Request"):
-        return render(request, "catalog/_product_grid.html", ctx)
+        return render(request, "catalog/_product_grid.html", {**ctx, "facets_oob": True})
     return render(request, "catalog/product_list.html", ctx)
 
+def product_detail_etag(request, slug):
+    """ETag from the product's and its category's updated_at plus the viewer's header state"""
+    viewer = viewer_state(request)
+    if viewer is None:
+        return None
+    count, (updated, category_updated) = queryset_state(
+        Product.objects.filter(slug=slug), ("updated_at", "category__updated_at")
+    )
+    if not count:
+        return None
+    return make_etag("product_detail", slug, updated, category_updated, viewer)
+
+@condition(etag_func=product_detail_etag)
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug)
-    return render(request, "catalog/product_detail.html", {"product": product})
+    product = get_object_or_404(Product.objects.select_related("category").prefetch_related("images"), slug=slug)
+    return render(request, "catalog/product_detail.html", {
+        "product": product, "breadcrumbs": product.category.breadcrumbs(),
+    })
 
+def also_bought(request, slug):
+    """The "customers also bought" block of a product page (HTMX endpoint).
+
+    Loaded after the page so that the page's ETag doesn't depend on it.
+    """
+    product = get_object_or_404(Product.objects.only("pk", "category"), slug=slug, is_active=True)
+    return render(request, "catalog/_also_bought.html", {"products": recommendations.also_bought(product)})
+
+@rate_limited("live_search", per_session=True)
 def product_search(request):
     q = request.GET.get("q", "").strip()
     qs = Product.objects.select_related("category")
     if q:
         qs = qs.filter(Q(name__icontains=q) | Q(category__name__icontains=q))
-    return render(request, "catalog/_product_grid.html", {"products": qs, "categories": Category.objects.all()})
\ No newline at end of file
+    qs, product_facets = facet_listing(request, qs, ("shop", None, q, None), reverse("catalog:product_list"))
+    return render(request, "catalog/_product_grid.html", {
+        "products": qs, "categories": sidebar_categories(), "facets": product_facets, "facets_oob": True,
+    })
+
+def suggestion_limit(request):
+    try:
+        return min(int(request.GET.get("limit", 8)), MAX_RESULTS)
+    except ValueError:
+        return 8
+
+def autocomplete(request):
+    """Search-box suggestions from the in-process typeahead index (HTMX endpoint)"""
+    q = request.GET.get("q", "")
+    suggestions = typeahead.suggest(q, suggestion_limit(request))
+    return render(request, "catalog/_autocomplete.html", {"q": q, "suggestions": suggestions})
@@ -85,10 +85,22 @@ class Order(models.Model):
     def __str__(self):
         return f"Order #{self.order_number}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so status changes can be detected on save
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.order_number:
             self.order_number = self.generate_order_number()
         super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
+    @property
+    def status_changed(self):
+        return self.status != getattr(self, '_loaded_status', self.status)
 
     def generate_order_number(self):
         """Generate a unique order number"""
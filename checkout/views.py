@@ -1,7 +1,8 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from cart.views import _get_cart, CART_KEY
-from catalog.models import Product
+from django.db import transaction
+from cart.views import _save_cart, cart_lines, request_cart
+from core.ratelimit import rate_limited
 from .forms import AddressForm
 from .models import Address, Order
 
@@ -10,10 +11,13 @@ def address_view(request):
     if request.method == "POST" and form.is_valid():
         request.session["address_data"] = form.cleaned_data
         return redirect("checkout:confirm")
-    return render(request, "checkout/address.html", {"form": form})
+    lines, total = cart_lines(request_cart(request))
+    return render(request, "checkout/address.html",
+                  {"form": form, "cart_items": lines, "cart_total": total/100})
 
+@rate_limited("order", methods=("POST",))
 def confirm_view(request):
-    cart = _get_cart(request.session)
+    cart = request_cart(request)
     if not cart:
         messages.error(request, "Cart is empty.")
         return redirect("cart:view")
@@ -22,18 +26,13 @@ def confirm_view(request):
         messages.error(request, "Provide address first.")
         return redirect("checkout:address")
 
-    total = 0
-    lines = []
-    for slug, qty in cart.items():
-        p = Product.objects.get(slug=slug)
-        subtotal = p.price_cents * qty
-        total += subtotal
-        lines.append({"p": p, "qty": qty, "subtotal": subtotal/100})
+    lines, total = cart_lines(cart)
 
     if request.method == "POST":
-        address = Address.objects.create(**addr)
-        order = Order.objects.create(address=address, total_cents=total, status="paid")  # COD stub
-        request.session[CART_KEY] = {}
+        with transaction.atomic():
+            address = Address.objects.create(**addr)
+            order = Order.objects.create(address=address, total_cents=total, status="paid")  # COD stub
+        _save_cart(request.session, {})
         request.session.pop("address_data", None)
         messages.success(request, f"Order #{order.id} placed.")
         return redirect("checkout:done")
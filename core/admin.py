@@ -1,3 +1,17 @@
 from django.contrib import admin
+from django.utils import timezone
+from .models import OutboxEvent
 
-# Register your models here.
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "topic", "status", "attempts", "max_attempts", "available_at", "created_at")
+    list_filter = ("status", "topic")
+    search_fields = ("topic", "last_error")
+    readonly_fields = ("created_at", "locked_by", "locked_until", "last_error")
+    ordering = ("available_at", "id")
+    actions = ["requeue"]
+
+    @admin.action(description="Requeue selected events")
+    def requeue(self, request, queryset):
+        updated = queryset.update(status="pending", attempts=0, available_at=timezone.now(), locked_by="", locked_until=None)
+        self.message_user(request, f"{updated} event(s) requeued.")
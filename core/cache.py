@@ -0,0 +1,287 @@
+"""
+Cache backends used by the project.
+
+``LocMemCache`` and ``RedisCache`` are the stock Django backends with hit/miss
+counters for the cache stats endpoint. ``TwoTierCache`` keeps a small
+in-process LRU in front of another (shared) cache alias and is meant for
+entries whose key changes whenever their content does, such as catalog data
+keyed by the catalog generation.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.cache.backends import locmem, redis
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def key_namespace(key):
+    """Namespace of a cache key, e.g. ``"cart"`` for ``"cart:user:1"``"""
+    return str(key).split(":", 1)[0]
+
+
+class CacheStatsMixin:
+    """Count hits and misses per key namespace in this process"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    def record(self, key, hit):
+        namespace = key_namespace(key)
+        (self.hits if hit else self.misses)[namespace] += 1
+        instrumentation.count_cache(namespace, hit)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        self.record(key, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def stats(self):
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        return {
+            "backend": f"{type(self).__module__}.{type(self).__name__}",
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "namespaces": {
+                name: {"hits": self.hits[name], "misses": self.misses[name]} for name in namespaces
+            },
+        }
+
+
+class LocMemCache(CacheStatsMixin, locmem.LocMemCache):
+    """Per-process cache for development and tests"""
+
+
+def _fail_open(default=None):
+    """Treat Redis connection errors as a cache miss instead of a server error"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except self.connection_errors as exc:
+                if not self.ignore_exceptions:
+                    raise
+                logger.warning(f"Cache {method.__name__} failed, continuing without cache: {exc}")
+                return default
+        return wrapper
+    return decorator
+
+
+class RedisCache(CacheStatsMixin, redis.RedisCache):
+    """Shared cache on any Redis-protocol server (Redis, Valkey, KeyDB...)
+
+    With ``OPTIONS["IGNORE_EXCEPTIONS"]`` (the default) an unreachable server
+    degrades to cache misses and dropped writes rather than failing requests.
+    Counters (``incr``/``decr``) still raise so callers can decide;
+    ``incr_window`` returns None.
+    """
+
+    def __init__(self, server, params):
+        options = dict(params.get("OPTIONS", {}))
+        self.ignore_exceptions = options.pop("IGNORE_EXCEPTIONS", True)
+        super().__init__(server, {**params, "OPTIONS": options})
+
+    @property
+    def connection_errors(self):
+        import redis as redis_py
+        return (redis_py.ConnectionError, redis_py.TimeoutError)
+
+    def get(self, key, default=None, version=None):
+        try:
+            value = redis.RedisCache.get(self, key, _MISSING, version)
+        except self.connection_errors as exc:
+            if not self.ignore_exceptions:
+                raise
+            logger.warning(f"Cache get failed, continuing without cache: {exc}")
+            value = _MISSING
+        self.record(key, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    @_fail_open({})
+    def get_many(self, keys, version=None):
+        found = super().get_many(keys, version)
+        for key in keys:
+            self.record(key, key in found)
+        return found
+
+    add = _fail_open(False)(redis.RedisCache.add)
+    set = _fail_open()(redis.RedisCache.set)
+    set_many = _fail_open([])(redis.RedisCache.set_many)
+    touch = _fail_open(False)(redis.RedisCache.touch)
+    delete = _fail_open(False)(redis.RedisCache.delete)
+    delete_many = _fail_open()(redis.RedisCache.delete_many)
+    has_key = _fail_open(False)(redis.RedisCache.has_key)
+
+    @_fail_open()
+    def incr_window(self, current_key, previous_key, timeout, version=None):
+        """Increment ``current_key`` and read ``previous_key`` in one round trip.
+
+        Returns ``(previous, current)`` counts for core.ratelimit. The counter
+        is created on first use and expires ``timeout`` seconds after the
+        last increment.
+        """
+        current_key = self.make_and_validate_key(current_key, version=version)
+        previous_key = self.make_and_validate_key(previous_key, version=version)
+        pipe = self._cache.get_client(current_key, write=True).pipeline()
+        pipe.incr(current_key)
+        pipe.expire(current_key, timeout)
+        pipe.get(previous_key)
+        current, _, previous = pipe.execute()
+        return int(previous or 0), current
+
+    def stats(self):
+        stats = super().stats()
+        try:
+            info = self._cache.get_client().info()
+        except self.connection_errors as exc:
+            stats["server"] = {"error": str(exc)}
+        else:
+            stats["server"] = {
+                name: info.get(name)
+                for name in ("redis_version", "used_memory_human", "connected_clients",
+                             "keyspace_hits", "keyspace_misses", "evicted_keys")
+            }
+        return stats
+
+
+class TwoTierCache(BaseCache):
+    """In-process LRU in front of a shared cache alias.
+
+    ``LOCATION`` names the shared alias. Local copies live for at most
+    ``OPTIONS["LOCAL_TIMEOUT"]`` seconds, which bounds how stale another
+    process can see an entry that was overwritten; only store values that
+    never change under the same key. ``clear()`` only empties the local tier.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = location or "default"
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 30)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = Counter()
+        self.shared_hits = Counter()
+        self.misses = Counter()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    @property
+    def connection_errors(self):
+        """Errors the shared cache raises when its server is unreachable"""
+        return getattr(self.shared, "connection_errors", ())
+
+    def _local_key(self, key, version):
+        return self.shared.make_and_validate_key(key, version=version)
+
+    def _local_get(self, local_key):
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+        return pickle.loads(data)
+
+    def _local_set(self, local_key, value, timeout):
+        ttl = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            return
+        # Pickled so callers mutating a returned value cannot change the cached copy
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + ttl, data)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, local_key):
+        with self._lock:
+            self._local.pop(local_key, None)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self.local_hits[key_namespace(key)] += 1
+            instrumentation.count_cache(key_namespace(key), True)
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self.misses[key_namespace(key)] += 1
+            return default
+        self.shared_hits[key_namespace(key)] += 1
+        self._local_set(local_key, value, self._local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self._local_set(self._local_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._local_set(self._local_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        if self._local_get(self._local_key(key, version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        namespaces = sorted(set(self.local_hits) | set(self.shared_hits) | set(self.misses))
+        return {
+            "backend": f"{type(self).__module__}.{type(self).__name__}",
+            "shared_alias": self._shared_alias,
+            "local_entries": len(self._local),
+            "hits": sum(self.local_hits.values()) + sum(self.shared_hits.values()),
+            "local_hits": sum(self.local_hits.values()),
+            "misses": sum(self.misses.values()),
+            "namespaces": {
+                name: {
+                    "local_hits": self.local_hits[name],
+                    "shared_hits": self.shared_hits[name],
+                    "misses": self.misses[name],
+                }
+                for name in namespaces
+            },
+        }
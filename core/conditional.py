@@ -0,0 +1,64 @@
+"""
+Validators for conditional GETs.
+
+ETags are hashes of a few aggregates (latest ``updated_at``, row counts) that
+the database answers from one small query, so a revisit can be answered
+with 304 Not Modified before anything is serialized or rendered.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from cart.views import request_cart
+
+
+def make_etag(*parts):
+    """Strong ETag over ``parts``, including ``CACHE_VERSION`` so deploys that change payloads invalidate it"""
+    digest = hashlib.md5(repr((settings.CACHE_VERSION,) + parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def queryset_state(queryset, fields=("updated_at",)):
+    """Latest value of each of ``fields`` and the row count, in one query"""
+    aggregates = {f"latest_{index}": Max(field) for index, field in enumerate(fields)}
+    state = queryset.order_by().aggregate(count=Count("pk", distinct=True), **aggregates)
+    return state["count"], [state[f"latest_{index}"] for index in range(len(fields))]
+
+
+def viewer_state(request):
+    """Parts of a rendered page that depend on who is looking at it.
+
+    Returns None when the page must not be answered from a client cache,
+    i.e. when flash messages are waiting to be shown.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    return (request.user.pk, sorted(request_cart(request).items()))
+
+
+def not_modified(request, etag, last_modified=None):
+    """304 response (with the validators, as ``@condition`` sends them) if the client's still match, else None"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None and response.status_code == 304:
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    if response.status_code == 200:
+        response.setdefault("ETag", etag)
+        if last_modified:
+            response.setdefault("Last-Modified", http_date(last_modified.timestamp()))
+    return response
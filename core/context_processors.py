@@ -1,6 +1,11 @@
+from cart.views import request_cart
+
+
 def cart_context(request):
     """Add cart information to template context"""
-    cart = request.session.get('cart', {})
+    # Visitors without a session cookie have no cart; not touching the
+    # session keeps their pages free of "Vary: Cookie"
+    cart = request_cart(request)
     cart_count = sum(cart.values()) if cart else 0
     cart_items = len(cart) if cart else 0
     
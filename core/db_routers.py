@@ -0,0 +1,110 @@
+"""
+Read-replica routing for catalog reads.
+
+Replicas are configured with ``DATABASE_REPLICA_URLS`` and exposed as the
+``replica_N`` aliases listed in ``settings.DATABASE_REPLICAS``. Reads of models
+in ``settings.REPLICA_APP_LABELS`` go to a healthy replica unless the current
+request has been pinned to the primary by ``primary_pinning_middleware``.
+
+A replica that cannot be connected to, or whose connection fails during a
+query, is skipped for ``REPLICA_RETRY_SECONDS``. The query that hit the
+failure still raises; later reads go elsewhere.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, InterfaceError, OperationalError, connections
+
+# Per-request routing state, installed by the middleware. Outside a request
+# there is no state and only open transactions force reads to the primary.
+_request_state = ContextVar("db_routing_state", default=None)
+
+# Replica alias -> monotonic time until which it is considered down
+_down_until = {}
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def begin_request(pinned=False):
+    return _request_state.set(RoutingState(pinned))
+
+
+def end_request(token):
+    state = _request_state.get()
+    _request_state.reset(token)
+    return state
+
+
+def pin_to_primary():
+    """Send the remaining reads of the current request to the primary"""
+    state = _request_state.get()
+    if state is not None:
+        state.pinned = True
+        state.wrote = True
+
+
+def mark_down(alias):
+    _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+def watch_replica(execute, sql, params, many, context):
+    """``execute_wrapper`` taking a replica out of rotation when its connection fails"""
+    try:
+        return execute(sql, params, many, context)
+    except (OperationalError, InterfaceError):
+        mark_down(context["connection"].alias)
+        raise
+
+
+def replica_available(alias):
+    """Check a replica connection, backing off for a while after a failure"""
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    connection = connections[alias]
+    if watch_replica not in connection.execute_wrappers:
+        # First, so that the wrappers pushed and popped per request stay on top
+        connection.execute_wrappers.insert(0, watch_replica)
+    try:
+        connection.ensure_connection()
+    except DatabaseError:
+        mark_down(alias)
+        return False
+    _down_until.pop(alias, None)
+    return True
+
+
+class ReplicaRouter:
+    """Route catalog reads to replicas and everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in settings.REPLICA_APP_LABELS:
+            return None
+        state = _request_state.get()
+        if state is not None and state.pinned:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see that transaction's writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if replica_available(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,202 @@
+"""
+Per-request SQL, cache and timing measurements.
+
+``request_metrics_middleware`` (core/middleware.py) opens a ``RequestStats``
+for every request. Queries on any database alias are counted and timed
+through ``execute_wrapper``, grouped by SQL shape (the statement with ``IN``
+lists collapsed), and the project's cache backends report hits and misses
+through ``count_cache``. When the response is ready:
+
+- staff users (or everyone with ``SERVER_TIMING``) get a ``Server-Timing``
+  header with the database, cache and total figures;
+- requests slower than ``SLOW_REQUEST_MS`` are logged with their most
+  repeated SQL shapes, which is how N+1 patterns show up;
+- the figures are added to this process's per-route histograms, read by
+  ``route_stats()``, and to the Prometheus metrics (core/metrics.py).
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import LazyObject, empty
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the request duration histogram buckets
+DURATION_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_current = ContextVar('request_stats', default=None)
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SPACE = re.compile(r'\s+')
+
+
+def sql_shape(sql):
+    """``sql`` with whitespace normalised and ``IN`` lists collapsed"""
+    return _IN_LIST.sub('IN (...)', _SPACE.sub(' ', sql).strip())
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    @property
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def repeated(self, limit=3):
+        """The most repeated SQL shapes as ``(count, shape)``"""
+        return [(count, shape) for shape, count in self.shapes.most_common(limit) if count > 1]
+
+    def server_timing(self, total_ms):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+
+def count_cache(namespace, hit):
+    """Called by the cache backends for every lookup"""
+    metrics.count_cache(namespace, hit)
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def begin():
+    """Start measuring the current request; returns what ``end()`` needs.
+
+    Connections belong to a thread, so only queries run in the calling
+    thread are counted: async requests call this (and ``end()``) through
+    ``sync_to_async``, in the thread their ORM calls run in.
+    """
+    stats = RequestStats()
+    wrappers = ExitStack()
+    for alias in connections:
+        wrappers.enter_context(connections[alias].execute_wrapper(stats))
+    _current.set(stats)
+    return stats, wrappers
+
+
+def abort(state):
+    """Stop measuring a request that raised"""
+    stats, wrappers = state
+    wrappers.close()
+    _current.set(None)
+    return stats
+
+
+def end(request, response, state):
+    stats = abort(state)
+    total_ms = stats.elapsed_ms
+
+    if settings.SERVER_TIMING or is_staff(request):
+        response['Server-Timing'] = stats.server_timing(total_ms)
+
+    route = route_name(request)
+    if total_ms >= settings.SLOW_REQUEST_MS:
+        logger.warning(
+            'Slow request %s %s (%s): %d in %.0f ms, %d queries in %.0f ms; repeated: %s',
+            request.method, request.path, route, response.status_code, total_ms,
+            stats.queries, stats.db_time * 1000,
+            '; '.join(f'{count}x {shape[:200]}' for count, shape in stats.repeated()) or 'none',
+        )
+    record(route, total_ms, stats)
+    metrics.observe_request(route, request.method, response.status_code, total_ms / 1000, stats)
+    return response
+
+
+def is_staff(request):
+    # Only a user that authentication already loaded; never load one just for this
+    user = request.__dict__.get('user')
+    if issubclass(type(user), LazyObject) and user._wrapped is empty:
+        return False
+    return bool(getattr(user, 'is_staff', False))
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match.route
+
+
+class RouteHistogram:
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.duration_ms = 0.0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, total_ms, stats):
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if total_ms <= bound:
+                self.buckets[index] += 1
+                break
+        self.count += 1
+        self.duration_ms += total_ms
+        self.queries += stats.queries
+        self.db_ms += stats.db_time * 1000
+        self.cache_hits += stats.cache_hits
+        self.cache_misses += stats.cache_misses
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'duration_ms': {
+                'sum': round(self.duration_ms, 1),
+                'buckets': {
+                    ('+Inf' if bound == float('inf') else str(bound)): count
+                    for bound, count in zip(DURATION_BUCKETS, self.buckets)
+                },
+            },
+            'queries': {'sum': self.queries, 'mean': round(self.queries / self.count, 2) if self.count else 0},
+            'db_ms': round(self.db_ms, 1),
+            'cache': {'hits': self.cache_hits, 'misses': self.cache_misses},
+        }
+
+
+_routes = {}
+_routes_lock = threading.Lock()
+
+
+def record(route, total_ms, stats):
+    with _routes_lock:
+        histogram = _routes.get(route)
+        if histogram is None:
+            histogram = _routes[route] = RouteHistogram()
+        histogram.add(total_ms, stats)
+
+
+def route_stats():
+    """Per-route histograms of this process"""
+    with _routes_lock:
+        return {route: histogram.as_dict() for route, histogram in sorted(_routes.items())}
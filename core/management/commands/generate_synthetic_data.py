@@ -0,0 +1,149 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.cache import bump_generation
+from catalog.models import Category, Product, Tag
+from checkout.models import Address, Order, OrderItem
+
+MATERIALS = [value for value, _ in Product.MATERIAL_CHOICES]
+PAYMENT_METHODS = [value for value, _ in Order.PAYMENT_METHOD_CHOICES]
+STATUSES = [value for value, _ in Order.ORDER_STATUS_CHOICES]
+WORDS = ['Aurora', 'Halo', 'Solitaire', 'Vintage', 'Twisted', 'Classic', 'Eternity', 'Pavé', 'Royal', 'Petite']
+KINDS = ['Ring', 'Necklace', 'Bracelet', 'Earrings', 'Pendant', 'Chain', 'Bangle', 'Anklet']
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic catalog, users and orders with bulk inserts (for benchmarks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--max-items', type=int, default=5, help='Most items in one order')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--prefix', default='synthetic', help='Prefix of generated slugs, SKUs and usernames')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if Category.objects.filter(slug__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Data with prefix "{prefix}" already exists; pass another --prefix')
+        rng = random.Random(options['seed'])
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            categories = self.categories(prefix, options['categories'])
+            tags = self.tags(prefix, options['tags'])
+            products = self.products(rng, prefix, options['products'], categories, tags)
+            users = self.users(prefix, options['users'])
+            orders = self.orders(rng, prefix, options['orders'], options['max_items'], users, products)
+        # Bulk inserts send no signals; invalidate cached catalog data once
+        bump_generation()
+
+        if self.verbosity:
+            self.stdout.write(self.style.SUCCESS(
+                f'Created {len(categories)} categories, {len(tags)} tags, {len(products)} products, '
+                f'{len(users)} users and {orders} orders in {time.perf_counter() - started:.1f}s'
+            ))
+
+    def insert(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        if self.verbosity > 1:
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {len(created)}')
+        return created
+
+    def categories(self, prefix, count):
+        roots = max(1, count // 5)
+        parents = self.insert(Category, [
+            Category(name=f'{prefix.title()} {KINDS[i % len(KINDS)]}s {i}', slug=f'{prefix}-category-{i}',
+                     gender=('women', 'men', 'unisex')[i % 3], sort_order=i)
+            for i in range(min(roots, count))
+        ])
+        children = self.insert(Category, [
+            Category(name=f'{prefix.title()} {WORDS[i % len(WORDS)]} {i}', slug=f'{prefix}-category-{i}',
+                     parent=parents[i % len(parents)], sort_order=i)
+            for i in range(len(parents), count)
+        ])
+        # bulk_create skips Category.save, which maintains the paths
+        Category.rebuild_paths()
+        return parents + children
+
+    def tags(self, prefix, count):
+        return self.insert(Tag, [
+            Tag(name=f'{prefix}-{WORDS[i % len(WORDS)].lower()}-{i}', slug=f'{prefix}-tag-{i}')
+            for i in range(count)
+        ])
+
+    def products(self, rng, prefix, count, categories, tags):
+        if not categories:
+            return []
+        products = self.insert(Product, [
+            Product(
+                category=rng.choice(categories),
+                name=f'{rng.choice(WORDS)} {rng.choice(MATERIALS).title()} {rng.choice(KINDS)} {i}',
+                slug=f'{prefix}-product-{i}',
+                sku=f'{prefix.upper()}-{i:07d}',
+                short_description=f'{rng.choice(WORDS)} piece',
+                price_cents=rng.randrange(500, 500000, 50),
+                stock_quantity=rng.randrange(0, 200),
+                material=rng.choice(MATERIALS),
+                is_featured=rng.random() < 0.05,
+                is_active=rng.random() < 0.95,
+            )
+            for i in range(count)
+        ])
+        if tags:
+            Through = Product.tags.through
+            self.insert(Through, [
+                Through(product_id=product.pk, tag_id=tag.pk)
+                for product in products
+                for tag in rng.sample(tags, min(len(tags), rng.randrange(0, 4)))
+            ])
+        return products
+
+    def users(self, prefix, count):
+        # Hashing is slow by design; every synthetic user shares one hash
+        password = make_password(f'{prefix}-password')
+        return self.insert(User, [
+            User(username=f'{prefix}-user-{i}', email=f'{prefix}-user-{i}@example.com', password=password)
+            for i in range(count)
+        ])
+
+    def orders(self, rng, prefix, count, max_items, users, products):
+        if not users or not products or not count:
+            return 0
+        addresses = self.insert(Address, [
+            Address(full_name=f'Customer {i}', phone='0700000000', line1=f'{i} Moi Avenue',
+                    city='Nairobi', county='Nairobi', country='Kenya')
+            for i in range(count)
+        ])
+        # (product, quantity) lines per order, so totals are known before inserting
+        lines = [
+            [(product, rng.randint(1, 3)) for product in rng.sample(products, min(len(products), rng.randint(1, max_items)))]
+            for _ in addresses
+        ]
+        orders = []
+        for i, (address, order_lines) in enumerate(zip(addresses, lines)):
+            total = sum(product.price_cents * quantity for product, quantity in order_lines)
+            orders.append(Order(
+                customer=rng.choice(users), address=address, order_number=f'{prefix[:10].upper()}-{i:09d}',
+                status=rng.choice(STATUSES), payment_method=rng.choice(PAYMENT_METHODS),
+                subtotal_cents=total, total_cents=total,
+            ))
+        orders = self.insert(Order, orders)
+        self.insert(OrderItem, [
+            OrderItem(order=order, product=product, quantity=quantity,
+                      price_cents=product.price_cents, total_cents=product.price_cents * quantity)
+            for order, order_lines in zip(orders, lines)
+            for product, quantity in order_lines
+        ])
+        return len(orders)
@@ -0,0 +1,100 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from catalog.cache import bump_generation
+from core.storage import HashedMediaStorage, hashed_name, is_hashed
+
+
+class Command(BaseCommand):
+    help = 'Rename existing uploads to content-hashed names and update the references to them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the renames without changing anything')
+        parser.add_argument('--delete-old', action='store_true', help='Delete the original files once references are updated')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk update')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        # Original name -> (new name, storage holding both)
+        self.renamed = {}
+        self.missing = set()
+        updated_rows = 0
+
+        for model in apps.get_models():
+            fields = model._meta.concrete_fields
+            file_fields = [
+                field for field in fields
+                if isinstance(field, models.FileField) and isinstance(field.storage, HashedMediaStorage)
+            ]
+            if not file_fields:
+                continue
+            # Derivative manifests record the name of the file they were made from
+            manifest_fields = [field.attname for field in fields if isinstance(field, models.JSONField)]
+            queryset = model._default_manager.only(*[field.attname for field in file_fields], *manifest_fields).order_by('pk')
+
+            batch, dirty = [], set()
+            for obj in queryset.iterator(chunk_size=options['batch_size']):
+                changed = self.rename_fields(obj, file_fields, manifest_fields)
+                if changed:
+                    batch.append(obj)
+                    dirty |= changed
+                if len(batch) >= options['batch_size']:
+                    updated_rows += self.flush(model, batch, dirty)
+                    batch, dirty = [], set()
+            updated_rows += self.flush(model, batch, dirty)
+
+        if updated_rows and not self.dry_run:
+            bump_generation()
+        if options['delete_old'] and not self.dry_run:
+            for old_name, (new_name, storage) in self.renamed.items():
+                if new_name != old_name:
+                    storage.delete(old_name)
+
+        verb = 'Would rename' if self.dry_run else 'Renamed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(self.renamed)} file(s) referenced by {updated_rows} row(s); '
+            f'{len(self.missing)} missing file(s) skipped'
+        ))
+
+    def rename_fields(self, obj, file_fields, manifest_fields):
+        changed = set()
+        for field in file_fields:
+            name = getattr(obj, field.attname).name
+            if not name or is_hashed(name):
+                continue
+            new_name = self.renamed[name][0] if name in self.renamed else self.rename(field, name)
+            if new_name is None:
+                continue
+            setattr(obj, field.attname, new_name)
+            changed.add(field.attname)
+            for attname in manifest_fields:
+                manifest = getattr(obj, attname)
+                if isinstance(manifest, dict) and manifest.get('source') == name:
+                    manifest['source'] = new_name
+                    changed.add(attname)
+        return changed
+
+    def rename(self, field, name):
+        if name in self.missing or not field.storage.exists(name):
+            if name not in self.missing:
+                self.stderr.write(f'Missing file, left as is: {name}')
+                self.missing.add(name)
+            return None
+        with field.storage.open(name, 'rb') as content:
+            if self.dry_run:
+                new_name = hashed_name(name, content, field.max_length)
+            else:
+                new_name = field.storage.save(name, content, max_length=field.max_length)
+        self.renamed[name] = (new_name, field.storage)
+        if self.verbosity > 1:
+            self.stdout.write(f'{name} -> {new_name}')
+        return new_name
+
+    def flush(self, model, batch, dirty):
+        if not batch:
+            return 0
+        if not self.dry_run:
+            model._default_manager.bulk_update(batch, sorted(dirty))
+        return len(batch)
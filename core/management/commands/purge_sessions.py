@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument(
+            '--grace', type=int, default=None,
+            help='Keep rows this many seconds past expiry (default: SESSION_DB_WRITE_INTERVAL), '
+                 'since the cached copy of a session may be newer than its row',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        grace = options['grace']
+        if grace is None:
+            grace = getattr(settings, 'SESSION_DB_WRITE_INTERVAL', 0)
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        expired = Session.objects.filter(expire_date__lt=cutoff)
+
+        # Short statements keyed on the expire_date index instead of one huge
+        # DELETE that holds locks and bloats the write-ahead log.
+        deleted = 0
+        while True:
+            keys = list(expired.order_by('expire_date').values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if self.verbosity > 1:
+                self.stdout.write(f'Deleted {deleted} session(s) so far')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired session(s)'))
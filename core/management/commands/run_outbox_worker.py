@@ -0,0 +1,38 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Process queued outbox events (order notifications and other side effects)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Events claimed per round trip')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain due events and exit')
+
+    def handle(self, *args, **options):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f'Outbox worker {worker_id} started')
+        while self.running:
+            handled = tasks.drain(options['batch_size'], worker_id)
+            if handled:
+                self.stdout.write(f'Processed {handled} event(s)')
+            if options['once']:
+                break
+            if not handled:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Outbox worker stopped'))
+
+    def stop(self, signum, frame):
+        self.running = False
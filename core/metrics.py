@@ -0,0 +1,76 @@
+"""
+Prometheus metrics, exposed at ``/metrics`` (see ``core.views.metrics``).
+
+Request latency, queries and database time per URL name come from
+core/instrumentation.py; cache lookups per key namespace from the cache
+backends; rate limit checks from core/ratelimit.py; orders created per
+payment method from api/signals.py; cart operations from the cart views.
+
+Counters are plain in-process increments. Under gunicorn, set
+``PROMETHEUS_MULTIPROC_DIR`` to an empty directory writable by every worker
+*before* the server starts: each worker then keeps its values in a
+memory-mapped file there, and ``/metrics`` on any worker reports the sum
+across all of them. Clear the directory on each deploy and mark dead workers
+from gunicorn's ``child_exit`` hook (see the README).
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+# Upper bounds (s) of the request duration buckets, as core.instrumentation
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Request latency by URL name',
+    ['route', 'method'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter('http_requests', 'Responses by URL name and status', ['route', 'method', 'status'])
+DB_QUERIES = Counter('db_queries', 'SQL queries run by requests, by URL name', ['route'])
+DB_DURATION = Counter('db_query_duration_seconds', 'Time spent in SQL queries, by URL name', ['route'])
+CACHE_LOOKUPS = Counter('cache_lookups', 'Cache lookups by key namespace', ['namespace', 'result'])
+RATE_LIMIT_CHECKS = Counter('rate_limit_checks', 'Rate limit checks by scope', ['scope', 'outcome'])
+ORDERS_CREATED = Counter('orders_created', 'Orders created by payment method', ['payment_method'])
+CART_OPERATIONS = Counter('cart_operations', 'Cart changes by operation', ['operation', 'channel'])
+
+
+def observe_request(route, method, status, seconds, stats):
+    REQUEST_DURATION.labels(route, method).observe(seconds)
+    REQUESTS.labels(route, method, status).inc()
+    if stats.queries:
+        DB_QUERIES.labels(route).inc(stats.queries)
+        DB_DURATION.labels(route).inc(stats.db_time)
+
+
+def count_cache(namespace, hit):
+    CACHE_LOOKUPS.labels(namespace, 'hit' if hit else 'miss').inc()
+
+
+def count_rate_limit(scope, outcome):
+    RATE_LIMIT_CHECKS.labels(scope, outcome).inc()
+
+
+def count_order(payment_method):
+    ORDERS_CREATED.labels(payment_method).inc()
+
+
+def count_cart(operation, channel):
+    """``operation`` is add, update, remove or clear; ``channel`` is web or api"""
+    CART_OPERATIONS.labels(operation, channel).inc()
+
+
+def registry():
+    """The registry to expose: every worker's values in multiprocess mode"""
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        collected = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collected)
+        return collected
+    return REGISTRY
+
+
+def exposition():
+    """``(body, content type)`` of the current values in the text format"""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
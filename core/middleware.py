@@ -0,0 +1,143 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+from . import db_routers, instrumentation, profiling
+from .ratelimit import set_headers
+
+PIN_COOKIE_NAME = "db_primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+
+@sync_and_async_middleware
+def primary_pinning_middleware(get_response):
+    """Keep a client's reads on the primary database around its writes.
+
+    Unsafe requests read from the primary throughout, and any request that
+    writes sets a short-lived cookie so the client's next requests do not
+    read replica data older than its own write.
+    """
+    def begin(request):
+        pinned = request.method not in SAFE_METHODS or PIN_COOKIE_NAME in request.COOKIES
+        return db_routers.begin_request(pinned)
+
+    def finish(token, response):
+        state = db_routers.end_request(token)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE_NAME, "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = begin(request)
+            try:
+                response = await get_response(request)
+            except BaseException:
+                db_routers.end_request(token)
+                raise
+            return finish(token, response)
+    else:
+        def middleware(request):
+            token = begin(request)
+            try:
+                response = get_response(request)
+            except BaseException:
+                db_routers.end_request(token)
+                raise
+            return finish(token, response)
+
+    return middleware
+
+
+@sync_and_async_middleware
+def rate_limit_headers_middleware(get_response):
+    """Add ``RateLimit-*`` headers for the most restrictive limit the request was checked against"""
+    def finish(request, response):
+        usage = getattr(request, 'rate_limit', None)
+        return response if usage is None else set_headers(response, usage)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return finish(request, await get_response(request))
+    else:
+        def middleware(request):
+            return finish(request, get_response(request))
+
+    return middleware
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """Measure queries, cache lookups and time per request (see core/instrumentation.py)"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            # Wrap the connections of the thread sync_to_async runs the ORM in,
+            # not the event loop's
+            state = await sync_to_async(instrumentation.begin)()
+            try:
+                response = await get_response(request)
+            except BaseException:
+                await sync_to_async(instrumentation.abort)(state)
+                raise
+            return await sync_to_async(instrumentation.end)(request, response, state)
+    else:
+        def middleware(request):
+            state = instrumentation.begin()
+            try:
+                response = get_response(request)
+            except BaseException:
+                instrumentation.abort(state)
+                raise
+            return instrumentation.end(request, response, state)
+
+    return middleware
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """Profile requests that ask for it, from staff users (see core/profiling.py)"""
+    if not settings.REQUEST_PROFILING:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            mode = profiling.requested(request)
+            if mode is None or not await sync_to_async(profiling.allowed)(request):
+                return await get_response(request)
+            profile = profiling.Profile.claim()
+            if profile is None:
+                return await get_response(request)
+            try:
+                # The event loop thread, then the thread sync_to_async runs the ORM in
+                profile.follow()
+                await sync_to_async(profile.start)()
+                response = await get_response(request)
+            finally:
+                await sync_to_async(profile.stop)()
+                profile.stop()
+                profile.finish()
+            return profile.save(request, response, mode)
+    else:
+        def middleware(request):
+            mode = profiling.requested(request)
+            if mode is None or not profiling.allowed(request):
+                return get_response(request)
+            profile = profiling.Profile.claim()
+            if profile is None:
+                return get_response(request)
+            try:
+                profile.start()
+                response = get_response(request)
+            finally:
+                profile.stop()
+                profile.finish()
+            return profile.save(request, response, mode)
+
+    return middleware
@@ -0,0 +1,250 @@
+"""
+On-demand profiling of single requests, for staff users.
+
+A request carrying an ``X-Profile`` header or a ``_profile`` query parameter,
+from a staff user (session or bearer token), runs under cProfile with its SQL
+recorded and its stacks sampled. The profile is saved in ``PROFILE_DIR`` as three files named after
+the response's ``X-Profile-Id`` header:
+
+- ``<id>.prof``: pstats data, for ``python -m pstats`` or snakeviz;
+- ``<id>.folded``: sampled stacks, collapsed, in microseconds, for
+  flamegraph.pl or speedscope;
+- ``<id>.json``: route, status, duration and every SQL statement with its time.
+
+With ``_profile=json`` (or ``X-Profile: json``) the response is replaced by
+that JSON, with the collapsed stacks and the slowest functions added. Anyone
+else's trigger is ignored, and requests without one only pay for the check.
+
+One request is profiled at a time; a trigger arriving while another request
+is being profiled is ignored. Before Python 3.12 cProfile follows the thread
+that enabled it, so under ASGI the event loop thread and the request's sync
+thread each get a profiler. From 3.12 cProfile uses ``sys.monitoring``, which
+allows one profiler per process and sees every thread. Either way code of
+other requests running at the same time can show up too.
+"""
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+
+from .instrumentation import route_name
+
+HEADER = 'HTTP_X_PROFILE'
+PARAM = '_profile'
+# Seconds between stack samples; in practice the GIL switch interval (5 ms)
+# often decides when the sampler gets to run
+SAMPLE_INTERVAL = 0.001
+# Whether each profiled thread needs its own cProfile.Profile (see above)
+PER_THREAD = sys.version_info < (3, 12)
+
+_lock = threading.Lock()
+
+
+def requested(request):
+    """The trigger's value, or None; cheap enough for every request"""
+    if HEADER in request.META:
+        return request.META[HEADER] or '1'
+    if PARAM in request.META.get('QUERY_STRING', ''):
+        return request.GET.get(PARAM)
+    return None
+
+
+def allowed(request):
+    """Whether the request comes from a staff user; may query the database"""
+    if getattr(request.user, 'is_staff', False):
+        return True
+    if not request.META.get('HTTP_AUTHORIZATION'):
+        return False
+    from api.authentication import CachedJWTAuthentication
+    from rest_framework.exceptions import APIException
+
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class SQLLog:
+    """``execute_wrapper`` keeping every statement and its duration"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+class Profile:
+    """cProfile and SQL log of one request.
+
+    ``claim()`` one, ``start()`` it in the thread that runs the request's ORM
+    calls, ``follow()`` any other thread, ``stop()`` it in every thread it was
+    started or followed in, then ``finish()`` it.
+    """
+
+    def __init__(self):
+        self.id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        self.profilers = []
+        self.enabled = {}
+        self.sampler = Sampler()
+        self.sql = SQLLog()
+        self.wrappers = ExitStack()
+        self.started = self.duration_ms = None
+
+    @classmethod
+    def claim(cls):
+        """A new profile, or None while another request is being profiled"""
+        if not _lock.acquire(blocking=False):
+            return None
+        return cls()
+
+    def start(self):
+        """Profile the calling thread and record the SQL of its connections"""
+        for alias in connections:
+            self.wrappers.enter_context(connections[alias].execute_wrapper(self.sql))
+        self._follow(sys._getframe(1))
+
+    def follow(self):
+        """Also profile the calling thread, e.g. the event loop's"""
+        self._follow(sys._getframe(1))
+
+    def _follow(self, anchor):
+        if self.started is None:
+            self.started = time.perf_counter()
+            self.sampler.start()
+        self.sampler.watch(anchor)
+        if PER_THREAD or not self.profilers:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another sys.monitoring profiler is active; keep the samples and SQL
+                return
+            self.profilers.append(profiler)
+            self.enabled[threading.get_ident()] = profiler
+
+    def stop(self):
+        """Stop profiling the calling thread"""
+        profiler = self.enabled.pop(threading.get_ident(), None)
+        if profiler is not None:
+            profiler.disable()
+
+    def finish(self):
+        """Stop sampling and recording SQL, and let the next request be profiled"""
+        try:
+            self.wrappers.close()
+            if self.started is not None:
+                self.sampler.stop()
+                self.duration_ms = (time.perf_counter() - self.started) * 1000
+        finally:
+            _lock.release()
+
+    def stats(self):
+        return pstats.Stats(*self.profilers, stream=io.StringIO())
+
+    def save(self, request, response, mode):
+        stats = self.stats()
+        folded = self.sampler.collapsed()
+        summary = {
+            'id': self.id,
+            'route': route_name(request),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(self.duration_ms, 1),
+            'queries': len(self.sql.queries),
+            'db_ms': round(sum(query['ms'] for query in self.sql.queries), 1),
+            'sql': self.sql.queries,
+        }
+        directory = Path(settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        stats.dump_stats(directory / f'{self.id}.prof')
+        (directory / f'{self.id}.folded').write_text(folded)
+        (directory / f'{self.id}.json').write_text(json.dumps(summary, indent=2))
+
+        if mode == 'json':
+            response = JsonResponse({**summary, 'functions': top_functions(stats), 'folded': folded})
+        response['X-Profile-Id'] = self.id
+        return response
+
+
+def label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{name} ({Path(filename).name}:{line})'
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})'
+
+
+class Sampler(threading.Thread):
+    """Samples the stacks of some threads, for collapsed stacks.
+
+    cProfile only keeps caller -> callee totals, which can't be turned back
+    into stacks through Django's recursive middleware chain. Samples are
+    weighted by the time since the previous one, so values are microseconds.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True, name='profile-sampler')
+        self.threads = {}
+        self.stacks = {}
+        self.done = threading.Event()
+
+    def watch(self, anchor):
+        """Sample the calling thread, from below the ``anchor`` frame"""
+        self.threads[threading.get_ident()] = anchor
+
+    def run(self):
+        previous = time.perf_counter()
+        while not self.done.wait(SAMPLE_INTERVAL):
+            now = time.perf_counter()
+            weight, previous = now - previous, now
+            frames = sys._current_frames()
+            for ident, anchor in list(self.threads.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and frame is not anchor:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    key = ';'.join(reversed(stack))
+                    self.stacks[key] = self.stacks.get(key, 0) + weight
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+    def collapsed(self):
+        """Folded stacks (``a;b;c <µs>``), for flamegraph.pl or speedscope"""
+        return ''.join(f'{key} {round(seconds * 1e6)}\n' for key, seconds in sorted(self.stacks.items()))
+
+
+def top_functions(stats, limit=30):
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {'function': label(func), 'calls': calls, 'own_ms': round(own * 1000, 3), 'cumulative_ms': round(cumulative * 1000, 3)}
+        for func, (_, calls, own, cumulative, _) in rows
+    ]
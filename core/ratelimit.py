@@ -0,0 +1,204 @@
+"""
+Sliding-window rate limiter shared by the API and the HTML views.
+
+Rates come from ``settings.RATE_LIMITS`` (``scope -> "20/hour"``), which is
+also DRF's ``DEFAULT_THROTTLE_RATES``. Each client (user, or IP address when
+anonymous, or session for views limited ``per_session``) gets two integer counters per scope: the current fixed window and
+the previous one. The request count is estimated as the current count plus
+the previous count weighted by how much of the previous window still overlaps
+the sliding window. That is fixed memory per client, and a check is a single
+increment-and-read: one pipelined round trip on Redis (see
+``RedisCache.incr_window``).
+
+Every check is counted per scope for ``stats()`` and the Prometheus
+metrics, and the most restrictive
+one is kept on ``request.rate_limit`` for
+``core.middleware.rate_limit_headers_middleware`` to report as
+``RateLimit-*`` headers.
+"""
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import metrics
+
+# Like DRF's AnonRateThrottle, this scope leaves authenticated users alone
+ANON_SCOPE = 'anon'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_counters = Counter()
+
+
+@dataclass
+class Usage:
+    scope: str
+    limit: int
+    window: int
+    count: float
+    reset: int
+
+    @property
+    def allowed(self):
+        return self.count <= self.limit
+
+    @property
+    def remaining(self):
+        return max(0, math.floor(self.limit - self.count))
+
+
+def parse_rate(rate):
+    """``"20/hour"`` -> ``(20, 3600)``, as DRF reads rates"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def rate_for(scope):
+    return settings.RATE_LIMITS.get(scope)
+
+
+def window_counts(key, window, now):
+    """Count a hit in the current window; return ``(previous, current)`` counts"""
+    index = int(now // window)
+    current_key, previous_key = f'{key}:{index}', f'{key}:{index - 1}'
+    if hasattr(cache, 'incr_window'):
+        return cache.incr_window(current_key, previous_key, window * 2)
+    # Local caches: add() and incr() are each atomic, and nothing is remote
+    cache.add(current_key, 0, window * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(current_key, 1, window * 2)
+        current = 1
+    return cache.get(previous_key, 0), current
+
+
+def seconds_until_allowed(previous, current, limit, window, elapsed):
+    if current >= limit:
+        # Wait for this window to end and then for its weight to fall enough
+        return (window - elapsed) + window * (1 - limit / current)
+    if not previous:
+        return 0
+    return max(0, window * (1 - (limit - current) / previous) - elapsed)
+
+
+def hit(scope, ident):
+    """Count a request by ``ident`` against ``scope``; None if the scope has no rate"""
+    rate = rate_for(scope)
+    if rate is None:
+        return None
+    limit, window = parse_rate(rate)
+    now = time.time()
+    elapsed = now % window
+    counts = window_counts(f'ratelimit:{scope}:{ident}', window, now)
+    if counts is None:
+        # Cache unreachable: let the request through rather than fail it
+        _counters[scope, 'unchecked'] += 1
+        metrics.count_rate_limit(scope, 'unchecked')
+        return None
+    previous, current = counts
+    usage = Usage(scope, limit, window, previous * (1 - elapsed / window) + current, 0)
+    if usage.allowed:
+        usage.reset = math.ceil(window - elapsed)
+    else:
+        usage.reset = max(1, math.ceil(seconds_until_allowed(previous, current, limit, window, elapsed)))
+    outcome = 'allowed' if usage.allowed else 'limited'
+    _counters[scope, outcome] += 1
+    metrics.count_rate_limit(scope, outcome)
+    return usage
+
+
+def client_ident(request, user, per_session=False):
+    if user.is_authenticated:
+        return f'user:{user.pk}'
+    session = getattr(request, 'session', None)
+    if per_session and session is not None:
+        # Loading the session drops a key that names no stored session, so
+        # made-up cookies don't buy fresh counters
+        session.keys()
+        if session.session_key:
+            return f'session:{session.session_key}'
+    # DRF's reading of REMOTE_ADDR/X-Forwarded-For (NUM_PROXIES), so both sides agree
+    from rest_framework.throttling import BaseThrottle
+    return f'ip:{BaseThrottle().get_ident(request)}'
+
+
+def note(request, usage):
+    """Keep the most restrictive usage on the request for the response headers"""
+    current = getattr(request, 'rate_limit', None)
+    if current is None or (usage.allowed, usage.remaining) < (current.allowed, current.remaining):
+        request.rate_limit = usage
+
+
+def check(request, user, scopes, per_session=False):
+    """Count the request against ``scopes``; the first exceeded usage, else None"""
+    exceeded = None
+    for scope in scopes:
+        if scope == ANON_SCOPE and user.is_authenticated:
+            continue
+        usage = hit(scope, client_ident(request, user, per_session))
+        if usage is None:
+            continue
+        note(request, usage)
+        if not usage.allowed and exceeded is None:
+            exceeded = usage
+    return exceeded
+
+
+def too_many_requests(usage):
+    response = HttpResponse('Too many requests, please try again later.', status=429, content_type='text/plain')
+    response['Retry-After'] = str(usage.reset)
+    return response
+
+
+def rate_limited(*scopes, methods=None, per_session=False):
+    """Limit a function view by ``scopes``, optionally only for some ``methods``.
+
+    With ``per_session`` anonymous clients with a session are counted per
+    session rather than per IP address.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if methods is None or request.method in methods:
+                    user = await request.auser()
+                    exceeded = await sync_to_async(check)(request, user, scopes, per_session)
+                    if exceeded is not None:
+                        return too_many_requests(exceeded)
+                return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if methods is None or request.method in methods:
+                    exceeded = check(request, request.user, scopes, per_session)
+                    if exceeded is not None:
+                        return too_many_requests(exceeded)
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_headers(response, usage):
+    response['RateLimit-Limit'] = str(usage.limit)
+    response['RateLimit-Remaining'] = str(usage.remaining)
+    response['RateLimit-Reset'] = str(usage.reset)
+    response['RateLimit-Policy'] = f'{usage.limit};w={usage.window}'
+    return response
+
+
+def stats():
+    """Checks per scope in this process: allowed, limited and unchecked (cache down)"""
+    scopes = sorted({scope for scope, _ in _counters})
+    return {
+        scope: {outcome: _counters[scope, outcome] for outcome in ('allowed', 'limited', 'unchecked')}
+        for scope in scopes
+    }
@@ -0,0 +1,27 @@
+from django.conf import settings
+
+
+def async_enabled(route_name):
+    """Whether ``route_name`` (e.g. ``"catalog:product_list"``) should use its async view"""
+    enabled = settings.ASYNC_VIEWS
+    return "*" in enabled or route_name in enabled
+
+
+def pick_view(route_name, sync_view, async_view):
+    """Choose between the sync and native async implementation of a route.
+
+    Routes listed in ``settings.ASYNC_VIEWS`` (or all routes with ``"*"``) are
+    served by the async view, which only pays off under ASGI.
+    """
+    return async_view if async_enabled(route_name) else sync_view
+
+
+async def prime_request(request):
+    """Load the session and user asynchronously.
+
+    Context processors and templates read ``request.session`` and
+    ``request.user`` synchronously; priming their caches first keeps those
+    reads from touching the database inside the event loop.
+    """
+    await request.session.aitems()
+    request.user = await request.auser()
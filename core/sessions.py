@@ -0,0 +1,52 @@
+"""
+Cache-first session engine with throttled database writes.
+
+Every save goes to the cache (``SESSION_CACHE_ALIAS``), which serves all
+reads. The ``django_session`` row is written when a session is created and
+then at most once per ``SESSION_DB_WRITE_INTERVAL`` seconds, so a shopper
+adjusting their cart costs cache writes rather than a row update per click.
+Sessions are created with ``must_create`` and login/logout cycle or delete
+them, so authentication changes always reach the database immediately.
+
+If the cache loses an entry, the session falls back to its last database
+copy, dropping at most ``SESSION_DB_WRITE_INTERVAL`` seconds of changes.
+
+The cache must be shared by every worker: with a per-process cache each
+worker would keep serving its own copy of a session. The settings only select
+this engine when ``CACHE_URL`` names a shared cache.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db, db
+from django.contrib.sessions.backends.base import UpdateError
+
+# Session data key holding the time of the last database write
+DB_SAVED_AT = "_db_saved_at"
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_key_prefix = "session:"
+
+    def db_write_due(self, must_create):
+        if must_create:
+            return True
+        saved_at = self._session.get(DB_SAVED_AT, 0)
+        return time.time() - saved_at >= settings.SESSION_DB_WRITE_INTERVAL
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if self.db_write_due(must_create):
+            # Stored in the data itself so the cached copy knows it too
+            self._get_session(no_load=must_create)[DB_SAVED_AT] = int(time.time())
+            try:
+                db.SessionStore.save(self, must_create=must_create)
+            except UpdateError:
+                # The row was purged while the session lived on in the cache
+                db.SessionStore.save(self, must_create=True)
+        self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+
+    async def asave(self, must_create=False):
+        await sync_to_async(self.save)(must_create)
@@ -0,0 +1,114 @@
+"""
+Media storage with content-addressed file names.
+
+Uploads are saved as ``<stem>.<hash>.<ext>``, so a name always refers to the
+same bytes and can be cached by browsers and CDNs forever. Saving identical
+content twice reuses the existing file; a name that merely looks hashed is
+hashed again. Image derivatives, named after their source's digest, are
+saved under their name with ``save_derived()``. Text-like uploads also get ``.gz``
+(and ``.br`` when the optional ``brotli`` package is installed) siblings that
+``core.views.serve_media`` hands to clients that accept them.
+"""
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+HASH_LENGTH = 12
+# Names whose stem ends in a hex digest (ours, or derivatives named after
+# their source digest) are served as immutable
+HASHED_STEM = re.compile(r"\.[0-9a-f]{12,64}$")
+COMPRESSIBLE_EXTENSIONS = {".svg", ".json", ".txt", ".csv", ".xml", ".html", ".css", ".js"}
+COMPRESSED_SUFFIXES = (".br", ".gz")
+
+
+def is_hashed(name):
+    """Whether ``name`` carries a content hash and is therefore immutable"""
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    return bool(HASHED_STEM.search(stem))
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name, content, max_length=None):
+    """``products/ring.jpg`` -> ``products/ring.<hash>.jpg``"""
+    directory, filename = posixpath.split(name)
+    stem, ext = posixpath.splitext(filename)
+    digest = content_hash(content)
+    if stem.endswith(f".{digest}"):
+        # Already named after these bytes, e.g. saved again under its own name
+        return name
+    suffix = f".{digest}{ext.lower()}"
+    if max_length:
+        # Shorten the stem rather than let the storage truncate the hash away
+        overflow = len(posixpath.join(directory, stem + suffix)) - max_length
+        if overflow > 0:
+            stem = stem[:max(len(stem) - overflow, 1)]
+    return posixpath.join(directory, stem + suffix)
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """File system storage that names files after their content"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = ContentFile(content, name)
+        name = hashed_name(self.generate_filename(name), content, max_length)
+        if self.exists(name):
+            # Same name means same bytes, so there is nothing to write
+            return name
+        name = super().save(name, content, max_length)
+        self.save_compressed(name, content)
+        return name
+
+    def save_derived(self, name, content):
+        """Save a file under ``name``, which the application derived from its source's digest"""
+        if self.exists(name):
+            return name
+        name = super().save(name, content)
+        self.save_compressed(name, content)
+        return name
+
+    def save_compressed(self, name, content):
+        """Write precompressed siblings for compressible file types"""
+        if posixpath.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        content.seek(0)
+        data = content.read()
+        if isinstance(data, str):
+            data = data.encode()
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data)
+        for suffix, compressed in variants.items():
+            # Only keep variants that are actually smaller
+            if len(compressed) < len(data):
+                with open(self.path(name + suffix), "wb") as handle:
+                    handle.write(compressed)
+
+    def delete(self, name):
+        super().delete(name)
+        for suffix in COMPRESSED_SUFFIXES:
+            path = self.path(name + suffix)
+            if os.path.exists(path):
+                os.remove(path)
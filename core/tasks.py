@@ -0,0 +1,121 @@
+"""
+Database-backed task queue for order notifications and other side effects.
+
+Producers call ``enqueue()`` inside the transaction that changes the data, so an
+event exists if and only if the change was committed. Handlers are registered
+with ``@handler("topic")`` and run later by ``manage.py run_outbox_worker``.
+"""
+import logging
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(topic):
+    """Register a function as the handler for ``topic``"""
+    def decorator(func):
+        HANDLERS[topic] = func
+        return func
+    return decorator
+
+
+def enqueue(topic, payload=None, delay=0, max_attempts=None):
+    """Record an event to be processed by the outbox worker"""
+    return OutboxEvent.objects.create(
+        topic=topic,
+        payload=payload or {},
+        available_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5),
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, in seconds"""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 5)
+    ceiling = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    delay = min(base * 2 ** max(attempts - 1, 0), ceiling)
+    return delay + random.uniform(0, delay / 10)
+
+
+def claim_batch(limit=50, worker_id=None):
+    """Lease up to ``limit`` due events to this worker.
+
+    Events left in ``processing`` by a crashed worker become claimable again
+    once their lease expires.
+    """
+    worker_id = worker_id or uuid.uuid4().hex
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+    claimable = (
+        Q(status='pending', available_at__lte=now) |
+        Q(status='processing', locked_until__lt=now)
+    )
+
+    with transaction.atomic():
+        ids = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('available_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        # The status filter is repeated so that two workers racing on a
+        # backend without SELECT ... FOR UPDATE cannot both take a row.
+        OutboxEvent.objects.filter(claimable, id__in=ids).update(
+            status='processing',
+            locked_by=worker_id,
+            locked_until=now + lease,
+        )
+
+    return list(OutboxEvent.objects.filter(id__in=ids, locked_by=worker_id, status='processing'))
+
+
+def process_event(event):
+    """Run the handler for a claimed event and record the outcome"""
+    func = HANDLERS.get(event.topic)
+    try:
+        if func is None:
+            raise LookupError(f"No handler registered for topic '{event.topic}'")
+        func(event.payload)
+    except Exception as exc:
+        event.attempts += 1
+        event.last_error = f"{type(exc).__name__}: {exc}"
+        event.locked_by = ''
+        event.locked_until = None
+        if event.attempts >= event.max_attempts:
+            event.status = 'failed'
+            logger.error(f"Outbox event {event} failed permanently: {event.last_error}")
+        else:
+            event.status = 'pending'
+            event.available_at = timezone.now() + timedelta(seconds=retry_delay(event.attempts))
+            logger.warning(f"Outbox event {event} failed (attempt {event.attempts}), retrying: {event.last_error}")
+        event.save(update_fields=['attempts', 'last_error', 'locked_by', 'locked_until', 'status', 'available_at'])
+        return False
+
+    event.delete()
+    return True
+
+
+def drain(batch_size=50, worker_id=None):
+    """Process due events until none are left; returns the number handled"""
+    worker_id = worker_id or uuid.uuid4().hex
+    handled = 0
+    while True:
+        batch = claim_batch(batch_size, worker_id)
+        if not batch:
+            return handled
+        for event in batch:
+            process_event(event)
+            handled += 1
@@ -1,5 +1,17 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.static import was_modified_since
+
 from catalog.models import Product
+from . import metrics as prometheus
+from .storage import is_hashed
 
 def home(request):
     # Get featured products (limit to 3 for homepage display)
@@ -11,4 +23,84 @@ def home(request):
     context = {
         'featured_products': featured_products,
     }
-    return render(request, "home.html", context)
\ No newline at end of file
+    return render(request, "home.html", context)
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an ``Accept-Encoding`` header"""
+    qualities = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            qualities[coding.strip().lower()] = quality
+    return qualities
+
+def serve_media(request, path):
+    """Serve an uploaded file with cache headers suited to its name.
+
+    Content-hashed names (see core.storage) are immutable and cached for a
+    year; anything else gets ``MEDIA_CACHE_MAX_AGE``. Precompressed ``.br`` and
+    ``.gz`` siblings are preferred when the client accepts them.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid path")
+    if not os.path.isfile(fullpath):
+        raise Http404("File not found")
+
+    # Pick the representation first: each encoding gets its own ETag
+    served, coding = fullpath, None
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    for suffix, candidate in (("br", "br"), ("gz", "gzip")):
+        # "q=0" refuses a coding; "*" covers the ones not listed
+        if accepted.get(candidate, accepted.get("*", 0)) > 0 and os.path.isfile(f"{fullpath}.{suffix}"):
+            served, coding = f"{fullpath}.{suffix}", candidate
+            break
+
+    stat = os.stat(fullpath)
+    last_modified = http_date(stat.st_mtime)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}{f"-{coding}" if coding else ""}"'
+    if etag in parse_etags(request.headers.get("If-None-Match", "")) or (
+        "If-None-Match" not in request.headers
+        and not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime)
+    ):
+        response = HttpResponseNotModified()
+    else:
+        content_type, encoding = mimetypes.guess_type(fullpath)
+        if encoding:
+            # e.g. an uploaded .tar.gz is served as is, not decoded by the browser
+            content_type = "application/octet-stream"
+        response = FileResponse(
+            open(served, "rb"),
+            content_type=content_type or "application/octet-stream",
+            filename=os.path.basename(fullpath),
+        )
+        if coding:
+            response.headers["Content-Encoding"] = coding
+
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = last_modified
+    if is_hashed(path):
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    return response
+
+
+def metrics(request):
+    """Prometheus metrics for staff users and the addresses in ``METRICS_ALLOWED_IPS``"""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    body, content_type = prometheus.exposition()
+    response = HttpResponse(body, content_type=content_type)
+    response["Cache-Control"] = "no-store"
+    return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 import environ
 
@@ -64,11 +65,15 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.request_metrics_middleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.profiling_middleware",
+    "core.middleware.primary_pinning_middleware",
+    "core.middleware.rate_limit_headers_middleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -95,6 +100,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "tac_ecomm.wsgi.application"
+ASGI_APPLICATION = "tac_ecomm.asgi.application"
+
+# Route names served by native async views under ASGI (see core/routing.py),
+# e.g. "catalog:product_list,api:cart" or "*" for every async-capable route.
+ASYNC_VIEWS = env.list("ASYNC_VIEWS", default=[])
+
+# Search-box suggestions come from an in-process index (see
+# catalog/typeahead.py); after catalog changes made by other processes it is
+# rebuilt at most this often.
+TYPEAHEAD_REBUILD_SECONDS = env.int("TYPEAHEAD_REBUILD_SECONDS", default=60)
 
 
 # Database
@@ -104,6 +119,59 @@ DATABASES = {
     "default": env.db(default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
 }
 
+# Read replicas for catalog reads, e.g.
+# DATABASE_REPLICA_URLS=postgresql://ro@replica1/tac_ecomm,postgresql://ro@replica2/tac_ecomm
+DATABASE_REPLICAS = []
+for index, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[])):
+    alias = f"replica_{index}"
+    DATABASES[alias] = environ.Env.db_url_config(url)
+    # Tests read replica aliases through the default test database
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+REPLICA_APP_LABELS = ["catalog"]
+# How long a client keeps reading from the primary after it wrote
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=5)
+# How long a replica that failed to connect is skipped
+REPLICA_RETRY_SECONDS = env.int("REPLICA_RETRY_SECONDS", default=30)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# CACHE_URL selects the shared cache used for carts, sessions and rate limits,
+# e.g. redis://localhost:6379/0 (any Redis-protocol server; REDIS_URL is
+# accepted too). Without it each process gets its own local-memory cache,
+# which is only suitable for development. Bump CACHE_VERSION to invalidate
+# every cached entry at once.
+
+CACHE_VERSION = env.int("CACHE_VERSION", default=1)
+_shared_cache = env.cache("CACHE_URL", default=env("REDIS_URL", default="locmemcache://"))
+_shared_cache["BACKEND"] = {
+    "django.core.cache.backends.locmem.LocMemCache": "core.cache.LocMemCache",
+    "django.core.cache.backends.redis.RedisCache": "core.cache.RedisCache",
+}.get(_shared_cache["BACKEND"], _shared_cache["BACKEND"])
+
+CACHES = {
+    "default": {
+        **_shared_cache,
+        "KEY_PREFIX": "tac",
+        "VERSION": CACHE_VERSION,
+    },
+    # In-process LRU in front of "default" for catalog data keyed by the
+    # catalog generation (see catalog/cache.py)
+    "catalog": {
+        "BACKEND": "core.cache.TwoTierCache",
+        "LOCATION": "default",
+        "TIMEOUT": 3600,
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("CATALOG_CACHE_LOCAL_ENTRIES", default=1000),
+            "LOCAL_TIMEOUT": env.int("CATALOG_CACHE_LOCAL_TIMEOUT", default=30),
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,14 +212,16 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR / "core" / "static"]
 
 STORAGES = {
-    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"}
+    "default": {"BACKEND": "core.storage.HashedMediaStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
 }
 
 # Use simpler static files storage for testing
 import sys
 if 'test' in sys.argv:
     STORAGES = {
-        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}
+        **STORAGES,
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
     }
 
 # Media files (User uploads)
@@ -159,6 +229,11 @@ if 'test' in sys.argv:
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Serve MEDIA_URL from Django (core.views.serve_media); turn off when the web
+# server or CDN origin serves MEDIA_ROOT directly
+SERVE_MEDIA = env.bool("SERVE_MEDIA", default=True)
+# Cache lifetime for uploads without a content hash in their name
+MEDIA_CACHE_MAX_AGE = env.int("MEDIA_CACHE_MAX_AGE", default=3600)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -175,10 +250,28 @@ MESSAGE_TAGS = {
     messages.ERROR: "error",
 }
 
+# Requests per client and scope, for the API throttles and the HTML views
+# alike (see core/ratelimit.py)
+RATE_LIMITS = {
+    'anon': env("THROTTLE_ANON_RATE", default='100/hour'),
+    'user': env("THROTTLE_USER_RATE", default='1000/hour'),
+    'login': '20/hour',
+    'registration': '10/hour',
+    'cart': '200/hour',
+    'order': '50/hour',
+    'search': '300/hour',
+    # Search-as-you-type in the shop (one request per keystroke), per session
+    'live_search': '3000/hour',
+    'admin': '5000/hour',
+}
+# Off for load tests only (benchmarks/load_test.py), never in production
+if not env.bool("RATE_LIMITS_ENABLED", default=True):
+    RATE_LIMITS = {}
+
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -201,19 +294,10 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'api.throttling.AnonRateThrottle',
+        'api.throttling.UserRateThrottle'
     ],
-    'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour',
-        'login': '20/hour',
-        'registration': '10/hour',
-        'cart': '200/hour',
-        'order': '50/hour',
-        'search': '300/hour',
-        'admin': '5000/hour',
-    },
+    'DEFAULT_THROTTLE_RATES': RATE_LIMITS,
     'EXCEPTION_HANDLER': 'api.exceptions.custom_exception_handler',
 }
 
@@ -223,6 +307,8 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    # Rotated-out refresh tokens are revoked by api/revocation.py rather than
+    # the token_blacklist app; run purge_revoked_tokens periodically
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': True,
     'ALGORITHM': 'HS256',
@@ -243,8 +329,15 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    'TOKEN_REFRESH_SERIALIZER': 'api.serializers.ClaimsTokenRefreshSerializer',
 }
 
+# API authentication resolves users from the cache for this long (see
+# api/authentication.py). With JWT_EMBED_USER_CLAIMS access tokens carry the
+# username and staff flags, so most requests skip the lookup entirely.
+JWT_USER_CACHE_SECONDS = env.int("JWT_USER_CACHE_SECONDS", default=60)
+JWT_EMBED_USER_CLAIMS = env.bool("JWT_EMBED_USER_CLAIMS", default=False)
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -267,16 +360,24 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_PATH_PREFIX': '/api/v1/',
 }
 
-# Rate Limiting
-RATELIMIT_ENABLE = True
-RATELIMIT_USE_CACHE = 'default'
-
 # Security Settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 # Session Configuration
+# With a shared cache (CACHE_URL), sessions live in the cache and reach
+# django_session at most once per SESSION_DB_WRITE_INTERVAL seconds (see
+# core/sessions.py). The per-process local-memory cache would give every
+# worker its own copy of a session, so without one sessions are read from and
+# written to the database on every request. Purge expired rows with
+# `manage.py purge_sessions`.
+SESSION_ENGINE = (
+    "django.contrib.sessions.backends.db"
+    if CACHES["default"]["BACKEND"] == "core.cache.LocMemCache"
+    else "core.sessions"
+)
+SESSION_DB_WRITE_INTERVAL = env.int("SESSION_DB_WRITE_INTERVAL", default=300)
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = not DEBUG
@@ -286,3 +387,26 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_HTTPONLY = True
 CSRF_COOKIE_SECURE = not DEBUG
 CSRF_COOKIE_SAMESITE = 'Lax'
+
+# Outbox worker (see core/tasks.py, run with `manage.py run_outbox_worker`)
+OUTBOX_MAX_ATTEMPTS = env.int("OUTBOX_MAX_ATTEMPTS", default=5)
+OUTBOX_RETRY_BASE_SECONDS = env.int("OUTBOX_RETRY_BASE_SECONDS", default=5)
+OUTBOX_RETRY_MAX_SECONDS = env.int("OUTBOX_RETRY_MAX_SECONDS", default=3600)
+OUTBOX_LEASE_SECONDS = env.int("OUTBOX_LEASE_SECONDS", default=300)
+
+# Request instrumentation (see core/instrumentation.py). Server-Timing headers
+# go to staff users, or to everyone with SERVER_TIMING; requests slower than
+# SLOW_REQUEST_MS are logged with their most repeated SQL.
+SERVER_TIMING = env.bool("SERVER_TIMING", default=DEBUG)
+SLOW_REQUEST_MS = env.int("SLOW_REQUEST_MS", default=500)
+
+# Staff requests with an X-Profile header or ?_profile=1 run under cProfile
+# (see core/profiling.py); profiles and their SQL are written to PROFILE_DIR.
+REQUEST_PROFILING = env.bool("REQUEST_PROFILING", default=True)
+PROFILE_DIR = env("PROFILE_DIR", default=str(Path(tempfile.gettempdir()) / "tac_ecomm-profiles"))
+
+# Prometheus metrics at /metrics (see core/metrics.py): open to staff users and
+# to these client addresses, normally the scraper's; none until configured.
+# Behind a proxy REMOTE_ADDR is the proxy, so block /metrics there rather than
+# list it.
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=[])
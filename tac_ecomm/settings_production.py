@@ -0,0 +1,55 @@
+"""
+Production settings for tac_ecomm.
+
+Extends the base settings with pooled PostgreSQL connections. Select it with
+DJANGO_SETTINGS_MODULE=tac_ecomm.settings_production.
+
+Pool sizes are per process: with N gunicorn workers the database sees up to
+N * DB_POOL_MAX_SIZE connections per alias, so size max_connections on the
+server accordingly.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import env, DATABASES as BASE_DATABASES
+
+DEBUG = env.bool("DEBUG", default=False)
+
+# The base settings derived these from its own DEBUG (on by default); derive
+# them again from this one
+CORS_ALLOW_ALL_ORIGINS = DEBUG
+SESSION_COOKIE_SECURE = not DEBUG
+CSRF_COOKIE_SECURE = not DEBUG
+SERVER_TIMING = env.bool("SERVER_TIMING", default=DEBUG)
+
+DB_POOL = env.bool("DB_POOL", default=True)
+DB_POOL_OPTIONS = {
+    "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+    "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+    # Seconds a request waits for a free connection before failing
+    "timeout": env.float("DB_POOL_TIMEOUT", default=10.0),
+    # Idle connections above min_size are closed after this many seconds
+    "max_idle": env.float("DB_POOL_MAX_IDLE", default=300.0),
+    # Connections are recycled after this many seconds
+    "max_lifetime": env.float("DB_POOL_MAX_LIFETIME", default=3600.0),
+}
+# Used instead of the pool when DB_POOL is off
+DB_CONN_MAX_AGE = env.int("DB_CONN_MAX_AGE", default=60)
+
+
+def configure_connection(config, pool=DB_POOL):
+    """Return a copy of ``config`` with pooling (or persistent connections) enabled"""
+    config = dict(config)
+    if config["ENGINE"] != "django.db.backends.postgresql":
+        return config
+    # Verify reused connections before handing them to a request
+    config["CONN_HEALTH_CHECKS"] = True
+    if pool:
+        # The pool replaces persistent connections; Django refuses both at once
+        config["CONN_MAX_AGE"] = 0
+        config["OPTIONS"] = {**config.get("OPTIONS", {}), "pool": dict(DB_POOL_OPTIONS)}
+    else:
+        config["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+    return config
+
+
+DATABASES = {alias: configure_connection(config) for alias, config in BASE_DATABASES.items()}
@@ -0,0 +1,35 @@
+import importlib
+
+import pytest
+from django.template import engines
+from django.template.library import InvalidTemplateLibrary
+from django.urls import clear_url_caches
+
+# URLconfs that choose views with core.routing.pick_view, included ones first
+ROUTED_URLCONFS = ("api.urls", "catalog.urls", "cart.urls", "tac_ecomm.urls")
+
+
+def reload_urlconfs():
+    for name in ROUTED_URLCONFS:
+        importlib.reload(importlib.import_module(name))
+    clear_url_caches()
+
+
+@pytest.fixture
+def async_routes(settings):
+    """Serve every route that has one with its async view (``ASYNC_VIEWS = ["*"]``)"""
+    enabled = settings.ASYNC_VIEWS
+    settings.ASYNC_VIEWS = ["*"]
+    reload_urlconfs()
+    yield
+    settings.ASYNC_VIEWS = enabled
+    reload_urlconfs()
+
+
+@pytest.fixture
+def templates():
+    """Skip tests that render pages when their template tag libraries aren't installed"""
+    try:
+        engines["django"]
+    except InvalidTemplateLibrary:
+        pytest.skip("template tag libraries unavailable")
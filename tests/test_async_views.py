@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import AsyncClient, AsyncRequestFactory, Client
+
+from api import async_views
+from cart import async_views as cart_async_views
+from catalog import async_views as catalog_async_views
+from catalog.models import Category, Product
+
+
+def async_request(path, session=None):
+    request = AsyncRequestFactory().get(path)
+    request.session = session or SessionStore()
+    if request.session.session_key:
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = request.session.session_key
+
+    async def auser():
+        return AnonymousUser()
+
+    request.auser = auser
+    return request
+
+
+@pytest.fixture
+def ring(db):
+    rings = Category.objects.create(name="Rings", slug="rings", sort_order=1)
+    Category.objects.create(name="Bands", slug="bands", parent=rings)
+    Category.objects.create(name="Hidden", slug="hidden", parent=rings, is_active=False)
+    ring = Product.objects.create(category=rings, name="Ring", slug="ring", price_cents=1500)
+    Product.objects.create(category=rings, name="Old", slug="old", price_cents=100, is_active=False)
+    return ring
+
+
+@pytest.mark.django_db
+def test_category_tree_matches_sync_view(ring):
+    response = async_to_sync(async_views.category_tree)(async_request("/api/v1/categories/tree/"))
+    tree = json.loads(response.content)
+
+    assert tree == Client().get("/api/v1/categories/tree/").json()
+    assert [c["slug"] for c in tree] == ["rings"]
+    assert tree[0]["product_count"] == 1
+    assert [c["slug"] for c in tree[0]["children"]] == ["bands"]
+
+
+@pytest.mark.django_db
+def test_async_cart_drops_inactive_products(ring):
+    session = SessionStore()
+    session["cart"] = {str(ring.pk): 2, "999999": 1}
+    session.save()
+
+    response = async_to_sync(async_views.cart)(async_request("/api/v1/cart/", session))
+    data = json.loads(response.content)
+
+    assert [item["product_id"] for item in data["items"]] == [ring.pk]
+    assert data["total_items"] == 2
+    assert data["total_cents"] == 3000
+    assert session["cart"] == {str(ring.pk): 2}
+
+
+@pytest.mark.django_db
+def test_async_cart_count():
+    session = SessionStore()
+    session["cart"] = {"ring": 2, "band": 1}
+    session.save()
+
+    response = async_to_sync(cart_async_views.cart_count)(async_request("/cart/count/", session))
+
+    assert json.loads(response.content) == {"cart_count": 3, "cart_items": 2}
+
+
+@pytest.mark.django_db
+def test_async_product_list(ring, async_routes, templates):
+    response = async_to_sync(AsyncClient().get)("/shop/c/rings/")
+
+    assert response.status_code == 200
+    assert response.resolver_match.func is catalog_async_views.product_list
+    assert "ring" in [product.slug for product in response.context["products"]]
+    counts = {category.slug: category.product_count for category in response.context["categories"]}
+    assert counts["rings"] == 2
+    assert [category.slug for category in response.context["breadcrumbs"]] == ["rings"]
+
+
+@pytest.mark.django_db
+def test_async_product_detail_revalidates(ring, async_routes, templates):
+    client = AsyncClient()
+    response = async_to_sync(client.get)("/shop/p/ring/")
+
+    assert response.status_code == 200
+    assert response.resolver_match.func is catalog_async_views.product_detail
+    assert response.context["product"] == ring
+    etag = response["ETag"]
+
+    response = async_to_sync(client.get)("/shop/p/ring/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+    ring.save()
+    response = async_to_sync(client.get)("/shop/p/ring/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+    assert async_to_sync(client.get)("/shop/p/missing/").status_code == 404
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import caches
+
+from catalog.cache import bump_generation, catalog_key, generation
+from catalog.models import Category
+from core.cache import RedisCache, TwoTierCache
+
+
+@pytest.fixture
+def two_tier():
+    caches["default"].clear()
+    yield TwoTierCache("default", {"OPTIONS": {"MAX_ENTRIES": 2, "LOCAL_TIMEOUT": 30}})
+    caches["default"].clear()
+
+
+def test_two_tier_serves_from_local_tier(two_tier):
+    two_tier.set("catalog:a", {"n": 1})
+    caches["default"].delete("catalog:a")
+    assert two_tier.get("catalog:a") == {"n": 1}
+    assert two_tier.local_hits["catalog"] == 1
+
+
+def test_two_tier_promotes_shared_entries(two_tier):
+    caches["default"].set("catalog:b", [1, 2])
+    assert two_tier.get("catalog:b") == [1, 2]
+    assert two_tier.get("catalog:b") == [1, 2]
+    assert two_tier.shared_hits["catalog"] == 1
+    assert two_tier.local_hits["catalog"] == 1
+
+
+def test_two_tier_local_copies_are_isolated(two_tier):
+    two_tier.set("catalog:c", [1])
+    two_tier.get("catalog:c").append(2)
+    assert two_tier.get("catalog:c") == [1]
+
+
+def test_two_tier_evicts_least_recently_used(two_tier):
+    for key in ("catalog:x", "catalog:y", "catalog:z"):
+        two_tier.set(key, key)
+    assert two_tier.stats()["local_entries"] == 2
+    caches["default"].clear()
+    assert two_tier.get("catalog:x") is None
+    assert two_tier.get("catalog:z") == "catalog:z"
+
+
+@pytest.mark.django_db
+def test_catalog_change_bumps_generation():
+    key = catalog_key("search", "gold")
+    Category.objects.create(name="Rings", slug="rings")
+    assert catalog_key("search", "gold") != key
+
+
+def test_generation_bumps_seen_by_other_processes(two_tier, monkeypatch):
+    other = TwoTierCache("default", {"OPTIONS": {"LOCAL_TIMEOUT": 30}})
+    monkeypatch.setattr("catalog.cache.catalog_cache", lambda: two_tier)
+    seen = generation()
+
+    monkeypatch.setattr("catalog.cache.catalog_cache", lambda: other)
+    bump_generation()
+    assert generation() == seen + 1
+
+    monkeypatch.setattr("catalog.cache.catalog_cache", lambda: two_tier)
+    assert generation() == seen + 1
+    assert catalog_key("search", "gold").startswith(f"search:{seen + 1}:")
+
+
+@pytest.mark.django_db
+def test_catalog_saves_survive_unreachable_redis(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "core.cache.RedisCache", "LOCATION": "redis://127.0.0.1:1/0",
+                    "OPTIONS": {"socket_connect_timeout": 0.1}},
+        "catalog": {"BACKEND": "core.cache.TwoTierCache", "LOCATION": "default"},
+    }
+    Category.objects.create(name="Rings", slug="rings")
+    assert catalog_key("search", "gold").startswith("search:1:")
+
+
+def test_unreachable_redis_degrades_to_misses():
+    cache = RedisCache("redis://127.0.0.1:1/0", {"OPTIONS": {"socket_connect_timeout": 0.1}})
+    assert cache.get("cart:user:1", "fallback") == "fallback"
+    cache.set("cart:user:1", {"1": 2})
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_REDIS_URL"), reason="TEST_REDIS_URL not set")
+def test_redis_round_trip():
+    cache = RedisCache(os.environ["TEST_REDIS_URL"], {"KEY_PREFIX": "tac-test"})
+    cache.set("cart:user:1", {"1": 2})
+    assert cache.get("cart:user:1") == {"1": 2}
+    assert cache.stats()["server"]["redis_version"]
+    cache.delete("cart:user:1")
+
+
+@pytest.mark.django_db
+def test_cache_stats_endpoint_is_staff_only(client):
+    assert client.get("/api/v1/cache/stats/").status_code in (401, 403)
+
+    client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass12345"))
+    response = client.get("/api/v1/cache/stats/")
+    assert response.status_code == 200
+    assert set(response.json()["caches"]) == {"default", "catalog"}
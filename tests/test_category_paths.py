@@ -0,0 +1,89 @@
+import pytest
+from django.core.cache import caches
+from django.test import Client
+
+from api.serializers import CategorySerializer
+from catalog.models import Category, Product
+from catalog.views import sidebar_categories
+
+
+@pytest.fixture
+def tree(db):
+    jewellery = Category.objects.create(name="Jewellery", slug="jewellery")
+    rings = Category.objects.create(name="Rings", slug="rings", parent=jewellery)
+    bands = Category.objects.create(name="Bands", slug="bands", parent=rings)
+    watches = Category.objects.create(name="Watches", slug="watches")
+    return jewellery, rings, bands, watches
+
+
+def test_paths_maintained_on_save(tree):
+    jewellery, rings, bands, watches = tree
+    assert bands.path == f"{jewellery.pk}/{rings.pk}/{bands.pk}/"
+
+    rings.parent = watches
+    rings.save()
+    bands.refresh_from_db()
+    assert bands.path == f"{watches.pk}/{rings.pk}/{bands.pk}/"
+    assert set(watches.subtree()) == {watches, rings, bands}
+
+    jewellery.parent = bands
+    jewellery.save()
+    assert jewellery.path == f"{watches.pk}/{rings.pk}/{bands.pk}/{jewellery.pk}/"
+
+    watches.parent = bands
+    with pytest.raises(ValueError):
+        watches.save()
+
+
+def test_breadcrumbs_in_one_query(tree, django_assert_num_queries):
+    jewellery, rings, bands, _ = tree
+    bands = Category.objects.get(pk=bands.pk)
+    with django_assert_num_queries(1):
+        assert bands.breadcrumbs() == [jewellery, rings, bands]
+    with django_assert_num_queries(0):
+        assert jewellery.breadcrumbs() == [jewellery]
+
+
+def test_rebuild_paths(tree):
+    jewellery, rings, bands, watches = tree
+    Category.objects.filter(pk=rings.pk).update(parent=watches)
+    assert Category.rebuild_paths() == 2
+    assert Category.objects.get(pk=bands.pk).path == f"{watches.pk}/{rings.pk}/{bands.pk}/"
+    assert Category.rebuild_paths() == 0
+
+
+def test_category_slug_includes_subcategories(tree, settings):
+    settings.RATE_LIMITS = {}
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    jewellery, rings, bands, watches = tree
+    for category in (jewellery, bands, watches):
+        Product.objects.create(category=category, name=category.name, slug=category.slug, sku=category.slug,
+                               price_cents=100)
+
+    def slugs(category_slug):
+        body = Client().get("/api/v1/products/", {"category_slug": category_slug}).json()
+        return sorted(product["slug"] for product in body["results"])
+
+    assert slugs("jewellery") == ["bands", "jewellery"]
+    assert slugs("rings") == ["bands"]
+    assert slugs("missing") == []
+
+
+def test_product_counts_include_subcategories(tree, settings):
+    settings.RATE_LIMITS = {}
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    jewellery, rings, bands, watches = tree
+    Product.objects.create(category=bands, name="Band", slug="band", sku="band", price_cents=100)
+    Product.objects.create(category=rings, name="Old", slug="old", sku="old", price_cents=100, is_active=False)
+
+    assert {c.slug: c.product_count for c in sidebar_categories()} == {
+        "jewellery": 2, "rings": 2, "bands": 1, "watches": 0,
+    }
+
+    [tree_root, _] = Client().get("/api/v1/categories/tree/").json()
+    assert tree_root["product_count"] == 1
+    assert tree_root["children"][0]["product_count"] == 1
+    assert Client().get(f"/api/v1/categories/{jewellery.pk}/").json()["product_count"] == 1
+    assert CategorySerializer(rings).data["product_count"] == 1
@@ -0,0 +1,110 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from catalog.cache import bump_generation
+from catalog.models import Category, Product
+from catalog.views import product_detail_etag
+from core.cache import TwoTierCache
+
+
+@pytest.fixture
+def product(db):
+    category = Category.objects.create(name="Rings", slug="rings")
+    return Product.objects.create(category=category, name="Ring", slug="ring", price_cents=1000)
+
+
+@pytest.mark.django_db
+def test_product_retrieve_answers_304_before_serializing(product):
+    client = APIClient()
+    url = f"/api/v1/products/{product.pk}/"
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first["Last-Modified"]
+
+    with CaptureQueriesContext(connection) as queries:
+        second = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert second.status_code == 304
+    assert not second.content
+    assert second["ETag"] == first["ETag"]
+    assert second["Last-Modified"] == first["Last-Modified"]
+    assert len(queries) == 1
+
+    product.price_cents = 900
+    product.save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 200
+
+
+@pytest.mark.django_db
+def test_product_list_etag_follows_filtered_set(product):
+    client = APIClient()
+    first = client.get("/api/v1/products/", {"category_slug": "rings"})
+
+    other = Category.objects.create(name="Chains", slug="chains")
+    Product.objects.create(category=other, name="Chain", slug="chain", price_cents=500)
+    assert client.get("/api/v1/products/", {"category_slug": "rings"}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+
+    Product.objects.create(category=product.category, name="Band", slug="band", price_cents=500)
+    assert client.get("/api/v1/products/", {"category_slug": "rings"}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 200
+
+
+@pytest.mark.django_db
+def test_category_endpoints_change_with_products(product):
+    client = APIClient()
+    tree = client.get("/api/v1/categories/tree/")
+    listing = client.get("/api/v1/categories/")
+    assert client.get("/api/v1/categories/tree/", HTTP_IF_NONE_MATCH=tree["ETag"]).status_code == 304
+
+    product.is_active = False
+    product.save()
+
+    assert client.get("/api/v1/categories/tree/", HTTP_IF_NONE_MATCH=tree["ETag"]).status_code == 200
+    assert client.get("/api/v1/categories/", HTTP_IF_NONE_MATCH=listing["ETag"]).status_code == 200
+
+
+@pytest.mark.django_db
+def test_category_tree_etag_follows_the_cached_body(product, settings, monkeypatch):
+    settings.RATE_LIMITS = {}
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    client = APIClient()
+    first = client.get("/api/v1/categories/tree/")
+    assert first.json()[0]["product_count"] == 1
+
+    # Changed in the database, but the generation not bumped yet
+    Product.objects.filter(pk=product.pk).update(is_active=False, updated_at=timezone.now())
+    cached = client.get("/api/v1/categories/tree/")
+    assert (cached["ETag"], cached.json()) == (first["ETag"], first.json())
+    assert client.get("/api/v1/categories/tree/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+
+    # Bumped by another process
+    other = TwoTierCache("default", {})
+    monkeypatch.setattr("catalog.cache.catalog_cache", lambda: other)
+    bump_generation()
+    monkeypatch.undo()
+
+    fresh = client.get("/api/v1/categories/tree/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert fresh.status_code == 200
+    assert fresh["ETag"] != first["ETag"]
+    assert fresh.json()[0]["product_count"] == 0
+
+
+@pytest.mark.django_db
+def test_product_detail_page_answers_304_without_rendering(product):
+    request = RequestFactory().get("/")
+    request.session = SessionStore()
+    request.user = AnonymousUser()
+    etag = product_detail_etag(request, product.slug)
+
+    response = Client().get(f"/shop/p/{product.slug}/", HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+    assert product_detail_etag(request, "missing") is None
@@ -0,0 +1,102 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+from catalog.models import Product
+from core import db_routers
+from core.db_routers import ReplicaRouter
+
+
+class FakeConnection:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.in_atomic_block = False
+        self.execute_wrappers = []
+
+    def ensure_connection(self):
+        if self.fail:
+            raise OperationalError("replica unreachable")
+
+
+@pytest.fixture
+def replicas(settings, monkeypatch):
+    settings.DATABASE_REPLICAS = ["replica_0"]
+    fake = {"default": FakeConnection(), "replica_0": FakeConnection()}
+    monkeypatch.setattr(db_routers, "connections", fake)
+    monkeypatch.setattr(db_routers, "_down_until", {})
+    return fake
+
+
+def test_catalog_reads_go_to_replica(replicas):
+    assert ReplicaRouter().db_for_read(Product) == "replica_0"
+
+
+def test_other_apps_read_from_default(replicas):
+    assert ReplicaRouter().db_for_read(User) is None
+
+
+def test_write_pins_rest_of_request(replicas):
+    router = ReplicaRouter()
+    token = db_routers.begin_request()
+    try:
+        assert router.db_for_read(Product) == "replica_0"
+        assert router.db_for_write(Product) == "default"
+        assert router.db_for_read(Product) == "default"
+    finally:
+        state = db_routers.end_request(token)
+    assert state.wrote
+    assert router.db_for_read(Product) == "replica_0"
+
+
+def test_reads_inside_transaction_use_default(replicas):
+    replicas["default"].in_atomic_block = True
+    assert ReplicaRouter().db_for_read(Product) == "default"
+
+
+def test_unreachable_replica_falls_back_and_backs_off(replicas):
+    replicas["replica_0"].fail = True
+    router = ReplicaRouter()
+    assert router.db_for_read(Product) == "default"
+
+    # Skipped without another connection attempt until the retry window ends
+    replicas["replica_0"].fail = False
+    assert router.db_for_read(Product) == "default"
+    db_routers._down_until.clear()
+    assert router.db_for_read(Product) == "replica_0"
+
+
+@pytest.mark.django_db
+def test_replica_failing_during_a_query_is_skipped(replicas, tmp_path):
+    # A real connection; an empty SQLite file fails queries with OperationalError
+    replica = DatabaseWrapper({**connections["default"].settings_dict, "NAME": str(tmp_path / "replica.sqlite3")},
+                              alias="replica_0")
+    replicas["replica_0"] = replica
+    router = ReplicaRouter()
+    try:
+        assert router.db_for_read(Product) == "replica_0"
+        with pytest.raises(OperationalError), replica.cursor() as cursor:
+            cursor.execute("SELECT id FROM catalog_product")
+
+        assert router.db_for_read(Product) == "default"
+        db_routers._down_until.clear()
+        assert router.db_for_read(Product) == "replica_0"
+        assert replica.execute_wrappers == [db_routers.watch_replica]
+    finally:
+        replica.close()
+
+
+def test_replicas_are_never_migrated(replicas):
+    assert ReplicaRouter().allow_migrate("replica_0", "catalog") is False
+    assert ReplicaRouter().allow_migrate("default", "catalog") is None
+
+
+@pytest.mark.django_db
+def test_write_request_sets_pin_cookie(client):
+    response = client.get("/api/v1/products/")
+    assert "db_primary_pin" not in response.cookies
+
+    client.force_login(User.objects.create_user(username="shopper", password="pass12345"))
+    response = client.put("/api/v1/profile/", {"phone": "0700000000"}, content_type="application/json")
+    assert response.status_code == 200
+    assert "db_primary_pin" in response.cookies
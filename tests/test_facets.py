@@ -0,0 +1,65 @@
+import pytest
+from django.core.cache import caches
+from django.test import Client
+
+from catalog.models import Category, Product
+
+
+@pytest.fixture
+def catalog(settings):
+    settings.RATE_LIMITS = {}
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    women = Category.objects.create(name="Rings", slug="rings", gender="women")
+    men = Category.objects.create(name="Chains", slug="chains", gender="men")
+    rows = [
+        (women, "gold", "18K", "diamond", 80_000),
+        (women, "gold", "24K", "", 300_000),
+        (women, "silver", "", "ruby", 150_000),
+        (men, "gold", "18K", "", 6_000_000),
+        (men, "platinum", "", "diamond", 900_000),
+    ]
+    for i, (category, material, carat, stone, price) in enumerate(rows):
+        Product.objects.create(
+            category=category, name=f"Piece {i}", slug=f"piece-{i}", sku=f"P-{i}", material=material,
+            carat=carat, stone_type=stone, price_cents=price,
+        )
+
+
+def facet(body, name):
+    return {value["value"]: value["count"] for value in next(f for f in body["facets"] if f["name"] == name)["values"]}
+
+
+@pytest.mark.django_db
+def test_facet_counts_in_one_query(catalog, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        body = Client().get("/api/v1/products/facets/").json()
+
+    assert body["count"] == 5
+    assert facet(body, "material") == {"gold": 3, "silver": 1, "platinum": 1}
+    assert facet(body, "carat") == {"18K": 2, "24K": 1}
+    assert facet(body, "stone_type") == {"diamond": 2, "ruby": 1}
+    assert facet(body, "gender") == {"men": 2, "women": 3}
+    assert facet(body, "price") == {"0-1000": 1, "1000-5000": 2, "5000-20000": 1, "50000-": 1}
+
+    with django_assert_num_queries(0):
+        assert Client().get("/api/v1/products/facets/").json() == body
+
+
+@pytest.mark.django_db
+def test_each_facet_ignores_its_own_selection(catalog):
+    body = Client().get("/api/v1/products/facets/?material=gold&gender=women").json()
+
+    assert body["count"] == 2
+    # Other materials for women, and other collections for gold
+    assert facet(body, "material") == {"gold": 2, "silver": 1}
+    assert facet(body, "gender") == {"men": 1, "women": 2}
+    assert facet(body, "carat") == {"18K": 1, "24K": 1}
+    selected = [v["value"] for f in body["facets"] for v in f["values"] if v["selected"]]
+    assert sorted(selected) == ["gold", "women"]
+
+
+@pytest.mark.django_db
+def test_product_list_narrowed_by_facets(catalog):
+    body = Client().get("/api/v1/products/?material=gold,platinum&price=5000-20000,50000-").json()
+    assert sorted(product["slug"] for product in body["results"]) == ["piece-3", "piece-4"]
@@ -0,0 +1,66 @@
+import pytest
+from django.core.cache import caches
+from django.test import Client
+
+from catalog import fuzzy
+from catalog.models import Category, Product
+
+
+@pytest.fixture
+def catalog(db, settings):
+    settings.RATE_LIMITS = {}
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    fuzzy.clear()
+    necklaces = Category.objects.create(name="Necklaces", slug="necklaces")
+    bracelets = Category.objects.create(name="Bracelets", slug="bracelets")
+    Product.objects.create(category=necklaces, name="Pearl Necklace", slug="pearl", sku="N-1", price_cents=100)
+    Product.objects.create(category=necklaces, name="Gold Necklace", slug="gold", sku="N-2", price_cents=100,
+                           is_bestseller=True)
+    Product.objects.create(category=bracelets, name="Charm Bracelet", slug="charm", sku="B-1", price_cents=100,
+                           stone_type="Sapphire")
+    yield
+    fuzzy.clear()
+
+
+def slugs(query, **params):
+    response = Client().get("/api/v1/products/search/", {"q": query, **params})
+    assert response.status_code == 200
+    return [product["slug"] for product in response.json()]
+
+
+def test_trigrams():
+    assert fuzzy.trigrams("Ring") == {"  r", " ri", "rin", "ing", "ng "}
+
+
+def test_misspellings_found_and_ranked(catalog):
+    # Same similarity: the bestseller comes first
+    assert slugs("neclace") == ["gold", "pearl"]
+    assert slugs("braclet") == ["charm"]
+    assert slugs("saphire") == ["charm"]
+    # Too few of the query's trigrams in "Gold Necklace"
+    assert slugs("pearl neclace") == ["pearl"]
+    assert slugs("tiara") == []
+
+
+def test_fuzzy_modes(catalog):
+    # Exact matches win unless fuzzy matching is asked for
+    assert sorted(slugs("Necklace")) == ["gold", "pearl"]
+    assert slugs("neclace", fuzzy="false") == []
+    assert slugs("gold neclace", fuzzy="true")[0] == "gold"
+    assert slugs("neclace", category_slug="bracelets") == []
+
+
+def test_cached_results_follow_filters(catalog):
+    assert slugs("neclace") == ["gold", "pearl"]
+    assert slugs("neclace", category_slug="bracelets") == []
+    assert slugs("neclace", category_slug="necklaces", min_price="2") == []
+    assert slugs("neclace", category_slug="necklaces") == ["gold", "pearl"]
+
+
+def test_index_follows_catalog_changes(catalog):
+    assert slugs("braclet") == ["charm"]
+    Product.objects.filter(slug="charm").get().delete()
+    Product.objects.create(category=Category.objects.get(slug="bracelets"), name="Tennis Bracelet", slug="tennis",
+                           sku="B-2", price_cents=100)
+    assert slugs("braclet") == ["tennis"]
@@ -0,0 +1,142 @@
+import importlib
+import io
+import re
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from catalog import images
+from catalog.models import Category, Product, ProductImage
+from core import tasks
+from core.models import OutboxEvent
+
+
+def png_bytes(width, height, mode="RGB"):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), "gold").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.fixture
+def category(db):
+    return Category.objects.create(name="Rings", slug="rings")
+
+
+def make_product(category, **kwargs):
+    product = Product(category=category, name="Ring", slug="ring", price_cents=1000, **kwargs)
+    product.image.save("ring.png", ContentFile(png_bytes(800, 600)), save=False)
+    product.save()
+    return product
+
+
+def test_render_derivatives_never_upscales():
+    rendered = images.render_derivatives(png_bytes(700, 350, mode="RGBA"))
+
+    assert [(width, fmt) for width, fmt, _ in rendered] == [
+        (320, "webp"), (320, "jpeg"), (640, "webp"), (640, "jpeg"),
+    ]
+    with Image.open(io.BytesIO(rendered[1][2])) as jpeg:
+        assert (jpeg.format, jpeg.size) == ("JPEG", (320, 160))
+
+
+@pytest.mark.django_db
+def test_image_upload_is_processed_by_worker(category):
+    product = make_product(category)
+    assert OutboxEvent.objects.filter(topic="product.image_changed").count() == 1
+
+    tasks.drain()
+
+    product.refresh_from_db()
+    assert product.derivatives_current
+    assert sorted(product.image_derivatives["webp"]) == ["320", "640"]
+    assert product.thumbnail.name == product.image_derivatives["jpeg"]["320"]
+    assert re.search(r"/640w\.[0-9a-f]{16}\.webp 640w$", product.image_srcset_webp)
+    assert re.search(r"/640w\.[0-9a-f]{16}\.jpeg$", product.image_fallback_url)
+
+    product.name = "Gold ring"
+    product.save()
+    assert not OutboxEvent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_product_list_exposes_srcset(category):
+    make_product(category)
+    tasks.drain()
+
+    response = APIClient().get("/api/v1/products/")
+
+    srcset = response.json()["results"][0]["image_srcset"]
+    assert srcset["jpeg"].startswith("http://testserver/media/products/derivatives/")
+    assert srcset["jpeg"].endswith(" 640w")
+
+
+@pytest.mark.django_db
+def test_backfill_command(category):
+    product = make_product(category)
+    OutboxEvent.objects.all().delete()
+
+    out = io.StringIO()
+    call_command("build_image_derivatives", workers=1, stdout=out)
+
+    product.refresh_from_db()
+    assert product.derivatives_current
+    assert "Built derivatives for 1 image(s)" in out.getvalue()
+
+    call_command("build_image_derivatives", workers=1, stdout=out)
+    assert "0 image(s), 1 already current" in out.getvalue()
+
+
+def add_gallery(product, count):
+    for position in reversed(range(count)):
+        image = ProductImage(product=product, alt_text=f"View {position}", position=position)
+        image.file.save(f"view-{position}.png", ContentFile(png_bytes(400, 400)), save=False)
+        image.save()
+
+
+@pytest.mark.django_db
+def test_gallery_loads_in_one_query_regardless_of_size(category):
+    small = make_product(category)
+    large = Product.objects.create(category=category, name="Band", slug="band", price_cents=1000)
+    add_gallery(small, 1)
+    add_gallery(large, 6)
+    tasks.drain()
+    client = APIClient()
+
+    with CaptureQueriesContext(connection) as small_queries:
+        client.get(f"/api/v1/products/{small.pk}/")
+    with CaptureQueriesContext(connection) as large_queries:
+        response = client.get(f"/api/v1/products/{large.pk}/")
+
+    assert len(small_queries) == len(large_queries)
+    gallery = response.json()["images"]
+    assert [image["position"] for image in gallery] == list(range(6))
+    assert re.search(r"/320w\.[0-9a-f]{16}\.webp 320w$", gallery[0]["srcset"]["webp"])
+
+
+def test_legacy_gallery_entries_are_parsed():
+    migration = importlib.import_module("catalog.migrations.0006_productimage")
+
+    assert migration.gallery_entry("/media/products/a.jpg") == ("products/a.jpg", "")
+    assert migration.gallery_entry({"url": "https://cdn.example.com/b.jpg", "alt": "Side"}) == (
+        "https://cdn.example.com/b.jpg", "Side",
+    )
+    assert migration.gallery_entry({}) == ("", "")
+    assert migration.is_external("https://cdn.example.com/b.jpg") and migration.is_external("//cdn.example.com/c.jpg")
+    assert not migration.is_external("products/a.jpg")
+
+
+def test_external_gallery_images_keep_their_url():
+    image = ProductImage(external_url="https://cdn.example.com/b.jpg")
+    assert image.fallback_url == "https://cdn.example.com/b.jpg"
+    assert not image.derivatives_current
@@ -0,0 +1,75 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory
+
+from catalog.models import Category
+from core import instrumentation
+from core.middleware import request_metrics_middleware
+
+
+@pytest.mark.django_db
+def test_server_timing_only_for_staff_unless_enabled(settings):
+    settings.SERVER_TIMING = False
+    client = Client()
+    assert "Server-Timing" not in client.get("/api/v1/categories/")
+
+    client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+    timing = client.get("/api/v1/categories/")["Server-Timing"]
+    assert timing.startswith("db;dur=")
+    assert "total;dur=" in timing
+
+
+@pytest.mark.django_db
+def test_requests_are_added_to_route_histograms(settings):
+    Category.objects.create(name="Rings", slug="rings")
+    before = instrumentation.route_stats().get("api:category-list", {}).get("count", 0)
+
+    Client().get("/api/v1/categories/")
+
+    stats = instrumentation.route_stats()["api:category-list"]
+    assert stats["count"] == before + 1
+    assert stats["queries"]["sum"] >= 1
+    assert sum(stats["duration_ms"]["buckets"].values()) == stats["count"]
+
+
+@pytest.mark.django_db
+def test_async_views_count_their_queries(settings, async_routes):
+    settings.SERVER_TIMING = True
+    Category.objects.create(name="Rings", slug="rings")
+    before = instrumentation.route_stats().get("api:category-tree", {}).get("queries", {}).get("sum", 0)
+
+    response = async_to_sync(AsyncClient().get)("/api/v1/categories/tree/")
+
+    assert response.status_code == 200
+    assert response.resolver_match.func.__module__ == "api.async_views"
+    assert '"0 queries"' not in response["Server-Timing"]
+    assert instrumentation.route_stats()["api:category-tree"]["queries"]["sum"] > before
+
+
+@pytest.mark.django_db
+def test_slow_requests_log_repeated_sql(settings, caplog):
+    settings.SLOW_REQUEST_MS = 0
+    for slug in ("rings", "chains", "bands"):
+        Category.objects.create(name=slug.title(), slug=slug)
+
+    def n_plus_one(request):
+        for category in Category.objects.all():
+            Category.objects.filter(pk=category.pk).exists()
+        return HttpResponse()
+
+    with caplog.at_level(logging.WARNING, logger="core.instrumentation"):
+        request_metrics_middleware(n_plus_one)(RequestFactory().get("/slow/"))
+
+    [record] = caplog.records
+    assert "4 queries" in record.getMessage()
+    assert "3x SELECT" in record.getMessage()
+
+
+def test_sql_shape_collapses_in_lists():
+    assert instrumentation.sql_shape('SELECT 1\n  FROM "t" WHERE id IN (%s, %s, %s)') == (
+        'SELECT 1 FROM "t" WHERE id IN (...)'
+    )
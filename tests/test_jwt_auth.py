@@ -0,0 +1,78 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import CustomerProfile
+from api.authentication import tokens_for_user
+
+
+@pytest.fixture
+def user(db):
+    cache.clear()
+    user = User.objects.create_user("ada", "ada@example.com", "correct-horse-battery", first_name="Ada")
+    CustomerProfile.for_user(user)
+    return user
+
+
+def client_for(tokens):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+    return client
+
+
+def user_queries(queries):
+    return [query["sql"] for query in queries if '"auth_user"' in query["sql"]]
+
+
+@pytest.mark.django_db
+def test_cached_user_and_profile_serve_repeat_requests(user):
+    client = client_for(tokens_for_user(user))
+    assert client.get("/api/v1/profile/").status_code == 200
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get("/api/v1/profile/")
+
+    assert response.json()["user"]["first_name"] == "Ada"
+    assert len(queries) == 0
+
+    user.first_name = "Augusta"
+    user.save()
+    assert client.get("/api/v1/profile/").json()["user"]["first_name"] == "Augusta"
+
+
+@pytest.mark.django_db
+def test_deactivation_takes_effect_on_next_request(user, settings):
+    settings.JWT_EMBED_USER_CLAIMS = True
+    client = client_for(tokens_for_user(user))
+    assert client.get("/api/v1/orders/").status_code == 200
+
+    user.is_active = False
+    user.save()
+
+    assert client.get("/api/v1/orders/").status_code == 401
+
+
+@pytest.mark.django_db
+def test_embedded_claims_skip_the_user_lookup_until_the_user_changes(user, settings):
+    settings.JWT_EMBED_USER_CLAIMS = True
+    tokens = tokens_for_user(user)
+    assert AccessToken(tokens["access"])["user"]["username"] == "ada"
+    cache.clear()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert client_for(tokens).get("/api/v1/orders/").status_code == 200
+    assert user_queries(queries) == []
+
+    user.save()
+    with CaptureQueriesContext(connection) as queries:
+        assert client_for(tokens).get("/api/v1/orders/").status_code == 200
+    assert len(user_queries(queries)) == 1
+
+    refreshed = APIClient().post("/api/v1/auth/refresh/", {"refresh": tokens["refresh"]}, format="json").json()
+    with CaptureQueriesContext(connection) as queries:
+        assert client_for(refreshed).get("/api/v1/orders/").status_code == 200
+    assert user_queries(queries) == []
@@ -0,0 +1,98 @@
+import gzip
+import io
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.http import Http404
+from django.test import Client, RequestFactory
+
+from catalog.models import Category, Product
+from core.storage import is_hashed
+from core.views import accepted_encodings, serve_media
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def test_storage_names_files_after_content(media_root):
+    first = default_storage.save("docs/care guide.txt", ContentFile(b"polish gently " * 50))
+    second = default_storage.save("docs/care guide.txt", ContentFile(b"polish gently " * 50))
+    other = default_storage.save("docs/care guide.txt", ContentFile(b"something else"))
+
+    assert first == second != other
+    assert first.startswith("docs/care_guide.") and is_hashed(first)
+    assert gzip.decompress((media_root / f"{first}.gz").read_bytes()) == b"polish gently " * 50
+
+
+def test_names_that_only_look_hashed_are_hashed_again(media_root):
+    first = default_storage.save("products/banner.1699999999999.jpg", ContentFile(b"first"))
+    second = default_storage.save("products/banner.1699999999999.jpg", ContentFile(b"second"))
+
+    assert first != second
+    assert first.startswith("products/banner.1699999999999.")
+    assert default_storage.open(first).read() == b"first"
+    assert default_storage.open(second).read() == b"second"
+    assert default_storage.save(second, ContentFile(b"second")) == second
+
+
+def test_hashed_media_is_immutable_and_precompressed():
+    name = default_storage.save("docs/sizes.json", ContentFile(b'{"ring": [5, 6, 7, 8]}' * 20))
+    client = Client()
+
+    response = client.get(f"/media/{name}", HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+    assert response["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert response["Content-Encoding"] == "gzip"
+    assert response["Content-Type"] == "application/json"
+    not_modified = client.get(f"/media/{name}", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+    assert not_modified.status_code == 304
+    assert "Accept-Encoding" in not_modified["Vary"]
+    # The uncompressed representation has its own validator
+    identity = client.get(f"/media/{name}", HTTP_IF_NONE_MATCH=response["ETag"])
+    assert identity.status_code == 200
+    assert identity["ETag"] != response["ETag"] and "Content-Encoding" not in identity
+    refused = client.get(f"/media/{name}", HTTP_ACCEPT_ENCODING="gzip;q=0, deflate")
+    assert "Content-Encoding" not in refused
+    assert client.get(f"/media/{name}", HTTP_ACCEPT_ENCODING="br;q=0, *")["Content-Encoding"] == "gzip"
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("br;q=0, gzip; q=0.5, deflate") == {"br": 0.0, "gzip": 0.5, "deflate": 1.0}
+    assert accepted_encodings("") == {}
+
+
+def test_unhashed_media_gets_short_cache(media_root):
+    FileSystemStorage(location=media_root).save("legacy.txt", ContentFile(b"old upload"))
+
+    response = Client().get("/media/legacy.txt")
+
+    assert response["Cache-Control"] == "public, max-age=3600"
+    assert b"".join(response.streaming_content) == b"old upload"
+    with pytest.raises(Http404):
+        serve_media(RequestFactory().get("/media/../settings.py"), "../settings.py")
+
+
+@pytest.mark.django_db
+def test_command_renames_uploads_and_updates_references(media_root):
+    legacy = FileSystemStorage(location=media_root)
+    legacy.save("products/ring.png", ContentFile(b"not really a png"))
+    category = Category.objects.create(name="Rings", slug="rings")
+    product = Product.objects.create(category=category, name="Ring", slug="ring", price_cents=1000)
+    Product.objects.filter(pk=product.pk).update(
+        image="products/ring.png",
+        image_derivatives={"source": "products/ring.png", "webp": {}, "jpeg": {}},
+    )
+
+    out = io.StringIO()
+    call_command("hash_media_names", delete_old=True, stdout=out)
+
+    product.refresh_from_db()
+    assert is_hashed(product.image.name)
+    assert product.derivatives_current
+    assert not (media_root / "products/ring.png").exists()
+    assert "Renamed 1 file(s) referenced by 1 row(s)" in out.getvalue()
@@ -0,0 +1,52 @@
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+from prometheus_client import REGISTRY
+
+from catalog.models import Category
+from checkout.models import Address, Order
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+def test_metrics_restricted_to_allowed_ips_and_staff(settings):
+    client = Client()
+    assert client.get("/metrics").status_code == 403
+
+    client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain")
+    assert b"http_request_duration_seconds_bucket" in response.content
+
+    settings.METRICS_ALLOWED_IPS = ["127.0.0.1"]
+    assert Client().get("/metrics").status_code == 200
+
+
+@pytest.mark.django_db
+def test_requests_counted_per_route():
+    Category.objects.create(name="Rings", slug="rings")
+    labels = {"route": "api:category-list", "method": "GET"}
+    before = sample("http_requests_total", status="200", **labels)
+    queries_before = sample("db_queries_total", route="api:category-list")
+
+    Client().get("/api/v1/categories/")
+
+    assert sample("http_requests_total", status="200", **labels) == before + 1
+    assert sample("http_request_duration_seconds_count", **labels) >= 1
+    assert sample("db_queries_total", route="api:category-list") > queries_before
+
+
+@pytest.mark.django_db
+def test_orders_counted_on_commit(django_capture_on_commit_callbacks):
+    address = Address.objects.create(full_name="Jane", phone="0700", line1="Street", city="Nairobi", county="Nairobi", country="Kenya")
+    before = sample("orders_created_total", payment_method="mpesa")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        order = Order.objects.create(address=address, total_cents=1000, payment_method="mpesa")
+    order.save()
+
+    assert sample("orders_created_total", payment_method="mpesa") == before + 1
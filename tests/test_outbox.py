@@ -0,0 +1,81 @@
+import pytest
+from django.utils import timezone
+
+from catalog.models import Category, Product
+from checkout.models import Address, Order
+from core import tasks
+from core.models import OutboxEvent
+
+
+@pytest.fixture
+def order(db):
+    address = Address.objects.create(full_name="Jane", phone="0700", line1="Street", city="Nairobi", county="Nairobi", country="Kenya")
+    return Order.objects.create(address=address, total_cents=1000)
+
+
+@pytest.fixture
+def flaky_handler():
+    calls = []
+
+    def handle(payload):
+        calls.append(payload)
+        raise RuntimeError("gateway down")
+
+    tasks.HANDLERS["test.flaky"] = handle
+    yield calls
+    del tasks.HANDLERS["test.flaky"]
+
+
+@pytest.mark.django_db
+def test_order_creation_enqueues_event(order):
+    assert list(OutboxEvent.objects.values_list("topic", "payload")) == [
+        ("order.created", {"order_id": order.pk}),
+    ]
+
+
+@pytest.mark.django_db
+def test_status_change_enqueues_event_once(order):
+    OutboxEvent.objects.all().delete()
+    order = Order.objects.get(pk=order.pk)
+    order.status = "confirmed"
+    order.save()
+    order.save()
+    event = OutboxEvent.objects.get()
+    assert event.topic == "order.status_changed"
+    assert event.payload["old_status"] == "pending"
+    assert event.payload["new_status"] == "confirmed"
+
+
+@pytest.mark.django_db
+def test_drain_deletes_processed_events(order):
+    assert tasks.drain() == 1
+    assert not OutboxEvent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_failed_event_is_retried_with_backoff(flaky_handler):
+    event = tasks.enqueue("test.flaky", {"n": 1}, max_attempts=2)
+    assert tasks.drain() == 1
+    event.refresh_from_db()
+    assert event.status == "pending"
+    assert event.attempts == 1
+    assert event.available_at > timezone.now()
+    assert "gateway down" in event.last_error
+
+    # Not due yet, so nothing is claimed
+    assert tasks.drain() == 0
+
+    OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+    tasks.drain()
+    event.refresh_from_db()
+    assert event.status == "failed"
+    assert len(flaky_handler) == 2
+
+
+@pytest.mark.django_db
+def test_product_delete_enqueues_audit_event():
+    category = Category.objects.create(name="Rings", slug="rings")
+    product = Product.objects.create(category=category, name="Band", slug="band", price_cents=100, sku="SKU-1")
+    product.delete()
+    event = OutboxEvent.objects.get(topic="product.deleted")
+    assert event.payload == {"name": "Band", "sku": "SKU-1"}
@@ -0,0 +1,67 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import CustomerProfile
+from api.authentication import tokens_for_user
+
+
+def writes(queries):
+    return [query["sql"] for query in queries if query["sql"].split()[0] in ("INSERT", "UPDATE", "DELETE")]
+
+
+@pytest.fixture
+def user(db):
+    cache.clear()
+    return User.objects.create_user("ada", "ada@example.com", "correct-horse-battery")
+
+
+@pytest.mark.django_db
+def test_login_does_not_touch_the_profile(user, settings):
+    # As in production, with a shared cache in front of the sessions
+    settings.SESSION_ENGINE = "core.sessions"
+    profile = CustomerProfile.for_user(user)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = Client().post("/accounts/login/", {"username": "ada", "password": "correct-horse-battery"})
+
+    assert response.status_code == 302
+    # last_login and the new session; the profile used to be saved as well
+    assert len(writes(queries)) == 2
+    assert not [sql for sql in writes(queries) if "accounts_customerprofile" in sql]
+    assert CustomerProfile.objects.get(pk=profile.pk).updated_at == profile.updated_at
+
+
+@pytest.mark.django_db
+def test_profile_is_created_on_first_access(user):
+    assert not CustomerProfile.objects.exists()
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(user)['access']}")
+
+    assert client.get("/api/v1/profile/").json()["user"]["username"] == "ada"
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get("/api/v1/profile/").status_code == 200
+
+    assert CustomerProfile.objects.filter(user=user).count() == 1
+    assert writes(queries) == []
+
+
+@pytest.mark.django_db
+def test_profile_save_writes_only_changed_fields(user):
+    CustomerProfile.for_user(user)
+    profile = CustomerProfile.objects.get(user=user)
+
+    with CaptureQueriesContext(connection) as queries:
+        profile.save()
+    assert writes(queries) == []
+
+    profile.phone = "0700000000"
+    with CaptureQueriesContext(connection) as queries:
+        profile.save()
+    [update] = writes(queries)
+    assert '"phone"' in update and '"gender"' not in update
+    assert CustomerProfile.objects.get(pk=profile.pk).phone == "0700000000"
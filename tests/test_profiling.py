@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import AsyncClient, Client
+
+from api.authentication import tokens_for_user
+from catalog.models import Category
+from core import profiling
+
+
+@pytest.fixture
+def profile_dir(settings, tmp_path):
+    settings.PROFILE_DIR = str(tmp_path)
+    settings.RATE_LIMITS = {}
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    Category.objects.create(name="Rings", slug="rings")
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_staff_request_profiled_and_saved(profile_dir):
+    client = Client()
+    client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+
+    response = client.get("/api/v1/categories/", HTTP_X_PROFILE="1")
+
+    assert response.status_code == 200
+    profile_id = response["X-Profile-Id"]
+    summary = json.loads((profile_dir / f"{profile_id}.json").read_text())
+    assert summary["route"] == "api:category-list"
+    assert summary["queries"] == len(summary["sql"]) > 0
+    assert (profile_dir / f"{profile_id}.prof").exists()
+    folded = (profile_dir / f"{profile_id}.folded").read_text().splitlines()
+    assert folded and all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+
+
+@pytest.mark.django_db
+def test_json_mode_with_bearer_token(profile_dir):
+    staff = User.objects.create_user("staff", password="x", is_staff=True)
+    token = tokens_for_user(staff)["access"]
+
+    response = Client().get("/api/v1/categories/?_profile=json", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    body = response.json()
+    assert body["id"] == response["X-Profile-Id"]
+    assert body["status"] == 200
+    assert body["functions"] and body["folded"]
+    assert any("catalog_category" in query["sql"] for query in body["sql"])
+
+
+@pytest.mark.django_db
+def test_trigger_ignored_for_everyone_else(profile_dir):
+    customer = User.objects.create_user("customer", password="x")
+    client = Client()
+    assert "X-Profile-Id" not in client.get("/api/v1/categories/?_profile=json")
+
+    client.force_login(customer)
+    response = client.get("/api/v1/categories/", HTTP_X_PROFILE="json")
+    assert "X-Profile-Id" not in response
+    assert "functions" not in response.json()
+    assert not any(profile_dir.iterdir())
+
+
+@pytest.mark.django_db
+def test_async_request_profiled_with_its_sql(profile_dir, async_routes):
+    client = AsyncClient()
+    client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+
+    response = async_to_sync(client.get)("/api/v1/categories/tree/?_profile=json")
+
+    body = response.json()
+    assert response.resolver_match.func.__module__ == "api.async_views"
+    assert body["route"] == "api:category-tree"
+    assert body["queries"] == len(body["sql"]) > 0
+    assert body["functions"]
+    assert not profiling._lock.locked()
+
+
+@pytest.mark.django_db
+def test_one_request_profiled_at_a_time(profile_dir):
+    client = Client()
+    client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+
+    with profiling._lock:
+        response = client.get("/api/v1/categories/", HTTP_X_PROFILE="1")
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response
+
+    assert "X-Profile-Id" in client.get("/api/v1/categories/", HTTP_X_PROFILE="1")
@@ -0,0 +1,283 @@
+"""
+Query budgets for every public endpoint.
+
+Each endpoint is requested twice: once after seeding ``SMALL`` categories,
+products, cart lines, order items and addresses, and once more after adding
+``LARGE`` more of each. An endpoint passes if both requests run the same
+number of queries (nothing is queried per row) and no more than its budget.
+On failure the SQL of both requests is shown as a diff, so the query that
+repeats per row stands out.
+
+Caches and the typeahead and trigram indexes are cleared before every
+request, so the counts are those of a cold start. Endpoints that render HTML
+templates are skipped when the template tag libraries can't be loaded.
+"""
+import difflib
+import itertools
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.template import engines
+from django.template.library import InvalidTemplateLibrary
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+
+from accounts.models import CustomerAddress, CustomerProfile
+from api.authentication import tokens_for_user
+from catalog import fuzzy
+from catalog.models import Category, Product
+from catalog.typeahead import typeahead
+from checkout.models import Address, Order, OrderItem
+from core.instrumentation import sql_shape
+
+SMALL, LARGE = 2, 6
+
+# URL names with no endpoint of ours behind them
+UNCHECKED_NAMESPACES = ("admin",)
+UNCHECKED_NAMES = {"schema", "swagger-ui", "redoc", "media"}
+
+ADDRESS = {
+    "full_name": "Jane Doe", "phone": "0700000000", "line1": "Kenyatta Avenue",
+    "city": "Nairobi", "county": "Nairobi", "country": "Kenya",
+}
+
+_serial = itertools.count()
+
+
+def templates_available():
+    try:
+        engines["django"]
+    except InvalidTemplateLibrary:
+        return False
+    return True
+
+
+class Catalog:
+    """Seeded data; ``grow(n)`` adds ``n`` more of everything"""
+
+    def __init__(self):
+        self.customer = User.objects.create_user("customer", password="secret", email="c@example.com")
+        self.staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        CustomerProfile.for_user(self.customer)
+        self.categories = []
+        self.subcategories = []
+        self.products = []
+        self.orders = []
+
+    def grow(self, n):
+        for _ in range(n):
+            i = next(_serial)
+            category = Category.objects.create(name=f"Category {i}", slug=f"category-{i}")
+            self.subcategories.append(Category.objects.create(name=f"Sub {i}", slug=f"sub-{i}", parent=category))
+            self.categories.append(category)
+            # Listed on the first category's page through its sub-category
+            self.products.append(Product.objects.create(
+                category=self.subcategories[0], name=f"Ring {i}", slug=f"ring-{i}", sku=f"R-{i}",
+                price_cents=1000 + i, stock_quantity=1000, is_featured=True,
+            ))
+            CustomerAddress.objects.create(customer=self.customer, **ADDRESS)
+        order = Order.objects.create(customer=self.customer, address=Address.objects.create(**ADDRESS))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price_cents=product.price_cents,
+                      total_cents=product.price_cents)
+            for product in self.products
+        ])
+        self.orders.append(order)
+
+    @property
+    def category(self):
+        return self.categories[0]
+
+    @property
+    def subcategory(self):
+        return self.subcategories[0]
+
+    @property
+    def product(self):
+        return self.products[0]
+
+    @property
+    def order(self):
+        return self.orders[-1]
+
+    def fill_carts(self, client):
+        """Every product in the session (HTML) and API carts"""
+        session = client.session
+        session["cart"] = {product.slug: 1 for product in self.products}
+        session["address_data"] = ADDRESS
+        session.save()
+        caches["default"].set(f"cart:user:{self.customer.pk}", {str(p.pk): 1 for p in self.products})
+
+
+@dataclass
+class Endpoint:
+    name: str
+    path: Callable[[Catalog], str]
+    budget: int
+    method: str = "get"
+    # None (anonymous), "customer" or "staff"
+    user: Optional[str] = None
+    data: Optional[Callable[[Catalog], dict]] = None
+    templates: bool = False
+    status: int = 200
+
+    def __str__(self):
+        return f"{self.method.upper()} {self.name}"
+
+
+def path(url):
+    return lambda catalog: url
+
+
+def register_data(catalog):
+    i = next(_serial)
+    return {"username": f"new{i}", "email": f"new{i}@example.com", "first_name": "New",
+            "last_name": "User", "password": "secret123", "password_confirm": "secret123"}
+
+
+def order_data(catalog):
+    return {"address": ADDRESS, "payment_method": "mpesa",
+            "items": [{"product": product.pk, "quantity": 1} for product in catalog.products]}
+
+
+ENDPOINTS = [
+    # HTML pages
+    Endpoint("core:home", path("/"), 1, templates=True),
+    Endpoint("catalog:product_list", path("/shop/"), 3, templates=True),
+    Endpoint("catalog:category", lambda c: f"/shop/c/{c.category.slug}/", 4, templates=True),
+    Endpoint("catalog:category", lambda c: f"/shop/c/{c.subcategory.slug}/", 5, templates=True),
+    Endpoint("catalog:product_detail", lambda c: f"/shop/p/{c.product.slug}/", 4, templates=True),
+    Endpoint("catalog:also_bought", lambda c: f"/shop/p/{c.product.slug}/also-bought/", 3, templates=True),
+    Endpoint("catalog:product_search", path("/shop/search/?q=Ring"), 2, templates=True),
+    Endpoint("catalog:autocomplete", path("/shop/autocomplete/?q=ri"), 3, templates=True),
+    Endpoint("cart:view", path("/cart/"), 1, templates=True),
+    Endpoint("cart:add", lambda c: f"/cart/add/{c.product.slug}/", 1, method="post", status=302),
+    Endpoint("cart:remove", lambda c: f"/cart/remove/{c.product.slug}/", 0, method="post", status=302),
+    Endpoint("cart:clear", path("/cart/clear/"), 0, method="post", status=302),
+    Endpoint("cart:count", path("/cart/count/"), 0),
+    Endpoint("checkout:address", path("/checkout/address/"), 1, templates=True),
+    Endpoint("checkout:confirm", path("/checkout/confirm/"), 1, templates=True),
+    Endpoint("checkout:confirm", path("/checkout/confirm/"), 6, method="post", status=302),
+    Endpoint("checkout:done", path("/checkout/done/"), 0, templates=True),
+    Endpoint("accounts:login", path("/accounts/login/"), 8, method="post", status=302,
+             data=lambda c: {"username": "customer", "password": "secret"}),
+    Endpoint("accounts:logout", path("/accounts/logout/"), 3, user="customer", status=302),
+    Endpoint("accounts:signup", path("/accounts/signup/"), 3, method="post", status=302,
+             data=lambda c: {"username": f"new{next(_serial)}", "password": "secret"}),
+    # API
+    Endpoint("api:api-root", path("/api/v1/"), 0),
+    Endpoint("api:register", path("/api/v1/auth/register/"), 3, method="post", status=201, data=register_data),
+    Endpoint("api:login", path("/api/v1/auth/login/"), 1, method="post",
+             data=lambda c: {"username": "customer", "password": "secret"}),
+    Endpoint("api:token_refresh", path("/api/v1/auth/refresh/"), 4, method="post",
+             data=lambda c: {"refresh": tokens_for_user(c.customer)["refresh"]}),
+    Endpoint("api:profile", path("/api/v1/profile/"), 2, user="customer"),
+    Endpoint("api:category-tree", path("/api/v1/categories/tree/"), 3),
+    Endpoint("api:category-list", path("/api/v1/categories/"), 6),
+    Endpoint("api:category-detail", lambda c: f"/api/v1/categories/{c.category.pk}/", 5),
+    Endpoint("api:product-list", path("/api/v1/products/"), 3),
+    Endpoint("api:product-detail", lambda c: f"/api/v1/products/{c.product.pk}/", 3),
+    Endpoint("api:product-also-bought", lambda c: f"/api/v1/products/{c.product.pk}/also-bought/", 3),
+    Endpoint("api:product-featured", path("/api/v1/products/featured/"), 2),
+    Endpoint("api:product-facets", path("/api/v1/products/facets/?material=gold"), 1),
+    Endpoint("api:product-autocomplete", path("/api/v1/products/autocomplete/?q=ri"), 3),
+    Endpoint("api:product-search", path("/api/v1/products/search/?q=Ring"), 2),
+    Endpoint("api:product-search", path("/api/v1/products/search/?q=Rinng&fuzzy=true"), 3),
+    Endpoint("api:cart", path("/api/v1/cart/"), 2, user="customer"),
+    Endpoint("api:cart", path("/api/v1/cart/"), 3, method="post", user="customer", status=201,
+             data=lambda c: {"product_id": c.product.pk, "quantity": 1}),
+    Endpoint("api:cart", path("/api/v1/cart/"), 2, method="put", user="customer",
+             data=lambda c: {"product_id": c.product.pk, "quantity": 2}),
+    Endpoint("api:cart", path("/api/v1/cart/"), 1, method="delete", user="customer",
+             data=lambda c: {"product_id": c.product.pk}),
+    Endpoint("api:cart-to-order", path("/api/v1/cart/to-order/"), 11, method="post", user="customer",
+             status=201, data=lambda c: {"address": ADDRESS, "payment_method": "mpesa"}),
+    Endpoint("api:address-list", path("/api/v1/addresses/"), 3, user="customer"),
+    Endpoint("api:address-detail", lambda c: f"/api/v1/addresses/{c.customer.addresses.first().pk}/", 3,
+             user="customer"),
+    Endpoint("api:order-list", path("/api/v1/orders/"), 4, user="customer"),
+    Endpoint("api:order-list", path("/api/v1/orders/"), 11, method="post", user="customer", status=201,
+             data=order_data),
+    Endpoint("api:order-detail", lambda c: f"/api/v1/orders/{c.order.pk}/", 3, user="customer"),
+    Endpoint("api:order-cancel", lambda c: f"/api/v1/orders/{c.order.pk}/cancel/", 7, method="post",
+             user="customer"),
+    Endpoint("api:admin-order-list", path("/api/v1/admin/orders/"), 4, user="staff"),
+    Endpoint("api:admin-order-detail", lambda c: f"/api/v1/admin/orders/{c.order.pk}/", 3, user="staff"),
+    Endpoint("api:admin-order-update-status", lambda c: f"/api/v1/admin/orders/{c.order.pk}/update_status/", 7,
+             method="post", user="staff", data=lambda c: {"status": "confirmed"}),
+    Endpoint("api:cache-stats", path("/api/v1/cache/stats/"), 1, user="staff"),
+    Endpoint("api:request-stats", path("/api/v1/requests/stats/"), 1, user="staff"),
+    Endpoint("metrics", path("/metrics"), 1, user="staff"),
+]
+
+
+def url_names(patterns, prefix=""):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            namespace = f"{prefix}{pattern.namespace}:" if pattern.namespace else prefix
+            yield from url_names(pattern.url_patterns, namespace)
+        elif pattern.name:
+            yield prefix + pattern.name
+
+
+def measure(client, endpoint, catalog):
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    typeahead.clear()
+    fuzzy.clear()
+    if endpoint.user:
+        client.force_login(getattr(catalog, endpoint.user))
+    catalog.fill_carts(client)
+    data = endpoint.data(catalog) if endpoint.data else None
+    kwargs = {"content_type": "application/json"} if data is not None and endpoint.name.startswith("api:") else {}
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, endpoint.method)(endpoint.path(catalog), data, **kwargs)
+    assert response.status_code == endpoint.status, (str(endpoint), response.content[:500])
+    return [sql_shape(query["sql"]) for query in queries.captured_queries]
+
+
+def sql_diff(small, large):
+    return "\n".join(difflib.unified_diff(
+        small, large, f"{SMALL} of each", f"{SMALL + LARGE} of each", lineterm="", n=1,
+    ))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("endpoint", ENDPOINTS, ids=str)
+def test_query_count_is_constant(endpoint, settings):
+    if endpoint.templates and not templates_available():
+        pytest.skip("template tag libraries unavailable")
+    settings.RATE_LIMITS = {}
+    settings.METRICS_ALLOWED_IPS = []
+    # Budgets are for production's cache-first sessions; one test process
+    # shares its local-memory cache like workers share Redis
+    settings.SESSION_ENGINE = "core.sessions"
+    catalog = Catalog()
+    client = Client()
+
+    catalog.grow(SMALL)
+    small = measure(client, endpoint, catalog)
+    catalog.grow(LARGE)
+    large = measure(client, endpoint, catalog)
+
+    if len(small) != len(large):
+        pytest.fail(f"{endpoint}: {len(small)} queries with {SMALL} of each, {len(large)} with "
+                    f"{SMALL + LARGE}; something is queried per row:\n{sql_diff(small, large)}")
+    if len(large) > endpoint.budget:
+        listing = "\n".join(f"{index}. {shape}" for index, shape in enumerate(large, 1))
+        pytest.fail(f"{endpoint}: {len(large)} queries, budget {endpoint.budget}:\n{listing}")
+
+
+def test_every_endpoint_has_a_budget():
+    checked = {endpoint.name for endpoint in ENDPOINTS}
+    missing = {
+        name for name in url_names(get_resolver().url_patterns)
+        if name not in UNCHECKED_NAMES and not name.startswith(tuple(f"{ns}:" for ns in UNCHECKED_NAMESPACES))
+    } - checked
+    assert not missing, f"endpoints without a query budget: {sorted(missing)}"
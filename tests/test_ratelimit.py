@@ -0,0 +1,79 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.test import Client, RequestFactory
+from rest_framework.test import APIClient
+
+from core import ratelimit
+
+
+@pytest.fixture(autouse=True)
+def clear_counters():
+    cache.clear()
+
+
+def test_previous_window_counts_in_proportion_to_its_overlap(settings, monkeypatch):
+    settings.RATE_LIMITS = {"test": "3/minute"}
+    now = [600.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+
+    assert [ratelimit.hit("test", "ip:1").allowed for _ in range(4)] == [True, True, True, False]
+    assert ratelimit.hit("test", "ip:2").allowed
+
+    # Half way through the next window the previous 4 hits weigh 2
+    now[0] = 690.0
+    usage = ratelimit.hit("test", "ip:1")
+    assert (usage.allowed, usage.remaining) == (True, 0)
+    usage = ratelimit.hit("test", "ip:1")
+    assert not usage.allowed
+    assert usage.reset == 15
+
+    assert ratelimit.hit("unlimited", "ip:1") is None
+    assert ratelimit.stats()["test"]["limited"] >= 2
+
+
+@pytest.mark.django_db
+def test_api_reports_and_enforces_limits(settings):
+    settings.RATE_LIMITS = {"anon": "2/minute", "user": "1000/hour"}
+    client = APIClient()
+
+    first = client.get("/api/v1/categories/")
+    assert first["RateLimit-Limit"] == "2"
+    assert first["RateLimit-Remaining"] == "1"
+    assert first["RateLimit-Policy"] == "2;w=60"
+    client.get("/api/v1/categories/")
+
+    limited = client.get("/api/v1/categories/")
+    assert limited.status_code == 429
+    assert int(limited["Retry-After"]) > 0
+    assert limited["RateLimit-Remaining"] == "0"
+
+
+@pytest.mark.django_db
+def test_html_views_share_the_limiter(settings):
+    settings.RATE_LIMITS = {"cart": "2/minute"}
+    client = Client()
+
+    assert [client.get("/cart/clear/").status_code for _ in range(3)] == [302, 302, 429]
+    assert client.get("/cart/clear/")["RateLimit-Limit"] == "2"
+
+
+
+@pytest.mark.django_db
+def test_per_session_limits_count_stored_sessions_only(settings):
+    settings.RATE_LIMITS = {"live_search": "1/minute"}
+
+    def exceeded(session_key=None):
+        request = RequestFactory().get("/shop/search/")
+        request.session = SessionStore(session_key)
+        return ratelimit.check(request, AnonymousUser(), ["live_search"], per_session=True) is not None
+
+    first, second = SessionStore(), SessionStore()
+    first.create()
+    second.create()
+    assert [exceeded(first.session_key), exceeded(first.session_key)] == [False, True]
+    assert not exceeded(second.session_key)
+
+    # A made-up session key counts against the address like no session at all
+    assert [exceeded("madeup"), exceeded()] == [False, True]
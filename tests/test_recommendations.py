@@ -0,0 +1,75 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import Client
+
+from catalog import recommendations
+from catalog.models import Category, CoPurchase, Product
+from checkout.models import Address, Order, OrderItem
+
+ADDRESS = {"full_name": "Jane Doe", "phone": "0700000000", "line1": "Moi Avenue", "city": "Nairobi"}
+
+
+@pytest.fixture
+def shop(db, settings):
+    settings.RATE_LIMITS = {}
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    rings = Category.objects.create(name="Rings", slug="rings")
+    chains = Category.objects.create(name="Chains", slug="chains")
+    products = {
+        slug: Product.objects.create(category=category, name=slug.title(), slug=slug, sku=slug, price_cents=100,
+                                     is_bestseller=slug == "signet")
+        for slug, category in [("band", rings), ("signet", rings), ("halo", rings), ("chain", chains),
+                               ("clasp", chains), ("locket", chains)]
+    }
+    customer = User.objects.create_user("customer")
+    baskets = [["band", "chain", "clasp"], ["band", "chain"], ["band", "chain", "clasp"], ["chain", "locket"],
+               ["halo", "locket"], ["halo", "locket"]]
+    for basket in baskets:
+        order = Order.objects.create(customer=customer, address=Address.objects.create(**ADDRESS))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=products[slug], quantity=1, price_cents=100, total_cents=100)
+            for slug in basket
+        ])
+    # Cancelled orders don't count
+    cancelled = Order.objects.create(customer=customer, address=Address.objects.create(**ADDRESS), status="cancelled")
+    OrderItem.objects.bulk_create([
+        OrderItem(order=cancelled, product=products[slug], quantity=1, price_cents=100, total_cents=100)
+        for slug in ("band", "halo")
+    ])
+    return products
+
+
+def test_cosine_scores_from_sparse_counts():
+    pairs, orders = recommendations.co_occurrence([{1, 2}, {1, 2}, {1, 3}, {2, 3, 4}, {1, 2, 3, 4, 5}], max_basket=4)
+    assert orders == {1: 4, 2: 4, 3: 3, 4: 2, 5: 1}
+    assert pairs[1] == {2: 2, 3: 1} and 5 not in pairs
+    best = recommendations.neighbours(pairs, orders, top=2, min_count=1)
+    assert [neighbour for neighbour, _ in best[2]] == [1, 4]
+    assert best[2][0][1] == pytest.approx(2 / 4)
+
+
+def test_build_command_and_also_bought(shop, django_assert_num_queries):
+    call_command("build_recommendations", min_count=2, stdout=StringIO())
+    pairs = {(row.product.slug, row.neighbour.slug, row.rank) for row in CoPurchase.objects.select_related(
+        "product", "neighbour")}
+    assert pairs == {("band", "chain", 1), ("band", "clasp", 2), ("chain", "band", 1), ("chain", "clasp", 2),
+                     ("clasp", "band", 1), ("clasp", "chain", 2), ("halo", "locket", 1), ("locket", "halo", 1)}
+
+    with django_assert_num_queries(1):
+        assert [p.slug for p in recommendations.also_bought(shop["band"], limit=2)] == ["chain", "clasp"]
+    # Too few neighbours: the category's bestsellers fill the rest
+    with django_assert_num_queries(2):
+        assert [p.slug for p in recommendations.also_bought(shop["halo"], limit=3)] == ["locket", "signet", "band"]
+
+
+def test_also_bought_endpoint(shop):
+    call_command("build_recommendations", min_count=2, stdout=StringIO())
+    Product.objects.filter(slug="chain").update(is_active=False)
+
+    body = Client().get(f"/api/v1/products/{shop['band'].pk}/also-bought/").json()
+    assert [product["slug"] for product in body] == ["clasp", "signet", "halo"]
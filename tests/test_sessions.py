@@ -0,0 +1,91 @@
+import importlib
+import io
+from datetime import timedelta
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import Client
+from django.utils import timezone
+
+from catalog.models import Category, Product
+from core.sessions import SessionStore
+from tac_ecomm import settings as base_settings
+
+
+def stored_data(session_key):
+    return SessionStore().decode(Session.objects.get(session_key=session_key).session_data)
+
+
+@pytest.mark.django_db
+def test_saves_within_interval_only_reach_the_cache(settings):
+    settings.SESSION_DB_WRITE_INTERVAL = 300
+    session = SessionStore()
+    session["cart"] = {"ring": 1}
+    session.save()
+
+    session["cart"] = {"ring": 2}
+    session.save()
+
+    assert stored_data(session.session_key)["cart"] == {"ring": 1}
+    assert SessionStore(session.session_key)["cart"] == {"ring": 2}
+
+    settings.SESSION_DB_WRITE_INTERVAL = 0
+    session["cart"] = {"ring": 3}
+    session.save()
+    assert stored_data(session.session_key)["cart"] == {"ring": 3}
+
+
+@pytest.mark.django_db
+def test_purged_row_is_recreated_from_cached_session(settings):
+    settings.SESSION_DB_WRITE_INTERVAL = 0
+    session = SessionStore()
+    session["cart"] = {"ring": 1}
+    session.save()
+    Session.objects.all().delete()
+
+    session = SessionStore(session.session_key)
+    session["cart"] = {"ring": 2}
+    session.save()
+
+    assert stored_data(session.session_key)["cart"] == {"ring": 2}
+
+
+def test_throttled_sessions_need_a_shared_cache(monkeypatch):
+    monkeypatch.setenv("CACHE_URL", "redis://127.0.0.1:6379/0")
+    assert importlib.reload(base_settings).SESSION_ENGINE == "core.sessions"
+    monkeypatch.setenv("CACHE_URL", "locmemcache://")
+    assert importlib.reload(base_settings).SESSION_ENGINE == "django.contrib.sessions.backends.db"
+
+
+@pytest.mark.django_db
+def test_browsing_does_not_create_sessions():
+    category = Category.objects.create(name="Rings", slug="rings")
+    Product.objects.create(category=category, name="Ring", slug="ring", price_cents=1000)
+    client = Client()
+
+    response = client.get("/cart/count/")
+
+    assert response.json() == {"cart_count": 0, "cart_items": 0}
+    assert "sessionid" not in response.cookies
+    assert "Cookie" not in response.get("Vary", "")
+    assert not Session.objects.exists()
+
+    client.get("/cart/add/ring/")
+    assert client.get("/cart/count/").json() == {"cart_count": 1, "cart_items": 1}
+    assert Session.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_purge_sessions_deletes_expired_rows_in_batches():
+    expired = timezone.now() - timedelta(days=1)
+    Session.objects.bulk_create(
+        Session(session_key=f"expired{index:02d}", session_data="", expire_date=expired) for index in range(7)
+    )
+    Session.objects.create(session_key="live", session_data="", expire_date=timezone.now() + timedelta(days=1))
+
+    out = io.StringIO()
+    call_command("purge_sessions", batch_size=3, stdout=out)
+
+    assert list(Session.objects.values_list("session_key", flat=True)) == ["live"]
+    assert "Deleted 7 expired session(s)" in out.getvalue()
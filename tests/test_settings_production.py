@@ -0,0 +1,36 @@
+import importlib
+
+from tac_ecomm import settings_production
+
+POSTGRES = {"ENGINE": "django.db.backends.postgresql", "NAME": "tac", "OPTIONS": {"sslmode": "require"}}
+
+
+def test_postgres_alias_uses_pool():
+    config = settings_production.configure_connection(POSTGRES, pool=True)
+    assert config["CONN_MAX_AGE"] == 0
+    assert config["CONN_HEALTH_CHECKS"] is True
+    assert config["OPTIONS"]["sslmode"] == "require"
+    assert config["OPTIONS"]["pool"]["max_size"] == settings_production.DB_POOL_OPTIONS["max_size"]
+    assert "pool" not in POSTGRES["OPTIONS"]
+
+
+def test_persistent_connections_without_pool():
+    config = settings_production.configure_connection(POSTGRES, pool=False)
+    assert config["CONN_MAX_AGE"] == settings_production.DB_CONN_MAX_AGE
+    assert "pool" not in config["OPTIONS"]
+
+
+def test_sqlite_alias_is_left_alone():
+    sqlite = {"ENGINE": "django.db.backends.sqlite3", "NAME": "db.sqlite3"}
+    assert settings_production.configure_connection(sqlite) == sqlite
+
+
+def test_debug_derived_settings_off_without_debug(monkeypatch):
+    monkeypatch.delenv("DEBUG", raising=False)
+    monkeypatch.delenv("SERVER_TIMING", raising=False)
+    production = importlib.reload(settings_production)
+    assert production.DEBUG is False
+    assert production.CORS_ALLOW_ALL_ORIGINS is False
+    assert production.SESSION_COOKIE_SECURE is True
+    assert production.CSRF_COOKIE_SECURE is True
+    assert production.SERVER_TIMING is False
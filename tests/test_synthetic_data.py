@@ -0,0 +1,38 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from catalog.models import Category, Product
+from checkout.models import Order, OrderItem
+
+
+def generate(**options):
+    sizes = {"categories": 10, "products": 40, "tags": 5, "users": 4, "orders": 12, "verbosity": 0}
+    call_command("generate_synthetic_data", **{**sizes, **options})
+
+
+@pytest.mark.django_db
+def test_generates_requested_sizes_with_consistent_totals():
+    generate()
+
+    assert Category.objects.count() == 10
+    assert Category.objects.filter(parent__isnull=True).count() == 2
+    assert Product.objects.count() == 40
+    assert Order.objects.count() == 12
+    for order in Order.objects.prefetch_related("items"):
+        assert order.items.exists()
+        assert order.total_cents == sum(item.total_cents for item in order.items.all())
+
+
+@pytest.mark.django_db
+def test_same_seed_same_data():
+    generate(prefix="a", seed=7)
+    generate(prefix="b", seed=7)
+
+    def prices(prefix):
+        return list(Product.objects.filter(slug__startswith=f"{prefix}-").order_by("pk").values_list("price_cents", flat=True))
+
+    assert prices("a") == prices("b")
+    assert OrderItem.objects.filter(order__order_number__startswith="B-").count() > 0
+    with pytest.raises(CommandError):
+        generate(prefix="a")
@@ -0,0 +1,55 @@
+import io
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.authentication import tokens_for_user
+from api.models import RevokedToken
+
+
+def refresh(token):
+    return APIClient().post("/api/v1/auth/refresh/", {"refresh": token}, format="json")
+
+
+@pytest.fixture
+def tokens(db):
+    cache.clear()
+    return tokens_for_user(User.objects.create_user("ada", "ada@example.com", "correct-horse-battery"))
+
+
+@pytest.mark.django_db
+def test_rotated_refresh_token_cannot_be_reused(tokens):
+    rotated = refresh(tokens["refresh"])
+    assert rotated.status_code == 200
+    assert RevokedToken.objects.count() == 1
+
+    assert refresh(tokens["refresh"]).status_code == 401
+    assert refresh(rotated.json()["refresh"]).status_code == 200
+
+
+@pytest.mark.django_db
+def test_revocation_survives_cache_loss(tokens):
+    assert refresh(tokens["refresh"]).status_code == 200
+    cache.clear()
+
+    assert refresh(tokens["refresh"]).status_code == 401
+
+
+@pytest.mark.django_db
+def test_purge_revoked_tokens_keeps_unexpired_rows():
+    now = timezone.now()
+    RevokedToken.objects.bulk_create(
+        RevokedToken(jti=f"expired{index}", expires_at=now - timedelta(minutes=1)) for index in range(5)
+    )
+    RevokedToken.objects.create(jti="live", expires_at=now + timedelta(days=1))
+
+    out = io.StringIO()
+    call_command("purge_revoked_tokens", batch_size=2, stdout=out)
+
+    assert list(RevokedToken.objects.values_list("jti", flat=True)) == ["live"]
+    assert "Deleted 5 expired revoked token(s)" in out.getvalue()
@@ -0,0 +1,71 @@
+import pytest
+from django.test import Client
+
+from catalog.models import Category, Product, Tag
+from catalog import typeahead as typeahead_module
+from catalog.typeahead import MAX_RESULTS, normalize, typeahead
+
+
+@pytest.fixture
+def catalog(db):
+    typeahead.clear()
+    rings = Category.objects.create(name="Rings", slug="rings")
+    Tag.objects.create(name="Rose gold", slug="rose-gold")
+    Product.objects.create(category=rings, name="Pavé Ruby Ring", slug="pave-ruby", sku="TAC-0001", price_cents=100)
+    Product.objects.create(category=rings, name="Classic Gold Ring", slug="classic", sku="TAC-0002", price_cents=100,
+                           is_bestseller=True)
+    Product.objects.create(category=rings, name="Hidden Ring", slug="hidden", sku="TAC-0003", price_cents=100,
+                           is_active=False)
+    yield rings
+    typeahead.clear()
+
+
+def labels(query, limit=MAX_RESULTS):
+    return [suggestion["label"] for suggestion in typeahead.suggest(query, limit)]
+
+
+def test_normalize():
+    assert normalize("  Pavé Ring-18K ") == "pave ring 18k"
+
+
+def test_prefixes_of_any_word(catalog, django_assert_num_queries):
+    # Categories first, then tags, then bestsellers
+    assert labels("r") == ["Rings", "Rose gold", "Classic Gold Ring", "Pavé Ruby Ring"]
+    assert labels("pave") == ["Pavé Ruby Ring"]
+    assert labels("gold r") == ["Classic Gold Ring"]
+    assert labels("tac-000") == ["TAC-0002 · Classic Gold Ring", "TAC-0001 · Pavé Ruby Ring"]
+    assert labels("hidden") == []
+    assert labels("r", limit=2) == ["Rings", "Rose gold"]
+    with django_assert_num_queries(0):
+        assert labels("ruby") == ["Pavé Ruby Ring"]
+
+
+def test_index_follows_committed_changes(catalog, django_capture_on_commit_callbacks):
+    assert labels("classic") == ["Classic Gold Ring"]
+    product = Product.objects.get(slug="classic")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        product.name = "Aurora Band"
+        product.save()
+        Product.objects.create(category=catalog, name="Amber Pendant", slug="amber", sku="TAC-0004", price_cents=100)
+        Tag.objects.get(slug="rose-gold").delete()
+
+    assert labels("classic") == []
+    assert labels("a") == ["Aurora Band", "Amber Pendant"]
+    assert labels("rose") == []
+    assert "TAC-0002 · Aurora Band" in labels("tac")
+
+
+def test_common_prefixes_precomputed(catalog, monkeypatch, django_capture_on_commit_callbacks):
+    monkeypatch.setattr(typeahead_module, "SCAN_LIMIT", 1)
+    assert labels("r") == ["Rings", "Rose gold", "Classic Gold Ring", "Pavé Ruby Ring"]
+    assert "r" in typeahead.index.heavy and "ri" in typeahead.index.heavy
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Product.objects.filter(slug="classic").get().delete()
+    assert labels("ri") == ["Rings", "Pavé Ruby Ring"]
+
+
+def test_autocomplete_endpoint(catalog):
+    body = Client().get("/api/v1/products/autocomplete/?q=rub&limit=50").json()
+    assert body["results"] == [{"type": "product", "label": "Pavé Ruby Ring", "url": "/shop/p/pave-ruby/"}]